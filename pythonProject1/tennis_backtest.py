@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""Проверка формулы прогноза на истории матчей и подбор её параметров
+
+    python tennis_backtest.py --db tennis_atp.db                  # качество действующих параметров
+    python tennis_backtest.py --fit --workers 8 --save            # подобрать и записать в базу
+    python tennis_backtest.py --fit --out params.json             # подобрать и сохранить в файл
+    python tennis_backtest.py --params params.json --save         # загрузить параметры из файла
+
+Формула predict_match линейна по весам: вероятность матча - доля очков
+плюс surface_weight * (разница win_rate на покрытии) плюс weather_weight *
+(разница win_rate в погоде), ограниченная [prob_min, prob_max]. Поэтому
+разницы для всех матчей считаются один раз (BacktestData), а оценка
+любого набора параметров - несколько операций NumPy над всеми матчами;
+блок наборов считается одним массивом (наборы × матчи).
+
+Метрики: log loss, Brier score, точность и калибровка по корзинам
+предсказанной вероятности. Подбор - сетка по весам и симметричному
+ограничению (prob_max = 1 - prob_min) в пуле процессов, затем несколько
+раундов уточнения сеткой вокруг лучшей точки.
+
+Статистика игроков берётся текущая, а не на дату матча, поэтому оценка
+на старых матчах оптимистична. Матчи без покрытия или погоды (weather
+NULL) считаются без соответствующей поправки.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tennis_predict import WEATHER_COLUMNS, PlayerTable
+from tennis_results import BacktestReport, CalibrationBucket
+from tennis_system import DEFAULT_FORMULA, SURFACES, FormulaParams
+
+# Вероятности в log loss ограничиваются, чтобы ограничение 0/1 не дало бесконечность
+EPS = 1e-12
+BUCKETS = 10
+# Элементов (наборы × матчи) в одном блоке вычислений - около 32 МБ float64
+BLOCK_ELEMENTS = 4000000
+
+# Границы и шаги первой сетки подбора
+WEIGHT_RANGE = (0.0, 2.0)
+WEIGHT_STEPS = 21
+PROB_MIN_RANGE = (0.0, 0.45)
+PROB_MIN_STEPS = 10
+REFINE_ROUNDS = 3
+REFINE_STEPS = 11
+
+BacktestData = namedtuple('BacktestData', 'base surface_diff weather_diff outcome')
+
+
+def load_matches(conn, table=None):
+    """Матчи из таблицы matches в виде BacktestData (матчи неизвестных игроков пропускаются)"""
+    table = table if table is not None else PlayerTable.from_connection(conn)
+    rows = conn.execute('SELECT player1_id, player2_id, winner_id, surface, weather FROM matches').fetchall()
+    if not rows or len(table) == 0:
+        empty = np.empty(0)
+        return BacktestData(empty, empty, empty, empty)
+
+    p1 = np.array([r[0] for r in rows], dtype=np.int64)
+    p2 = np.array([r[1] for r in rows], dtype=np.int64)
+    winner = np.array([r[2] for r in rows], dtype=np.int64)
+    surface_col = {s: i for i, s in enumerate(SURFACES)}
+    weather_col = {w: i for i, w in enumerate(WEATHER_COLUMNS)}
+    surface = np.array([surface_col.get(r[3], -1) for r in rows], dtype=np.int64)
+    weather = np.array([weather_col.get(r[4], -1) for r in rows], dtype=np.int64)
+
+    rows1 = np.minimum(np.searchsorted(table.ids, p1), len(table) - 1)
+    rows2 = np.minimum(np.searchsorted(table.ids, p2), len(table) - 1)
+    known = (table.ids[rows1] == p1) & (table.ids[rows2] == p2)
+    rows1, rows2, winner, p1 = rows1[known], rows2[known], winner[known], p1[known]
+    surface, weather = surface[known], weather[known]
+
+    points1, points2 = table.points[rows1], table.points[rows2]
+    total = points1 + points2
+    base = np.divide(points1, total, out=np.full(len(total), 0.5), where=total > 0)
+
+    def diff(matrix, column):
+        # Нет условия или статистики у одного из игроков - поправки нет
+        col = np.maximum(column, 0)
+        value = matrix[rows1, col] - matrix[rows2, col]
+        return np.where((column >= 0) & ~np.isnan(value), value, 0.0)
+
+    return BacktestData(base, diff(table.surface_win, surface), diff(table.weather_win, weather),
+                        (winner == p1).astype(np.float64))
+
+
+def predict(data, params):
+    """Вероятности победы первого игрока; params - FormulaParams из чисел или массивов длины k
+
+    Для массивов результат формы (k, матчей).
+    """
+    sw, ww, lo, hi = (np.asarray(v, dtype=np.float64)[..., None] for v in params)
+    prob = data.base + sw * data.surface_diff + ww * data.weather_diff
+    return np.minimum(np.maximum(prob, lo), hi)
+
+
+def _metrics(prob, outcome):
+    """log loss и Brier по последней оси"""
+    clipped = np.clip(prob, EPS, 1 - EPS)
+    log_loss = -np.mean(outcome * np.log(clipped) + (1 - outcome) * np.log(1 - clipped), axis=-1)
+    brier = np.mean((prob - outcome) ** 2, axis=-1)
+    return log_loss, brier
+
+
+def calibration(prob, outcome, buckets=BUCKETS):
+    """Корзины предсказанной вероятности: сколько матчей, средний прогноз, доля побед"""
+    index = np.minimum((prob * buckets).astype(np.int64), buckets - 1)
+    counts = np.bincount(index, minlength=buckets)
+    predicted = np.bincount(index, weights=prob, minlength=buckets)
+    observed = np.bincount(index, weights=outcome, minlength=buckets)
+    result = []
+    for b in range(buckets):
+        if counts[b]:
+            result.append(CalibrationBucket(b / buckets, (b + 1) / buckets, int(counts[b]),
+                                            float(predicted[b] / counts[b]), float(observed[b] / counts[b])))
+    return result
+
+
+def evaluate(data, params=DEFAULT_FORMULA, buckets=BUCKETS):
+    """Качество одного набора параметров: BacktestReport"""
+    params = FormulaParams._make(float(v) for v in params)
+    n = len(data.outcome)
+    if n == 0:
+        return BacktestReport(params, 0, None, None, None, [])
+    prob = predict(data, params)
+    log_loss, brier = _metrics(prob, data.outcome)
+    accuracy = np.mean(np.where(prob == 0.5, 0.5, (prob > 0.5) == (data.outcome == 1)))
+    return BacktestReport(params, n, float(log_loss), float(brier), float(accuracy),
+                          calibration(prob, data.outcome, buckets))
+
+
+def evaluate_many(data, grid):
+    """log loss и Brier для массива наборов grid (k × 4) блоками"""
+    grid = np.asarray(grid, dtype=np.float64).reshape(-1, 4)
+    block = max(1, BLOCK_ELEMENTS // max(1, len(data.outcome)))
+    log_loss = np.empty(len(grid))
+    brier = np.empty(len(grid))
+    for start in range(0, len(grid), block):
+        part = grid[start:start + block]
+        prob = predict(data, FormulaParams(*part.T))
+        log_loss[start:start + block], brier[start:start + block] = _metrics(prob, data.outcome)
+    return log_loss, brier
+
+
+def make_grid(surface_weights, weather_weights, prob_mins):
+    """Все сочетания весов и симметричного ограничения: массив (k × 4)"""
+    sw, ww, lo = np.meshgrid(surface_weights, weather_weights, prob_mins, indexing='ij')
+    return np.column_stack([sw.ravel(), ww.ravel(), lo.ravel(), 1.0 - lo.ravel()])
+
+
+# --- пул процессов ---
+
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _evaluate_job(grid):
+    return evaluate_many(_worker_data, grid)
+
+
+def search(data, grid, workers=1, pool=None):
+    """log loss и Brier для всех наборов grid; при pool - частями в пуле процессов"""
+    if pool is None or workers <= 1 or len(grid) < 2 * workers:
+        return evaluate_many(data, grid)
+    parts = np.array_split(grid, workers * 4)
+    results = list(pool.map(_evaluate_job, parts))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def _around(center, span, low, high, steps):
+    return np.unique(np.clip(np.linspace(center - span, center + span, steps), low, high))
+
+
+def fit(data, workers=None, rounds=REFINE_ROUNDS, progress=None):
+    """Подобрать FormulaParams с минимальным log loss; возвращает (параметры, число проверенных наборов)"""
+    if len(data.outcome) == 0:
+        raise ValueError("В таблице matches нет матчей известных игроков")
+    workers = workers or os.cpu_count() or 1
+    weights = np.linspace(*WEIGHT_RANGE, WEIGHT_STEPS)
+    prob_mins = np.linspace(*PROB_MIN_RANGE, PROB_MIN_STEPS)
+    grid = make_grid(weights, weights, prob_mins)
+    weight_span = (WEIGHT_RANGE[1] - WEIGHT_RANGE[0]) / (WEIGHT_STEPS - 1)
+    prob_span = (PROB_MIN_RANGE[1] - PROB_MIN_RANGE[0]) / (PROB_MIN_STEPS - 1)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,))
+    try:
+        best, best_loss, tried = None, np.inf, 0
+        for round_ in range(rounds + 1):
+            log_loss, _ = search(data, grid, workers, pool)
+            tried += len(grid)
+            i = int(np.argmin(log_loss))
+            if log_loss[i] < best_loss:
+                best, best_loss = grid[i], float(log_loss[i])
+            if progress:
+                progress(round_, len(grid), FormulaParams(*best.tolist()), best_loss)
+            # Следующий раунд - сетка вокруг лучшей точки с шагом вдвое меньше
+            grid = make_grid(_around(best[0], weight_span, *WEIGHT_RANGE, REFINE_STEPS),
+                             _around(best[1], weight_span, *WEIGHT_RANGE, REFINE_STEPS),
+                             _around(best[2], prob_span, *PROB_MIN_RANGE, REFINE_STEPS))
+            weight_span /= 2
+            prob_span /= 2
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return FormulaParams(*best.tolist()), tried
+
+
+# --- файлы параметров ---
+
+def save_params(path, params, report=None):
+    """Записать параметры (и метрики подбора) в JSON"""
+    data = dict(FormulaParams._make(params)._asdict())
+    if report is not None:
+        data.update(matches=report.matches, log_loss=report.log_loss, brier=report.brier)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_params(path):
+    """FormulaParams из JSON, записанного save_params"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return FormulaParams(*(float(data[field]) for field in FormulaParams._fields))
+
+
+def print_report(report, title):
+    print(f"\n{title}")
+    print(f"  параметры: покрытие {report.params.surface_weight:.3f}, погода {report.params.weather_weight:.3f}, "
+          f"ограничение [{report.params.prob_min:.3f}, {report.params.prob_max:.3f}]")
+    if not report.matches:
+        print("  матчей нет")
+        return
+    print(f"  матчей: {report.matches}, log loss: {report.log_loss:.4f}, Brier: {report.brier:.4f}, "
+          f"точность: {report.accuracy:.1%}")
+    print("  прогноз        матчей   средний   побед")
+    for bucket in report.calibration:
+        print(f"  {bucket.low:.1f}-{bucket.high:.1f}   {bucket.matches:9d}   {bucket.predicted:7.3f}   "
+              f"{bucket.observed:5.3f}")
+
+
+def main():
+    import argparse
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Проверка и подбор параметров формулы прогноза')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--fit', action='store_true', help='подобрать параметры по матчам')
+    parser.add_argument('--params', default=None, help='JSON с параметрами вместо действующих')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--rounds', type=int, default=REFINE_ROUNDS, help='раундов уточнения после сетки')
+    parser.add_argument('--buckets', type=int, default=BUCKETS)
+    parser.add_argument('--save', action='store_true', help='записать параметры в базу (их берёт прогноз)')
+    parser.add_argument('--out', default=None, help='записать параметры в JSON')
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    start = time.perf_counter()
+    data = load_matches(db.conn, db.get_player_table())
+    print(f"Матчей: {len(data.outcome)} (загрузка {time.perf_counter() - start:.2f} с)")
+
+    params = load_params(args.params) if args.params else db.formula
+    current = evaluate(data, params, args.buckets)
+    print_report(current, 'ПАРАМЕТРЫ ИЗ ФАЙЛА' if args.params else 'ДЕЙСТВУЮЩИЕ ПАРАМЕТРЫ')
+
+    report = current
+    if args.fit:
+        def progress(round_, size, best, loss):
+            print(f"Раунд {round_}: {size} наборов, лучший log loss {loss:.5f}")
+
+        start = time.perf_counter()
+        fitted, tried = fit(data, args.workers, args.rounds, progress)
+        seconds = time.perf_counter() - start
+        report = evaluate(data, fitted, args.buckets)
+        print_report(report, 'ПОДОБРАННЫЕ ПАРАМЕТРЫ')
+        print(f"\nПроверено {tried} наборов за {seconds:.1f} с "
+              f"({tried * len(data.outcome) / seconds if seconds > 0 else 0:.0f} прогнозов/с)")
+    if args.out:
+        save_params(args.out, report.params, report)
+        print(f"✅ Параметры записаны в {args.out}")
+    if args.save:
+        db.save_formula_params(report.params, report)
+        print("✅ Параметры записаны в базу")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
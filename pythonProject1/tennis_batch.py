@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""Пакетные запросы без меню: подкоманды, JSON Lines, пул процессов
+
+    python tennis_system.py --db tennis_atp.db predict pairs.txt --model elo > out.jsonl
+    python tennis_batch.py --db tennis_atp.db analyze - < players.txt
+    python tennis_batch.py rank -q 10
+    python tennis_batch.py h2h -q "Sinner,Alcaraz" -q "Zverev,Medvedev"
+
+Подкоманды: rank, analyze, predict, similar, top-surface, countries,
+search, h2h. Запрос - строка файла (или stdin, '-') либо -q: JSON-объект
+с полями команды, JSON-массив или текст, поля которого разделены
+табуляцией или запятой (predict: игрок1, игрок2, покрытие, погода,
+модель). Отсутствующие поля берутся из опций (--surface, --limit, ...).
+
+На каждый запрос выводится одна строка JSON в том же порядке: результат
+или {"line": N, "error": "..."}. Большие пакеты делятся на порции по
+--chunk запросов и считаются в пуле процессов; каждый рабочий процесс
+открывает базу своим снимком только для чтения (tennis_snapshot).
+Прогресс и скорость - в stderr.
+"""
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from tennis_predict import WEATHER_COLUMNS
+from tennis_results import Prediction, to_json
+from tennis_system import PREDICTION_MODELS, SURFACES, TennisDatabase
+
+CHUNK = 2000
+PROGRESS_SECONDS = 1.0
+
+# Команда -> поля запроса по порядку и значения по умолчанию
+COMMANDS = {
+    'rank': (('limit',), {'limit': 50}),
+    'analyze': (('player',), {}),
+    'predict': (('player1', 'player2', 'surface', 'weather', 'model'),
+                {'surface': 'hard', 'weather': 'sunny', 'model': 'formula'}),
+    'similar': (('player', 'k'), {'k': 5}),
+    'top-surface': (('surface', 'limit'), {'surface': 'hard', 'limit': 10}),
+    'countries': (('limit',), {'limit': 15}),
+    'search': (('query', 'limit'), {'limit': 20}),
+    'h2h': (('player1', 'player2'), {}),
+}
+
+COMMAND_HELP = {
+    'rank': 'рейтинг: топ-limit',
+    'analyze': 'статистика игрока по покрытиям и погоде',
+    'predict': 'прогноз матча',
+    'similar': 'похожие игроки',
+    'top-surface': 'лучшие на покрытии',
+    'countries': 'статистика по странам',
+    'search': 'поиск по имени или стране',
+    'h2h': 'сравнение двух игроков',
+}
+
+INT_FIELDS = ('limit', 'k')
+
+
+class QueryError(Exception):
+    """Ошибка одного запроса: попадает в вывод, пакет продолжается"""
+
+
+def parse_query(command, text, defaults=None):
+    """Строка запроса -> словарь полей команды с подставленными умолчаниями"""
+    fields, command_defaults = COMMANDS[command]
+    text = text.strip()
+    if text.startswith('{') or text.startswith('['):
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise QueryError('некорректный JSON')
+        query = dict(zip(fields, value)) if isinstance(value, list) else value
+        if not isinstance(query, dict):
+            raise QueryError('запрос должен быть объектом или массивом')
+    elif text:
+        parts = text.split('\t' if '\t' in text else ',', len(fields) - 1)
+        query = {field: part.strip() for field, part in zip(fields, parts) if part.strip()}
+    else:
+        query = {}
+
+    for field in fields:
+        if query.get(field) is None:
+            value = (defaults or {}).get(field)
+            query[field] = command_defaults.get(field) if value is None else value
+        if query[field] is None:
+            raise QueryError(f"не указано поле '{field}'")
+        if field in INT_FIELDS:
+            try:
+                query[field] = int(query[field])
+            except (TypeError, ValueError):
+                raise QueryError(f"поле '{field}' должно быть числом")
+        elif not isinstance(query[field], str):
+            query[field] = str(query[field])
+    if query.get('surface', SURFACES[0]) not in SURFACES:
+        raise QueryError(f"неизвестное покрытие '{query['surface']}'")
+    if query.get('weather', WEATHER_COLUMNS[0]) not in WEATHER_COLUMNS:
+        raise QueryError(f"неизвестная погода '{query['weather']}'")
+    if query.get('model', PREDICTION_MODELS[0]) not in PREDICTION_MODELS:
+        raise QueryError(f"неизвестная модель '{query['model']}'")
+    return query
+
+
+def _found(value, *names):
+    if value is None:
+        raise QueryError(f"игрок не найден: {' / '.join(names)}")
+    return value
+
+
+def run_query(db, command, query):
+    """Выполнить разобранный запрос: структура для json.dumps"""
+    if command == 'rank':
+        return to_json(list(db.ranking(query['limit'])))
+    if command == 'analyze':
+        return to_json(_found(db.player_analysis(query['player']), query['player']))
+    if command == 'predict':
+        return to_json(_found(db.prediction(query['player1'], query['player2'], query['surface'],
+                                            query['weather'], query['model']),
+                              query['player1'], query['player2']))
+    if command == 'similar':
+        return to_json(_found(db.similar_players(query['player'], query['k']), query['player']))
+    if command == 'top-surface':
+        return to_json(db.top_by_surface(query['surface'], query['limit']))
+    if command == 'countries':
+        return to_json(db.country_stats(query['limit']))
+    if command == 'search':
+        return [dict(item._asdict(), score=round(item.score, 3))
+                for item in db.search(query['query'], query['limit'])]
+    if command == 'h2h':
+        result = _found(db.head_to_head(query['player1'], query['player2']),
+                        query['player1'], query['player2'])
+        data = to_json(result)
+        data['points_diff'] = result.points_diff
+        return data
+    raise ValueError(f"Неизвестная команда '{command}'")
+
+
+def _predict_group(db, items, surface, weather, model, players):
+    """Прогнозы с одинаковыми условиями - одним векторным вычислением
+
+    players - общий для порции словарь имя -> PlayerInfo: имена в пакете
+    повторяются, и поиск каждого идёт один раз.
+    """
+    def player(name):
+        if name not in players:
+            players[name] = db.player_info(name)
+        return players[name]
+
+    results = {}
+    pairs, found = [], []
+    for line, query in items:
+        p1, p2 = player(query['player1']), player(query['player2'])
+        if p1 is None or p2 is None:
+            results[line] = {'line': line, 'error': f"игрок не найден: {query['player1']} / {query['player2']}"}
+            continue
+        pairs.append((p1.id, p2.id))
+        found.append((line, p1, p2))
+    if pairs:
+        probs = db.predict_matches(pairs, surface, weather, model).tolist()
+        for (line, p1, p2), prob in zip(found, probs):
+            results[line] = to_json(Prediction(p1.id, p1.name, p2.id, p2.name, surface, weather, prob))
+    return results
+
+
+def run_chunk(db, command, lines, defaults=None):
+    """Порция [(номер строки, текст)] -> (строки JSON по порядку, число ошибок)"""
+    results, parsed = {}, []
+    for line, text in lines:
+        try:
+            parsed.append((line, parse_query(command, text, defaults)))
+        except QueryError as e:
+            results[line] = {'line': line, 'error': str(e)}
+
+    if command == 'predict':
+        groups, players = {}, {}
+        for line, query in parsed:
+            groups.setdefault((query['surface'], query['weather'], query['model']), []).append((line, query))
+        for (surface, weather, model), items in groups.items():
+            results.update(_predict_group(db, items, surface, weather, model, players))
+    else:
+        for line, query in parsed:
+            try:
+                results[line] = run_query(db, command, query)
+            except QueryError as e:
+                results[line] = {'line': line, 'error': str(e)}
+
+    out, errors = [], 0
+    for line, _ in lines:
+        result = results[line]
+        if isinstance(result, dict) and 'error' in result and result.get('line') == line:
+            errors += 1
+        out.append(json.dumps(result, ensure_ascii=False))
+    return out, errors
+
+
+# --- рабочие процессы ---
+
+_worker = None
+
+
+def worker_snapshot(db_name, snapshot=None):
+    """Режим снимка рабочих процессов: mmap, если журнал WAL сброшен в файл, иначе memory"""
+    if snapshot:
+        return snapshot
+    wal = db_name + '-wal'
+    return 'memory' if os.path.exists(wal) and os.path.getsize(wal) > 0 else 'mmap'
+
+
+def _init_worker(db_name, snapshot, command, defaults):
+    global _worker
+    _worker = (TennisDatabase(db_name, snapshot=snapshot), command, defaults)
+
+
+def _chunk_job(lines):
+    db, command, defaults = _worker
+    return run_chunk(db, command, lines, defaults)
+
+
+def _chunks(lines, size):
+    chunk = []
+    for number, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        chunk.append((number, text))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Progress:
+    """Счётчики пакета и отчёт в stderr не чаще раза в PROGRESS_SECONDS"""
+
+    def __init__(self, stream=sys.stderr, interval=PROGRESS_SECONDS):
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.queries = 0
+        self.errors = 0
+
+    def add(self, queries, errors):
+        self.queries += queries
+        self.errors += errors
+        now = time.perf_counter()
+        if self.stream is not None and now - self.last >= self.interval:
+            self.last = now
+            print(f"Обработано {self.queries} запросов ({self.rate():.0f}/с)...", file=self.stream)
+
+    def seconds(self):
+        return time.perf_counter() - self.start
+
+    def rate(self):
+        seconds = self.seconds()
+        return self.queries / seconds if seconds > 0 else 0.0
+
+
+def run_batch(db_name, command, lines, out, defaults=None, workers=None, chunk=CHUNK,
+              snapshot=None, progress=None):
+    """Выполнить запросы lines и записать ответы JSON Lines в out по порядку
+
+    Если запросов больше одной порции и workers > 1, порции считаются в
+    пуле процессов; в работе одновременно не больше 2 * workers порций,
+    так что вход читается потоком. Возвращает отчёт.
+    """
+    if command not in COMMANDS:
+        raise ValueError(f"Неизвестная команда '{command}', доступны: {', '.join(COMMANDS)}")
+    progress = progress or Progress(stream=None)
+    chunks = _chunks(lines, chunk)
+    head = [chunk for _, chunk in zip(range(2), chunks)]
+    workers = workers or os.cpu_count() or 1
+
+    def write(result):
+        rows, errors = result
+        out.write('\n'.join(rows) + '\n')
+        progress.add(len(rows), errors)
+
+    if workers <= 1 or len(head) <= 1:
+        db = TennisDatabase(db_name, snapshot=snapshot)
+        try:
+            for part in head:
+                write(run_chunk(db, command, part, defaults))
+            for part in chunks:
+                write(run_chunk(db, command, part, defaults))
+        finally:
+            db.close()
+        workers = 1
+    else:
+        initargs = (db_name, worker_snapshot(db_name, snapshot), command, defaults)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            pending = deque(pool.submit(_chunk_job, part) for part in head)
+            for part in chunks:
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+                pending.append(pool.submit(_chunk_job, part))
+            while pending:
+                write(pending.popleft().result())
+    out.flush()
+    return {'queries': progress.queries, 'errors': progress.errors, 'workers': workers,
+            'seconds': progress.seconds(), 'queries_per_sec': progress.rate()}
+
+
+# --- командная строка ---
+
+def add_batch_commands(parser):
+    """Добавить подкоманды пакетных запросов в parser (args.command)"""
+    subparsers = parser.add_subparsers(dest='command', metavar='команда')
+    for command, (fields, command_defaults) in COMMANDS.items():
+        sub = subparsers.add_parser(command, help=COMMAND_HELP[command],
+                                    description=f"{COMMAND_HELP[command]}; поля запроса: {', '.join(fields)}")
+        sub.add_argument('source', nargs='?', default='-', help="файл запросов или '-' (stdin)")
+        sub.add_argument('-q', '--query', action='append', default=None,
+                         help='запрос прямо в командной строке (можно несколько)')
+        for field in fields:
+            if field in command_defaults:
+                kwargs = {'type': int} if field in INT_FIELDS else {}
+                if field == 'surface':
+                    kwargs['choices'] = SURFACES
+                elif field == 'weather':
+                    kwargs['choices'] = WEATHER_COLUMNS
+                elif field == 'model':
+                    kwargs['choices'] = PREDICTION_MODELS
+                sub.add_argument(f'--{field}', default=None, help=f"по умолчанию {command_defaults[field]}",
+                                 **kwargs)
+        sub.add_argument('--workers', type=int, default=None, help='процессов (по умолчанию - все ядра)')
+        sub.add_argument('--chunk', type=int, default=CHUNK, help='запросов в порции')
+        sub.add_argument('--out', default=None, help='файл для результатов (по умолчанию stdout)')
+    return subparsers
+
+
+def run_command(args):
+    """Выполнить подкоманду из разобранных аргументов; код возврата"""
+    fields = COMMANDS[args.command][0]
+    defaults = {field: getattr(args, field, None) for field in fields}
+    out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+    source = None
+    try:
+        if args.query:
+            lines = args.query
+        elif args.source == '-':
+            lines = sys.stdin
+        else:
+            lines = source = open(args.source, encoding='utf-8')
+        report = run_batch(args.db, args.command, lines, out, defaults, args.workers, args.chunk,
+                           getattr(args, 'snapshot', None), Progress())
+    finally:
+        if source is not None:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"Запросов: {report['queries']}, ошибок: {report['errors']}, процессов: {report['workers']}, "
+          f"{report['seconds']:.2f} с ({report['queries_per_sec']:.0f} запросов/с)", file=sys.stderr)
+    return 1 if report['errors'] else 0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Пакетные запросы к теннисной базе (JSON Lines)')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--snapshot', default=None, choices=('memory', 'mmap'),
+                        help='режим снимка базы (по умолчанию рабочие процессы - mmap)')
+    add_batch_commands(parser).required = True
+    args = parser.parse_args()
+    sys.exit(run_command(args))
+
+
+if __name__ == "__main__":
+    main()
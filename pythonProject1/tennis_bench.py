@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Набор бенчмарков на синтетических базах разного размера
+
+    python tennis_bench.py run --scales 200,10000 --out bench.json
+    python tennis_bench.py compare base.json bench.json --threshold 0.2
+
+Базы генерируются воспроизводимо (фиксированное зерно) по той же схеме,
+что и create_tables, и кешируются в каталоге --data-dir. Для каждой
+операции замеряется холодный вызов (новое соединение, пустые кеши),
+затем серия тёплых вызовов: перцентили задержки, операций в секунду и
+пиковая память Python (tracemalloc, отдельным вызовом).
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from tennis_generator import COUNTRIES, SYLLABLES
+from tennis_system import TennisDatabase
+
+DEFAULT_SCALES = (200, 10000)
+SEED = 2025
+
+
+def synthetic_players(n, seed=SEED):
+    """Воспроизводимый список игроков: уникальные имена, убывающие очки"""
+    rng = random.Random(seed)
+    for ranking in range(1, n + 1):
+        first = ''.join(rng.choice(SYLLABLES) for _ in range(2)).capitalize()
+        last = ''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+        # Номер в имени гарантирует уникальность (name, country)
+        name = f"{first} {last} {ranking}"
+        points = max(1, int(12000 / ranking ** 0.6))
+        yield (ranking, name, rng.choice(COUNTRIES), points, rng.randint(17, 38),
+               'left' if rng.random() < 0.12 else 'right')
+
+
+def make_dataset(path, n_players, seed=SEED):
+    """Создать базу с n_players игроками, если её ещё нет"""
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            count = conn.execute('SELECT COUNT(*) FROM players').fetchone()[0]
+        except sqlite3.Error:
+            count = -1
+        conn.close()
+        if count == n_players:
+            return path
+        os.remove(path)
+
+    db = TennisDatabase(path)
+    loader_report = db.bulk_load_players(synthetic_players(n_players, seed), batch_size=20000, seed=seed)
+    db.close()
+    print(f"  создана база {path}: {n_players} игроков за {loader_report['seconds']:.1f} с", file=sys.stderr)
+    return path
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _quiet(fn, *args):
+    # Методы TennisDatabase печатают результат - в бенчмарке вывод глушим
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def measure(open_db, op, iterations):
+    """Холодный вызов + iterations тёплых. Возвращает словарь метрик"""
+    db = open_db()
+    start = time.perf_counter()
+    _quiet(op, db, 0)
+    cold = time.perf_counter() - start
+
+    times = []
+    total_start = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        _quiet(op, db, i + 1)
+        times.append(time.perf_counter() - start)
+    total = time.perf_counter() - total_start
+
+    tracemalloc.start()
+    _quiet(op, db, iterations + 1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+
+    times.sort()
+    return {
+        'cold_ms': cold * 1000,
+        'p50_ms': _percentile(times, 50) * 1000,
+        'p90_ms': _percentile(times, 90) * 1000,
+        'p99_ms': _percentile(times, 99) * 1000,
+        'ops_per_sec': iterations / total if total > 0 else 0.0,
+        'peak_kb': peak / 1024,
+        'iterations': iterations,
+    }
+
+
+def scale_operations(names):
+    """Операции над готовой базой: op(db, i)"""
+    count = len(names)
+
+    def pick(i, shift=0):
+        return names[(i * 7919 + shift) % count]
+
+    return {
+        'predict_match': lambda db, i: db.predict_match(pick(i), pick(i, 1), 'clay', 'rainy'),
+        'search_players': lambda db, i: db.search_players(pick(i).split()[1]),
+        'find_similar_players': lambda db, i: db.find_similar_players(pick(i)),
+        'get_top_players_by_surface': lambda db, i: db.get_top_players_by_surface('grass', 10),
+        'get_country_stats': lambda db, i: db.get_country_stats(),
+    }
+
+
+def bench_ingest(iterations=3):
+    """load_all_200_players: построчный путь и bulk, каждый раз на новой базе"""
+    results = {}
+    for label, bulk in (('load_all_200_players', False), ('load_all_200_players_bulk', True)):
+        times = []
+        for _ in range(iterations):
+            with tempfile.TemporaryDirectory() as tmp:
+                db = TennisDatabase(os.path.join(tmp, 'ingest.db'))
+                start = time.perf_counter()
+                _quiet(db.load_all_200_players, bulk)
+                times.append(time.perf_counter() - start)
+                db.close()
+        times.sort()
+        results[label] = {
+            'cold_ms': times[0] * 1000,
+            'p50_ms': _percentile(times, 50) * 1000,
+            'p90_ms': _percentile(times, 90) * 1000,
+            'p99_ms': _percentile(times, 99) * 1000,
+            'ops_per_sec': 1.0 / _percentile(times, 50),
+            'players_per_sec': 200 / _percentile(times, 50),
+            'iterations': iterations,
+        }
+    return results
+
+
+def run_suite(scales=DEFAULT_SCALES, data_dir='bench_data', iterations=50, ops=None):
+    os.makedirs(data_dir, exist_ok=True)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': SEED,
+        },
+        'results': {'ingest': bench_ingest()},
+    }
+
+    for n in scales:
+        path = make_dataset(os.path.join(data_dir, f'bench_{n}.db'), n)
+        conn = sqlite3.connect(path)
+        names = [row[0] for row in conn.execute('SELECT name FROM players ORDER BY ranking LIMIT 1000')]
+        conn.close()
+
+        scale_results = {}
+        for name, op in scale_operations(names).items():
+            if ops and name not in ops:
+                continue
+            # На больших базах тяжёлые операции повторяем реже
+            reps = iterations if n <= 10000 else max(5, iterations // 10)
+            scale_results[name] = measure(lambda: TennisDatabase(path), op, reps)
+            print(f"  {n:>8} {name:28} p50 {scale_results[name]['p50_ms']:9.3f} мс", file=sys.stderr)
+        report['results'][str(n)] = scale_results
+    return report
+
+
+def compare(base, new, threshold=0.2, metric='p50_ms'):
+    """Сравнить два отчёта: список (группа, операция, было, стало, изменение, регрессия)"""
+    rows = []
+    for group, ops in new['results'].items():
+        for op, metrics in ops.items():
+            old = base['results'].get(group, {}).get(op)
+            if not old or metric not in old or metric not in metrics:
+                continue
+            before, after = old[metric], metrics[metric]
+            change = (after - before) / before if before else 0.0
+            rows.append((group, op, before, after, change, change > threshold))
+    return rows
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Бенчмарки теннисной системы')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='прогнать бенчмарки')
+    run_parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help='размеры баз через запятую, например 200,10000,1000000')
+    run_parser.add_argument('--data-dir', default='bench_data')
+    run_parser.add_argument('--iterations', type=int, default=50)
+    run_parser.add_argument('--ops', default=None, help='только эти операции (через запятую)')
+    run_parser.add_argument('--out', default=None, help='файл для JSON-отчёта (по умолчанию stdout)')
+
+    cmp_parser = sub.add_parser('compare', help='сравнить два отчёта')
+    cmp_parser.add_argument('base')
+    cmp_parser.add_argument('new')
+    cmp_parser.add_argument('--threshold', type=float, default=0.2, help='допустимый рост (0.2 = 20%%)')
+    cmp_parser.add_argument('--metric', default='p50_ms')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        scales = [int(s) for s in args.scales.split(',')]
+        ops = set(args.ops.split(',')) if args.ops else None
+        report = run_suite(scales, args.data_dir, args.iterations, ops)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            print(text)
+        return
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    regressions = 0
+    for group, op, before, after, change, regressed in compare(base, new, args.threshold, args.metric):
+        mark = '❌' if regressed else '  '
+        print(f"{mark} {group:>8} {op:28} {before:10.3f} -> {after:10.3f} ({change:+.1%})")
+        regressions += regressed
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Кеш результатов читающих методов TennisDatabase
+
+Запись кеша - результат метода по ключу (имя метода, аргументы) и id
+игроков, от которых он зависит. TennisDatabase сообщает о каждой записи
+в базу списком изменённых игроков (add_write_listener), и удаляются
+только записи этих игроков; None - изменилось всё, кеш очищается.
+
+Размер ограничен числом записей (вытесняется давно не читавшаяся, LRU),
+ttl задаёт срок жизни записи - на случай, если базу меняет другой процесс.
+Загрузка идёт без блокировки; если пока она шла, игроков инвалидировали,
+результат возвращается, но в кеш не попадает.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+# Сколько лучших игроков рейтинга прогревать при включении
+WARM_TOP = 20
+
+
+class ResultCache:
+    """LRU-кеш с TTL и инвалидацией по id игроков (потокобезопасный)"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None, clock=time.monotonic):
+        if max_entries < 1:
+            raise ValueError("max_entries должен быть положительным")
+        self.max_entries = max_entries
+        self.ttl = ttl or None
+        self.clock = clock
+        self._entries = OrderedDict()     # ключ -> (значение, истекает, id игроков)
+        self._by_player = {}              # id игрока -> ключи его записей
+        self._versions = {}               # id игрока -> число его инвалидаций
+        self._generation = 0              # число полных очисток
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _stamp(self, player_ids):
+        return self._generation, tuple(self._versions.get(pid, 0) for pid in player_ids)
+
+    def _remove(self, key):
+        _, _, player_ids = self._entries.pop(key)
+        for pid in player_ids:
+            keys = self._by_player.get(pid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_player[pid]
+
+    def get(self, key, player_ids, load):
+        """Значение по ключу; при промахе - load() и запись в кеш"""
+        player_ids = tuple(player_ids)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+                self.expired += 1
+            self.misses += 1
+            stamp = self._stamp(player_ids)
+
+        value = load()
+
+        with self._lock:
+            if self._stamp(player_ids) != stamp:
+                return value
+            if key in self._entries:
+                self._remove(key)
+            expires = self.clock() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires, player_ids)
+            for pid in player_ids:
+                self._by_player.setdefault(pid, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, player_ids=None):
+        """Удалить записи игроков player_ids (None - все записи)"""
+        with self._lock:
+            if player_ids is None:
+                self.invalidated += len(self._entries)
+                self._entries.clear()
+                self._by_player.clear()
+                self._versions.clear()
+                self._generation += 1
+                return
+            for pid in player_ids:
+                pid = int(pid)
+                self._versions[pid] = self._versions.get(pid, 0) + 1
+                for key in list(self._by_player.get(pid, ())):
+                    self._remove(key)
+                    self.invalidated += 1
+
+    def stats(self):
+        """Счётчики кеша для мониторинга"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions, 'expired': self.expired, 'invalidated': self.invalidated}
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Бинарный колоночный снимок игроков для общего доступа через mmap
+
+    python tennis_colsnap.py --db tennis_atp.db players.tsnap
+    python tennis_colsnap.py --info players.tsnap
+
+Файл - заголовок фиксированной ширины и секции-массивы, выровненные по
+64 байтам:
+
+    magic 'TNSCOLS\\0' | версия u4 | число секций u4 | игроков u8
+    секции: имя 24s | dtype 8s | смещение u8 | строк u8 | столбцов u8
+
+Колонки игроков (по возрастанию id), статистика по покрытиям (N×3) и
+погоде (N×6, как WEATHER_COLUMNS), имена и страны - таблица смещений
+(N+1) и общий блок UTF-8. ColumnSnapshot.open отображает файл в память
+и отдаёт секции как NumPy-массивы только для чтения, без копирования и
+разбора: процессы, открывшие один файл, делят одни и те же страницы.
+Прогноз (player_table) и поиск похожих (similarity_index) работают
+прямо на этих массивах.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from tennis_predict import WEATHER_COLUMNS, PlayerTable
+from tennis_system import SURFACES
+
+MAGIC = b'TNSCOLS\0'
+FORMAT_VERSION = 1
+ALIGN = 64
+
+_HEADER = struct.Struct('<8sIIQ')
+_SECTION = struct.Struct('<24s8sQQQ')
+
+# Числовые секции: имя -> (dtype, столбцов; None - одномерная)
+NUMERIC_SECTIONS = {
+    'ids': ('<i8', None),
+    'ranking': ('<i8', None),           # 0 - без рейтинга
+    'points': ('<f8', None),
+    'age': ('<f4', None),               # NaN - неизвестен
+    'hand': ('<i1', None),              # 1 - левша
+    'surface_win': ('<f8', len(SURFACES)),
+    'surface_matches': ('<f4', len(SURFACES)),
+    'surface_points_won': ('<f4', len(SURFACES)),
+    'weather_win': ('<f8', len(WEATHER_COLUMNS)),
+    'weather_matches': ('<f4', len(WEATHER_COLUMNS)),
+}
+TEXT_COLUMNS = ('name', 'country')
+
+
+def _encode_text(values):
+    """Строки -> (смещения u8[N+1], блок UTF-8)"""
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def read_columns(conn):
+    """Все секции снимка из базы: {имя секции: массив}"""
+    players = conn.execute(
+        'SELECT id, ranking, points, age, hand, name, country FROM players ORDER BY id').fetchall()
+    n = len(players)
+    # Статистика, которой нет в базе, остаётся NaN
+    columns = {name: np.full((n, cols), np.nan, dtype=dtype)
+               for name, (dtype, cols) in NUMERIC_SECTIONS.items() if cols}
+    if n:
+        ids, ranking, points, age, hand, names, countries = zip(*players)
+    else:
+        ids = ranking = points = age = hand = names = countries = ()
+    columns['ids'] = np.array(ids, dtype='<i8')
+    columns['ranking'] = np.array([r or 0 for r in ranking], dtype='<i8')
+    columns['points'] = np.array([p or 0 for p in points], dtype='<f8')
+    columns['age'] = np.array([np.nan if a is None else a for a in age], dtype='<f4')
+    columns['hand'] = np.array([h == 'left' for h in hand], dtype='<i1')
+
+    ids = columns['ids']
+
+    def fill(sql, keys, targets):
+        stats = conn.execute(sql).fetchall()
+        if not stats or not n:
+            return
+        player_ids = np.array([s[0] for s in stats], dtype=np.int64)
+        cols = np.array([keys.get(s[1], -1) for s in stats], dtype=np.int64)
+        rows = np.minimum(np.searchsorted(ids, player_ids), n - 1)
+        ok = (cols >= 0) & (ids[rows] == player_ids)
+        for k, target in enumerate(targets, 2):
+            values = np.array([np.nan if s[k] is None else s[k] for s in stats], dtype=np.float64)
+            columns[target][rows[ok], cols[ok]] = values[ok]
+
+    fill('SELECT player_id, surface, win_rate, matches, points_won FROM surface_stats',
+         {s: i for i, s in enumerate(SURFACES)}, ('surface_win', 'surface_matches', 'surface_points_won'))
+    fill('SELECT player_id, weather, win_rate, matches FROM weather_stats',
+         {w: i for i, w in enumerate(WEATHER_COLUMNS)}, ('weather_win', 'weather_matches'))
+
+    for text, values in zip(TEXT_COLUMNS, (names, countries)):
+        columns[f'{text}_offsets'], columns[f'{text}_data'] = _encode_text(values)
+    # Порядок покрытий и погоды - часть формата, проверяется при открытии
+    columns['surfaces_offsets'], columns['surfaces_data'] = _encode_text(SURFACES)
+    columns['weather_offsets'], columns['weather_data'] = _encode_text(WEATHER_COLUMNS)
+    return columns
+
+
+def write_snapshot(conn, path):
+    """Записать снимок игроков из базы в файл. Возвращает число игроков"""
+    columns = read_columns(conn)
+    names = list(columns)
+    offset = _HEADER.size + _SECTION.size * len(names)
+    table = []
+    for name in names:
+        array = np.ascontiguousarray(columns[name])
+        offset = -(-offset // ALIGN) * ALIGN
+        rows = array.shape[0]
+        cols = array.shape[1] if array.ndim > 1 else 0
+        table.append((name, array, offset, rows, cols))
+        offset += array.nbytes
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(table), len(columns['ids'])))
+        for name, array, offset, rows, cols in table:
+            f.write(_SECTION.pack(name.encode('ascii'), array.dtype.str.encode('ascii'), offset, rows, cols))
+        for name, array, offset, rows, cols in table:
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+    return len(columns['ids'])
+
+
+class TextColumn:
+    """Строковая колонка снимка: смещения и блок UTF-8 в отображённом файле"""
+
+    def __init__(self, offsets, data, buffer=None, base=0):
+        self.offsets = offsets
+        self.data = data
+        # Для поиска прямо в mmap без копирования блока
+        self._buffer = buffer
+        self._base = base
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def _find(self, needle, start):
+        if self._buffer is None:
+            return self.data.tobytes().find(needle, start)
+        pos = self._buffer.find(needle, self._base + start, self._base + len(self.data))
+        return pos - self._base if pos >= 0 else -1
+
+    def find(self, text):
+        """Номера строк, содержащих text (с учётом регистра), без декодирования колонки"""
+        needle = text.encode('utf-8')
+        if not needle:
+            return list(range(len(self)))
+        rows, pos = [], self._find(needle, 0)
+        while pos >= 0:
+            row = int(np.searchsorted(self.offsets, pos, side='right')) - 1
+            end = int(self.offsets[row + 1])
+            # Совпадение не должно переходить через границу строки
+            if pos + len(needle) <= end:
+                rows.append(row)
+                pos = self._find(needle, end)
+            else:
+                pos = self._find(needle, pos + 1)
+        return rows
+
+
+class ColumnSnapshot:
+    """Снимок, отображённый в память: секции - массивы NumPy только для чтения"""
+
+    def __init__(self, buffer, arrays, offsets, path=None):
+        self._buffer = buffer
+        self.arrays = arrays
+        self.path = path
+        self.names, self.countries = [
+            TextColumn(arrays[f'{text}_offsets'], arrays[f'{text}_data'], buffer, offsets[f'{text}_data'])
+            for text in TEXT_COLUMNS]
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, *cls._sections(buffer), path=path)
+
+    @staticmethod
+    def _sections(buffer):
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Файл слишком мал для снимка")
+        magic, version, count, _ = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Это не снимок игроков (неверная сигнатура)")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Версия снимка {version} не поддерживается (ожидается {FORMAT_VERSION})")
+
+        arrays, offsets = {}, {}
+        for i in range(count):
+            name, dtype, offset, rows, cols = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+            name = name.rstrip(b'\0').decode('ascii')
+            dtype = np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+            array = np.frombuffer(buffer, dtype=dtype, count=rows * (cols or 1), offset=offset)
+            arrays[name] = array.reshape(rows, cols) if cols else array
+            offsets[name] = offset
+
+        for key, expected in (('surfaces', SURFACES), ('weather', WEATHER_COLUMNS)):
+            stored = list(TextColumn(arrays[f'{key}_offsets'], arrays[f'{key}_data']))
+            if stored != list(expected):
+                raise ValueError(f"Снимок записан для других значений {key}: {stored}")
+        return arrays, offsets
+
+    def __len__(self):
+        return len(self.arrays['ids'])
+
+    def __getattr__(self, name):
+        # Числовые секции доступны как атрибуты: snapshot.points, snapshot.surface_win
+        arrays = self.__dict__.get('arrays')
+        if arrays is not None and name in NUMERIC_SECTIONS:
+            return arrays[name]
+        raise AttributeError(name)
+
+    def player_table(self):
+        """PlayerTable для tennis_predict поверх отображённых массивов (без копий)"""
+        return PlayerTable(self.ids, self.points, self.surface_win, self.weather_win, self.surface_points_won)
+
+    def features(self):
+        """Матрица признаков N×F в порядке tennis_similarity.feature_names"""
+        n = len(self)
+        surface = np.stack([self.surface_win, self.surface_points_won, self.surface_matches], axis=2)
+        weather = np.stack([self.weather_win, self.weather_matches], axis=2)
+        return np.column_stack([surface.reshape(n, -1), weather.reshape(n, -1),
+                                self.age, self.hand, np.log1p(self.points)]).astype(np.float64)
+
+    def similarity_index(self, weights=None):
+        from tennis_similarity import SimilarityIndex, normalize
+        return SimilarityIndex(self.ids, normalize(self.features(), weights))
+
+    def close(self):
+        self.arrays = {}
+        self.names = self.countries = None
+        try:
+            self._buffer.close()
+        except BufferError:
+            # На массивы ещё есть ссылки - отображение закроется вместе с ними
+            pass
+
+
+def main():
+    import argparse
+    import sqlite3
+    import time
+
+    parser = argparse.ArgumentParser(description='Бинарный снимок игроков для mmap')
+    parser.add_argument('path', help='файл снимка')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--info', action='store_true', help='только показать содержимое снимка')
+    args = parser.parse_args()
+
+    if not args.info:
+        start = time.perf_counter()
+        conn = sqlite3.connect(args.db)
+        count = write_snapshot(conn, args.path)
+        conn.close()
+        print(f"✅ {args.path}: {count} игроков, {os.path.getsize(args.path) / 1e6:.1f} МБ "
+              f"за {time.perf_counter() - start:.2f} с")
+
+    start = time.perf_counter()
+    snapshot = ColumnSnapshot.open(args.path)
+    opened = time.perf_counter() - start
+    print(f"Открыт за {opened * 1000:.2f} мс, игроков: {len(snapshot)}")
+    for name, array in snapshot.arrays.items():
+        print(f"  {name:20} {str(array.dtype):8} {str(array.shape):14} {array.nbytes:>12} байт")
+    snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Вывод результатов TennisDatabase в консоль
+
+Только форматирование: функции принимают записи из tennis_results и
+печатают их в прежнем виде меню.
+"""
+
+
+def print_ranking(entries, limit):
+    print(f"\n{'='*70}")
+    print(f"АТП РЕЙТИНГ 2025 - Топ-{limit}")
+    print(f"{'='*70}")
+    for player in entries:
+        print(f"{player.ranking:3d}. {player.name:25} {player.country:15} {player.points:6d}")
+
+
+def print_not_found(player_name):
+    print(f"Игрок '{player_name}' не найден")
+
+
+def print_analysis(analysis):
+    player = analysis.player
+    print(f"\n{'='*60}")
+    print(f"АНАЛИЗ: {player.name}")
+    print(f"Рейтинг: {player.ranking} | Страна: {player.country} | Очки: {player.points}")
+    print(f"{'='*60}")
+
+    # Покрытия
+    print("\n📊 ПОКРЫТИЯ:")
+    for surface, win_rate, matches in analysis.surfaces:
+        print(f"  {surface.upper():<6} | Побед: {win_rate:.1%} | Матчи: {matches}")
+
+    # Погода
+    print("\n🌤️ ПОГОДА:")
+    for weather, win_rate, matches in analysis.weather:
+        print(f"  {weather.upper():<8} | Побед: {win_rate:.1%} | Матчи: {matches}")
+
+
+def print_prediction(prediction):
+    print(f"\n🎾 ПРОГНОЗ: {prediction.player1} vs {prediction.player2}")
+    print(f"Условия: {prediction.surface.upper()} | {prediction.weather.upper()}")
+
+    print(f"\n{prediction.player1}: {prediction.probability:.1%}")
+    print(f"{prediction.player2}: {1-prediction.probability:.1%}")
+
+    print(f"\n🎯 Ожидаемый победитель: {prediction.favourite}")
+
+
+def print_similar(similar):
+    print(f"\n🔍 ПОХОЖИЕ ИГРОКИ НА {similar.player.name}:")
+    print(f"{'='*60}")
+    for sim in similar.neighbours:
+        print(f"  {sim.name:20} {sim.country:15} Рейтинг: {sim.ranking} | "
+              f"Очки: {sim.points} | Расстояние: {sim.distance:.2f}")
+
+
+def print_top_surface(surface, limit, leaders):
+    print(f"\n🏆 ТОП-{limit} ИГРОКОВ НА {surface.upper()}:")
+    print(f"{'='*60}")
+    for i, player in enumerate(leaders, 1):
+        print(f"{i:2d}. {player.name:20} {player.country:15} Рейтинг: {player.ranking:3d} | "
+              f"Побед: {player.win_rate:.1%} | Матчи: {player.matches}")
+
+
+def print_country_stats(countries):
+    print("\n🌍 СТАТИСТИКА ПО СТРАНАМ:")
+    print(f"{'='*60}")
+    for country in countries:
+        print(f"{country.country:20} Игроков: {country.players:2d} | "
+              f"Средний рейтинг: {country.avg_ranking:5.1f} | Очки: {country.total_points:6.0f}")
+
+
+def print_search(search_term, results):
+    print(f"\n🔎 РЕЗУЛЬТАТЫ ПОИСКА: '{search_term}'")
+    print(f"{'='*60}")
+    if not results:
+        print("Ничего не найдено")
+        return
+    for player in results:
+        print(f"{player.ranking:3d}. {player.name:25} {player.country:15} Очки: {player.points:6d} | "
+              f"Возраст: {player.age}")
+
+
+def print_head_to_head(h2h):
+    p1, p2 = h2h.player1, h2h.player2
+    print(f"\n⚔️  ПРОТИВОСТОЯНИЕ: {p1.name} vs {p2.name}")
+    print(f"{'='*60}")
+
+    # Сравнение рейтинга
+    print(f"\n📊 РЕЙТИНГ:")
+    print(f"  {p1.name}: {p1.points} очков")
+    print(f"  {p2.name}: {p2.points} очков")
+    print(f"  Разница: {h2h.points_diff} очков")
+
+    # Сравнение на разных покрытиях
+    for surface, rate1, rate2 in h2h.surfaces:
+        diff = rate1 - rate2
+        print(f"\n🎾 {surface.upper()}:")
+        print(f"  {p1.name}: {rate1:.1%}")
+        print(f"  {p2.name}: {rate2:.1%}")
+        if diff > 0:
+            print(f"  Преимущество: {p1.name} ({diff:+.1%})")
+        else:
+            print(f"  Преимущество: {p2.name} ({-diff:+.1%})")
+
+    # Общий прогноз
+    print_prediction(h2h.prediction)
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""Потоковая выгрузка таблиц и прогнозов в CSV, JSON Lines, Parquet и Arrow
+
+    python tennis_export.py --db tennis_atp.db players players.parquet --columns id,name,points
+    python tennis_export.py surface_stats stats.csv --where "surface=clay" --where "win_rate>=0.6"
+    python tennis_export.py predictions preds.jsonl --top 500 --surface grass --model elo
+
+Строки читаются fetchmany порциями по chunk_size и сразу пишутся в файл,
+поэтому память не зависит от размера таблицы. Parquet и Arrow доступны,
+если установлен pyarrow (каждая порция - отдельная группа строк / батч).
+"""
+import csv
+import itertools
+import json
+import operator
+import os
+import re
+import time
+
+# Таблицы, доступные для выгрузки
+EXPORT_TABLES = ('players', 'surface_stats', 'weather_stats', 'tournaments', 'matches', 'player_ratings',
+                 'ranking_weeks', 'ranking_history', 'formula_params')
+PREDICTION_COLUMNS = ('player1_id', 'player1', 'player2_id', 'player2', 'surface', 'weather', 'probability')
+PREDICTION_TYPES = ('INTEGER', 'TEXT', 'INTEGER', 'TEXT', 'TEXT', 'TEXT', 'REAL')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet',
+           '.arrow': 'arrow', '.feather': 'arrow'}
+
+# Операторы фильтра: SQL и проверка на Python (для прогнозов)
+FILTER_OPS = {
+    '=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+    'like': lambda value, pattern: value is not None and _like(pattern).match(str(value)) is not None,
+    'in': lambda value, options: value in options,
+}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def _like(pattern):
+    return re.compile('^' + re.escape(pattern).replace('%', '.*').replace('_', '.') + '$', re.IGNORECASE)
+
+
+def format_for(path, fmt=None):
+    """Формат выгрузки: явный или по расширению файла"""
+    if fmt:
+        return fmt
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Не удалось определить формат по имени '{path}', укажите его явно")
+    return fmt
+
+
+def parse_filter(text):
+    """'ranking<=100' -> ('ranking', '<=', '100'); 'country in A,B' -> ('country', 'in', ['A', 'B'])"""
+    for op in (' like ', ' in '):
+        column, found, value = text.partition(op)
+        if found:
+            value = value.strip()
+            return column.strip(), op.strip(), value.split(',') if op == ' in ' else value
+    for op in ('<=', '>=', '!=', '=', '<', '>'):
+        column, found, value = text.partition(op)
+        if found:
+            return column.strip(), op, value.strip()
+    raise ValueError(f"Не разобран фильтр '{text}' (ожидается колонка<оператор>значение)")
+
+
+def table_columns(conn, table):
+    """[(колонка, объявленный тип)] таблицы"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Таблица '{table}' недоступна для выгрузки")
+    columns = [(row[1], row[2].upper()) for row in conn.execute(f'PRAGMA table_info({table})')]
+    if not columns:
+        raise ValueError(f"Таблицы '{table}' нет в базе")
+    return columns
+
+
+def _coerce(value, decl_type):
+    # Значения фильтров из командной строки приходят строками
+    if isinstance(value, str):
+        try:
+            if 'INT' in decl_type:
+                return int(value)
+            if 'REAL' in decl_type:
+                return float(value)
+        except ValueError:
+            raise ValueError(f"Значение фильтра '{value}' должно быть числом ({decl_type})") from None
+    return value
+
+
+def _check_columns(columns, available):
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Неизвестные колонки: {', '.join(unknown)}")
+
+
+def iter_table_chunks(conn, table, columns=None, filters=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """Порции строк таблицы: (колонки, типы) один раз, затем списки кортежей
+
+    columns - проекция (по умолчанию все колонки), filters - список
+    (колонка, оператор, значение), объединяемых через AND.
+    """
+    declared = dict(table_columns(conn, table))
+    columns = list(columns or declared)
+    _check_columns(columns, declared)
+
+    clauses, params = [], []
+    for column, op, value in filters:
+        _check_columns([column], declared)
+        if op not in FILTER_OPS:
+            raise ValueError(f"Неизвестный оператор '{op}'")
+        if op == 'in':
+            values = [_coerce(v, declared[column]) for v in value]
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        else:
+            clauses.append(f"{column} {op.upper()} ?")
+            params.append(_coerce(value, declared[column]))
+
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+
+    yield columns, [declared[c] for c in columns]
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def iter_prediction_chunks(db, player_ids, surface='hard', weather='sunny', model='formula',
+                           columns=None, filters=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """Порции прогнозов для всех пар из player_ids (каждая пара один раз)
+
+    Пары порождаются лениво, прогноз считается векторно порциями
+    TennisDatabase.predict_many, фильтры проверяются на Python.
+    """
+    columns = list(columns or PREDICTION_COLUMNS)
+    _check_columns(columns, PREDICTION_COLUMNS)
+    types = dict(zip(PREDICTION_COLUMNS, PREDICTION_TYPES))
+    checks = []
+    for column, op, value in filters:
+        _check_columns([column], PREDICTION_COLUMNS)
+        if op == 'in':
+            value = [_coerce(v, types[column]) for v in value]
+        else:
+            value = _coerce(value, types[column])
+        checks.append((PREDICTION_COLUMNS.index(column), FILTER_OPS[op], value))
+    indexes = [PREDICTION_COLUMNS.index(c) for c in columns]
+
+    yield columns, [types[c] for c in columns]
+    predictions = db.predict_many(itertools.combinations(player_ids, 2), surface, weather,
+                                  chunk=chunk_size, model=model)
+    while True:
+        batch = list(itertools.islice(predictions, chunk_size))
+        if not batch:
+            return
+        rows = [tuple(p[i] for i in indexes) for p in batch
+                if all(check(p[i], value) for i, check, value in checks)]
+        if rows:
+            yield rows
+
+
+class CsvWriter:
+    def __init__(self, path, columns, types):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter:
+    def __init__(self, path, columns, types):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.columns = columns
+
+    def write(self, rows):
+        columns = self.columns
+        self.file.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    """Parquet (группа строк на порцию) или Arrow IPC (батч на порцию)"""
+
+    def __init__(self, path, columns, types, fmt='parquet'):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("Для Parquet/Arrow нужен pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([(c, _arrow_type(pa, t)) for c, t in zip(columns, types)])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.sink = pa.OSFile(path, 'wb')
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, rows):
+        arrays = [self.pa.array(values, type=field.type)
+                  for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_batch(self.pa.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        if hasattr(self, 'sink'):
+            self.sink.close()
+
+
+def _arrow_type(pa, decl_type):
+    if 'INT' in decl_type:
+        return pa.int64()
+    if 'REAL' in decl_type or 'FLOA' in decl_type or 'DOUB' in decl_type:
+        return pa.float64()
+    return pa.string()
+
+
+def open_writer(path, fmt, columns, types):
+    if fmt == 'csv':
+        return CsvWriter(path, columns, types)
+    if fmt == 'jsonl':
+        return JsonLinesWriter(path, columns, types)
+    if fmt in ('parquet', 'arrow'):
+        return ArrowWriter(path, columns, types, fmt)
+    raise ValueError(f"Неизвестный формат '{fmt}'")
+
+
+def write_chunks(chunks, path, fmt=None):
+    """Записать порции (первый элемент - колонки и типы) в файл. Возвращает отчёт
+
+    Файл пишется во временный и переименовывается в конце, так что
+    оборванная выгрузка не оставляет неполный файл.
+    """
+    fmt = format_for(path, fmt)
+    start = time.perf_counter()
+    columns, types = next(chunks)
+    tmp = path + '.tmp'
+    writer = open_writer(tmp, fmt, columns, types)
+    rows = batches = 0
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            rows += len(chunk)
+            batches += 1
+    except BaseException:
+        writer.close()
+        os.remove(tmp)
+        raise
+    writer.close()
+    os.replace(tmp, path)
+    seconds = time.perf_counter() - start
+    return {'path': path, 'format': fmt, 'rows': rows, 'chunks': batches, 'seconds': seconds,
+            'rows_per_sec': rows / seconds if seconds > 0 else 0.0}
+
+
+def main():
+    import argparse
+
+    from tennis_predict import WEATHER_COLUMNS
+    from tennis_system import PREDICTION_MODELS, SURFACES, TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Потоковая выгрузка таблиц и прогнозов')
+    parser.add_argument('source', choices=EXPORT_TABLES + ('predictions',))
+    parser.add_argument('out', help='файл: .csv, .jsonl, .parquet, .arrow')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--format', default=None, choices=sorted(set(FORMATS.values())))
+    parser.add_argument('--columns', default=None, help='колонки через запятую')
+    parser.add_argument('--where', action='append', default=[],
+                        help="фильтр 'колонка<оператор>значение' (=, !=, <, <=, >, >=, like, in)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--top', type=int, default=200, help='прогнозы: пары среди топ-N рейтинга')
+    parser.add_argument('--surface', default='hard', choices=SURFACES)
+    parser.add_argument('--weather', default='sunny', choices=WEATHER_COLUMNS)
+    parser.add_argument('--model', default='formula', choices=PREDICTION_MODELS)
+    args = parser.parse_args()
+
+    columns = args.columns.split(',') if args.columns else None
+    try:
+        filters = [parse_filter(text) for text in args.where]
+    except ValueError as e:
+        parser.error(str(e))
+    db = TennisDatabase(args.db)
+    try:
+        report = db.export(args.source, args.out, args.format, columns, filters, args.chunk_size,
+                           top=args.top, surface=args.surface, weather=args.weather, model=args.model)
+    except ValueError as e:
+        # Неизвестные колонки, нечисловое значение фильтра, формат файла
+        db.close()
+        parser.error(str(e))
+    print(f"✅ {report['path']}: {report['rows']} строк, {report['chunks']} порций, "
+          f"{report['seconds']:.2f} с ({report['rows_per_sec']:.0f} строк/с)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Воспроизводимый параллельный генератор синтетических игроков и статистики
+
+    python tennis_generator.py --db big.db --players 1000000 --workers 8
+
+Каждое случайное значение - хеш (зерно, номер игрока, номер величины)
+через splitmix64, посчитанный векторно в NumPy. Поэтому данные игрока
+зависят только от зерна и его номера в рейтинге, а не от размера блока
+или числа процессов. Правила распределений - как в generate_player_stats:
+бонус на грунте для «грунтовых» стран и более высокий коридор погодной
+статистики для топ-10.
+
+Блоки (PlayerBlock) считаются в пуле процессов и сразу пишутся в базу
+через BulkLoader.load_blocks, пока следующие блоки ещё генерируются.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tennis_system import (CLAY_BONUS, SURFACES, TOP_STABLE_RANKING, WEATHER_TYPES,
+                           has_clay_bonus)
+
+SEED = 2025
+BLOCK_SIZE = 50000
+
+COUNTRIES = ['Испания', 'Италия', 'Германия', 'Сербия', 'Канада', 'США', 'Австралия',
+             'Франция', 'Аргентина', 'Россия', 'Чехия', 'Великобритания', 'Япония',
+             'Бразилия', 'Нидерланды', 'Польша', 'Хорватия', 'Чили', 'Казахстан', 'Норвегия']
+SYLLABLES = ['ка', 'ро', 'ли', 'на', 'ми', 'до', 'ре', 'са', 'то', 'ве', 'ла', 'ни',
+             'гор', 'ман', 'тин', 'ель', 'вич', 'сон', 'ер', 'ан']
+LEFT_HANDED_SHARE = 0.12
+
+# Номера величин в потоке игрока
+_FIRST, _LAST, _COUNTRY, _AGE, _HAND = 0, 2, 5, 6, 7
+_SURFACE = 8                      # 3 покрытия × (win_rate, matches, points_won)
+_WEATHER = _SURFACE + 3 * 3       # 4 погоды × (win_rate, matches)
+_DRAWS = _WEATHER + 4 * 2
+
+PlayerBlock = namedtuple('PlayerBlock', [
+    'rankings', 'names', 'countries', 'points', 'ages', 'hands',
+    'surface_win', 'surface_matches', 'surface_points_won',   # (n, 3)
+    'weather_win', 'weather_matches',                         # (n, 4)
+])
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _splitmix64(x):
+    with np.errstate(over='ignore'):
+        z = x + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def uniforms(seed, rankings, draws=_DRAWS):
+    """Равномерные [0, 1) формы (n, draws), зависящие только от (seed, ranking)"""
+    key = _splitmix64(_splitmix64(np.uint64(seed)) ^ np.asarray(rankings, dtype=np.uint64))
+    with np.errstate(over='ignore'):
+        counters = key[:, None] + np.arange(1, draws + 1, dtype=np.uint64) * _GOLDEN
+    return (_splitmix64(counters) >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def _randint(u, low, high):
+    """Целые low..high включительно, как random.randint"""
+    return low + (u * (high - low + 1)).astype(np.int64)
+
+
+def generate_block(start, count, seed=SEED):
+    """Игроки с местами в рейтинге start..start+count-1 и их статистика"""
+    rankings = np.arange(start, start + count, dtype=np.int64)
+    u = uniforms(seed, rankings)
+
+    n_syl = len(SYLLABLES)
+    syl = (u[:, _FIRST:_COUNTRY] * n_syl).astype(np.int64).tolist()
+    names = [f"{(SYLLABLES[a] + SYLLABLES[b]).capitalize()} "
+             f"{(SYLLABLES[c] + SYLLABLES[d] + SYLLABLES[e]).capitalize()} {r}"
+             for (a, b, c, d, e), r in zip(syl, rankings.tolist())]
+    country_idx = (u[:, _COUNTRY] * len(COUNTRIES)).astype(np.int64)
+    countries = [COUNTRIES[i] for i in country_idx.tolist()]
+    points = np.maximum(1, (12000 / rankings ** 0.6).astype(np.int64))
+    ages = _randint(u[:, _AGE], 17, 38)
+    hands = ['left' if left else 'right' for left in (u[:, _HAND] < LEFT_HANDED_SHARE).tolist()]
+
+    s = u[:, _SURFACE:_WEATHER].reshape(count, len(SURFACES), 3)
+    surface_win = 0.45 + s[:, :, 0] * 0.30
+    clay = np.array([has_clay_bonus(c) for c in COUNTRIES])[country_idx]
+    surface_win[:, SURFACES.index('clay')] += np.where(clay, CLAY_BONUS, 0.0)
+    surface_matches = _randint(s[:, :, 1], 15, 100)
+    surface_points_won = 0.48 + s[:, :, 2] * 0.04
+
+    w = u[:, _WEATHER:_DRAWS].reshape(count, len(WEATHER_TYPES), 2)
+    top = (rankings <= TOP_STABLE_RANKING)[:, None]
+    weather_win = np.where(top, 0.55 + w[:, :, 0] * 0.25, 0.40 + w[:, :, 0] * 0.30)
+    weather_matches = _randint(w[:, :, 1], 10, 60)
+
+    return PlayerBlock(rankings, names, countries, points, ages, hands,
+                       surface_win, surface_matches, surface_points_won, weather_win, weather_matches)
+
+
+def _block_job(args):
+    return generate_block(*args)
+
+
+def iter_blocks(n_players, seed=SEED, block_size=BLOCK_SIZE, workers=None, start=1):
+    """Блоки по порядку рейтинга; при workers > 1 считаются в пуле процессов"""
+    jobs = [(first, min(block_size, start + n_players - first), seed)
+            for first in range(start, start + n_players, block_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _block_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        # map сохраняет порядок и считает следующие блоки, пока текущий пишется
+        yield from pool.map(_block_job, jobs)
+
+
+def build_database(path, n_players, seed=SEED, workers=None, block_size=BLOCK_SIZE, progress=None):
+    """Создать (или дополнить) базу синтетическими игроками. Возвращает отчёт загрузки"""
+    from tennis_system import TennisDatabase
+
+    db = TennisDatabase(path)
+    try:
+        start = (db.query('SELECT COALESCE(MAX(ranking), 0) FROM players')[0][0] or 0) + 1
+        return db.bulk_load_blocks(iter_blocks(n_players, seed, block_size, workers, start), progress)
+    finally:
+        db.close()
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Синтетическая база игроков для нагрузочных тестов')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--players', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    args = parser.parse_args()
+
+    def progress(count):
+        print(f"Загружено {count} игроков...", file=sys.stderr)
+
+    start = time.perf_counter()
+    report = build_database(args.db, args.players, args.seed, args.workers, args.block_size, progress)
+    print(f"✅ {report['players']} игроков, {report['rows']} строк за {time.perf_counter() - start:.1f} с "
+          f"({report['rows_per_sec']:.0f} строк/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""История рейтинга по неделям: ключевые кадры и дельты
+
+    python tennis_history.py --record                      # записать текущую неделю
+    python tennis_history.py --date 2024-06-10 --top 20    # топ-20 на дату
+    python tennis_history.py --date 2024-06-10 --player Sinner
+    python tennis_history.py --stats
+
+Снимок недели хранится дельтой: строки только для игроков, у которых
+изменились место или очки, и «выбывание» (ranking = NULL) для пропавших
+из рейтинга. Каждые keyframe_interval недель записывается ключевой кадр
+со всеми игроками. Состояние игрока на дату - последняя его строка не
+позже этой недели и не раньше её ключевого кадра (один поиск по
+первичному ключу; нет строки - игрок выбыл до кадра), топ на дату -
+ключевой кадр плюс дельты после него (не больше keyframe_interval недель).
+"""
+from datetime import date, datetime, timedelta
+
+# Ключевой кадр раз в год недельных снимков
+KEYFRAME_INTERVAL = 52
+
+
+def week_start(day=None):
+    """Понедельник недели, в которую попадает day (date, datetime или 'YYYY-MM-DD')"""
+    if day is None:
+        day = date.today()
+    elif isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    elif isinstance(day, datetime):
+        day = day.date()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+class RankingHistory:
+    """Запись и чтение ranking_weeks / ranking_history; commit - за вызывающим"""
+
+    def __init__(self, conn, keyframe_interval=KEYFRAME_INTERVAL):
+        self.conn = conn
+        self.keyframe_interval = max(1, int(keyframe_interval))
+
+    def _week(self, day):
+        """(week_id, неделя) последнего записанного снимка не позже day или None"""
+        return self.conn.execute(
+            'SELECT id, week FROM ranking_weeks WHERE week <= ? ORDER BY week DESC LIMIT 1',
+            (week_start(day),)).fetchone()
+
+    def _keyframe(self, week_id):
+        row = self.conn.execute(
+            'SELECT id FROM ranking_weeks WHERE keyframe = 1 AND id <= ? ORDER BY id DESC LIMIT 1',
+            (week_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _replay(self, week_id):
+        """Состояние на снимок week_id: ключевой кадр и дельты после него"""
+        return self.conn.execute('''
+            SELECT player_id, ranking, points
+            FROM (
+                SELECT player_id, MAX(week_id), ranking, points
+                FROM ranking_history
+                WHERE week_id BETWEEN ? AND ?
+                GROUP BY player_id
+            )
+            WHERE ranking IS NOT NULL
+        ''', (self._keyframe(week_id), week_id)).fetchall()
+
+    def state_as_of(self, day):
+        """{player_id: (ranking, points)} на дату day ({} - истории ещё нет)"""
+        week = self._week(day)
+        if week is None:
+            return {}
+        return {pid: (ranking, points) for pid, ranking, points in self._replay(week[0])}
+
+    def top_as_of(self, day, limit=50):
+        """Лучшие на дату: [(player_id, ranking, points)], неделя снимка"""
+        week = self._week(day)
+        if week is None:
+            return [], None
+        rows = sorted(self._replay(week[0]), key=lambda row: (row[1], row[0]))
+        return rows[:limit] if limit else rows, week[1]
+
+    def player_as_of(self, player_id, day):
+        """(ranking, points, неделя снимка) игрока на дату или None, если его нет в рейтинге"""
+        week = self._week(day)
+        if week is None:
+            return None
+        row = self.conn.execute('''
+            SELECT ranking, points
+            FROM ranking_history
+            WHERE player_id = ? AND week_id BETWEEN ? AND ?
+            ORDER BY week_id DESC
+            LIMIT 1
+        ''', (player_id, self._keyframe(week[0]), week[0])).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row[0], row[1], week[1]
+
+    def record(self, players, day=None):
+        """Записать недельный снимок players - [(player_id, ranking, points)]
+
+        Неделю раньше последней записанной добавить нельзя; повторная
+        запись последней недели заменяет её. Возвращает отчёт.
+        """
+        week = week_start(day)
+        last = self.conn.execute(
+            'SELECT id, week FROM ranking_weeks ORDER BY id DESC LIMIT 1').fetchone()
+        if last is not None and week < last[1]:
+            raise ValueError(f"Неделя {week} раньше последней записанной ({last[1]})")
+        if last is not None and week == last[1]:
+            self.conn.execute('DELETE FROM ranking_history WHERE week_id = ?', (last[0],))
+            self.conn.execute('DELETE FROM ranking_weeks WHERE id = ?', (last[0],))
+            last = self.conn.execute(
+                'SELECT id, week FROM ranking_weeks ORDER BY id DESC LIMIT 1').fetchone()
+
+        current = {pid: (ranking, points) for pid, ranking, points in players if ranking is not None}
+        keyframe = last is None
+        if not keyframe:
+            since = self.conn.execute('SELECT COUNT(*) FROM ranking_weeks WHERE id > ?',
+                                      (self._keyframe(last[0]),)).fetchone()[0]
+            keyframe = since + 1 >= self.keyframe_interval
+
+        if keyframe:
+            rows = [(pid, ranking, points) for pid, (ranking, points) in current.items()]
+        else:
+            previous = {pid: (ranking, points) for pid, ranking, points in self._replay(last[0])}
+            rows = [(pid, ranking, points) for pid, (ranking, points) in current.items()
+                    if previous.get(pid) != (ranking, points)]
+            rows.extend((pid, None, None) for pid in previous.keys() - current.keys())
+
+        week_id = self.conn.execute(
+            'INSERT INTO ranking_weeks (week, keyframe, recorded_at) VALUES (?, ?, ?)',
+            (week, int(keyframe), datetime.now().isoformat(timespec='seconds'))).lastrowid
+        rows.sort()
+        self.conn.executemany(
+            'INSERT INTO ranking_history (player_id, week_id, ranking, points) VALUES (?, ?, ?, ?)',
+            [(pid, week_id, ranking, points) for pid, ranking, points in rows])
+        return {'week': week, 'keyframe': keyframe, 'players': len(current), 'rows': len(rows)}
+
+    def stats(self):
+        """Размер истории: недели, ключевые кадры, строки и доля от полных снимков"""
+        weeks, keyframes, first, last = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(keyframe), 0), MIN(week), MAX(week) FROM ranking_weeks').fetchone()
+        rows = self.conn.execute('SELECT COUNT(*) FROM ranking_history').fetchone()[0]
+        full = self.conn.execute('''
+            SELECT COALESCE(SUM(n), 0) FROM (
+                SELECT COUNT(*) AS n FROM ranking_history h
+                JOIN ranking_weeks w ON w.id = h.week_id
+                WHERE w.keyframe = 1
+                GROUP BY h.week_id
+            )
+        ''').fetchone()[0]
+        # Оценка полного хранения: размер среднего ключевого кадра на каждую неделю
+        dense = full / keyframes * weeks if keyframes else 0
+        return {'weeks': weeks, 'keyframes': keyframes, 'first': first, 'last': last, 'rows': rows,
+                'dense_rows': int(dense), 'ratio': rows / dense if dense else 0.0}
+
+
+def main():
+    import argparse
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='История рейтинга по неделям')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--record', action='store_true', help='записать текущий рейтинг как снимок недели')
+    parser.add_argument('--week', default=None, help='дата недели для --record (по умолчанию сегодня)')
+    parser.add_argument('--date', default=None, help='дата для запросов (по умолчанию сегодня)')
+    parser.add_argument('--top', type=int, default=None, help='топ-N на дату')
+    parser.add_argument('--player', default=None, help='место и очки игрока на дату')
+    parser.add_argument('--stats', action='store_true')
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    if args.record:
+        report = db.record_ranking_week(args.week)
+        kind = 'ключевой кадр' if report['keyframe'] else 'дельта'
+        print(f"✅ Неделя {report['week']}: {kind}, строк {report['rows']} на {report['players']} игроков")
+    if args.top:
+        entries = db.ranking_as_of(args.date, args.top)
+        print(f"\nРЕЙТИНГ НА {week_start(args.date)}:")
+        for entry in entries:
+            print(f"{entry.ranking:3d}. {entry.name:25} {entry.country:15} {entry.points:6d}")
+    if args.player:
+        state = db.player_ranking_as_of(args.player, args.date)
+        if state is None:
+            print(f"Нет данных об игроке '{args.player}' на {week_start(args.date)}")
+        else:
+            print(f"{state.name}: место {state.ranking}, очки {state.points} (снимок {state.week})")
+    if args.stats:
+        stats = db.ranking_history_stats()
+        print(f"Недель: {stats['weeks']} ({stats['first']} - {stats['last']}), ключевых кадров: "
+              f"{stats['keyframes']}, строк: {stats['rows']} "
+              f"({stats['ratio']:.1%} от {stats['dense_rows']} при полных снимках)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
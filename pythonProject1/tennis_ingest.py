@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Массовая загрузка игроков и их статистики
+
+Игроки читаются потоком (CSV, JSON, JSON Lines или любой итератор),
+строки players / surface_stats / weather_stats копятся пачками и
+пишутся через executemany в одной транзакции.
+"""
+import csv
+import json
+import random
+import sys
+import time
+
+from tennis_migrations import (create_summary_triggers, create_table_indexes, drop_summary_triggers,
+                               drop_table_indexes, refresh_summaries)
+from tennis_system import SURFACES, WEATHER_TYPES, TennisDatabase, generate_player_stats
+
+
+def _normalize_player(player):
+    """Привести запись игрока к кортежу (ranking, name, country, points, age, hand)"""
+    if isinstance(player, dict):
+        ranking = int(player['ranking'])
+        name = player['name']
+        country = player['country']
+        points = int(player['points'])
+        age = player.get('age')
+        age = int(age) if age not in (None, '') else None
+        hand = player.get('hand') or 'right'
+        return ranking, name, country, points, age, hand
+
+    player = tuple(player)
+    ranking, name, country, points = player[:4]
+    age = player[4] if len(player) > 4 else None
+    hand = player[5] if len(player) > 5 else 'right'
+    return int(ranking), name, country, int(points), age, hand
+
+
+def iter_players_csv(path, encoding='utf-8'):
+    """Потоково читать игроков из CSV с заголовком ranking,name,country,points,age,hand"""
+    with open(path, newline='', encoding=encoding) as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+def iter_players_json(path, encoding='utf-8'):
+    """Читать игроков из JSON-массива или JSON Lines (по объекту на строку)"""
+    with open(path, encoding=encoding) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == '[':
+            f.seek(0)
+            for item in json.load(f):
+                yield item
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_players_file(path):
+    """Выбрать читатель по расширению файла"""
+    if path.lower().endswith('.csv'):
+        return iter_players_csv(path)
+    return iter_players_json(path)
+
+
+class BulkLoader:
+    """Загрузчик игроков пачками в одной транзакции"""
+
+    def __init__(self, conn, batch_size=5000, journal_mode='WAL', synchronous='NORMAL', seed=None,
+                 rebuild_indexes=None):
+        """rebuild_indexes - снять индексы на время загрузки и построить заново
+        (None - только если таблица игроков пуста).
+        """
+        self.conn = conn
+        self.rebuild_indexes = rebuild_indexes
+        self.batch_size = max(1, int(batch_size))
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.rng = random.Random(seed) if seed is not None else random
+
+    def _apply_pragmas(self):
+        # journal_mode нельзя менять внутри транзакции
+        if self.conn.in_transaction:
+            self.conn.commit()
+        if self.journal_mode:
+            self.conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        if self.synchronous:
+            self.conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+
+    def _flush(self, cursor, players, surfaces, weathers):
+        cursor.executemany('''
+            INSERT INTO players (id, ranking, name, country, points, age, hand)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', players)
+        cursor.executemany('''
+            INSERT INTO surface_stats (player_id, surface, win_rate, matches, points_won)
+            VALUES (?, ?, ?, ?, ?)
+        ''', surfaces)
+        cursor.executemany('''
+            INSERT INTO weather_stats (player_id, weather, win_rate, matches)
+            VALUES (?, ?, ?, ?)
+        ''', weathers)
+        rows = len(players) + len(surfaces) + len(weathers)
+        players.clear()
+        surfaces.clear()
+        weathers.clear()
+        return rows
+
+    def _run(self, fill):
+        """Общая часть загрузки: транзакция, id, триггеры сводок и отчёт
+
+        fill(cursor, first_id) пишет строки и возвращает (игроков, строк).
+        """
+        self._apply_pragmas()
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
+
+        try:
+            # Явная блокировка на запись: id игроков выдаём сами, без lastrowid
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT COALESCE(MAX(id), 0), COUNT(*) FROM players')
+            max_id, existing = cursor.fetchone()
+            first_id = max_id + 1
+            # Построчные триггеры сводок заменяем одним пересчётом в конце
+            summaries = drop_summary_triggers(self.conn)
+            # В пустую базу быстрее писать без индексов и построить их потом сортировкой
+            rebuild = self.rebuild_indexes if self.rebuild_indexes is not None else existing == 0
+            if rebuild:
+                drop_table_indexes(self.conn)
+
+            loaded, rows = fill(cursor, first_id)
+
+            if rebuild:
+                create_table_indexes(self.conn)
+            if summaries:
+                refresh_summaries(self.conn, first_id)
+                create_summary_triggers(self.conn)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        seconds = time.perf_counter() - start
+        return {
+            'players': loaded,
+            'rows': rows,
+            'seconds': seconds,
+            'rows_per_sec': rows / seconds if seconds > 0 else 0.0,
+        }
+
+    def load(self, players, progress=None):
+        """Загрузить игроков. Возвращает отчёт со скоростью загрузки
+
+        progress - необязательный callback(players_loaded), вызывается после каждой пачки.
+        """
+        def fill(cursor, next_id):
+            loaded = 0
+            rows = 0
+            player_batch, surface_batch, weather_batch = [], [], []
+
+            for player in players:
+                ranking, name, country, points, age, hand = _normalize_player(player)
+                player_id = next_id
+                next_id += 1
+
+                surface_rows, weather_rows = generate_player_stats(ranking, country, self.rng)
+                player_batch.append((player_id, ranking, name, country, points, age, hand))
+                surface_batch.extend((player_id,) + row for row in surface_rows)
+                weather_batch.extend((player_id,) + row for row in weather_rows)
+                loaded += 1
+
+                if len(player_batch) >= self.batch_size:
+                    rows += self._flush(cursor, player_batch, surface_batch, weather_batch)
+                    if progress:
+                        progress(loaded)
+
+            if player_batch:
+                rows += self._flush(cursor, player_batch, surface_batch, weather_batch)
+                if progress:
+                    progress(loaded)
+            return loaded, rows
+
+        return self._run(fill)
+
+    def load_blocks(self, blocks, progress=None):
+        """Загрузить готовые блоки игроков со статистикой (tennis_generator.PlayerBlock)
+
+        Статистика уже посчитана генератором, здесь только вставка.
+        """
+        def fill(cursor, next_id):
+            loaded = 0
+            rows = 0
+            for block in blocks:
+                ids = range(next_id, next_id + len(block.names))
+                next_id += len(block.names)
+                players = list(zip(ids, block.rankings.tolist(), block.names, block.countries,
+                                   block.points.tolist(), block.ages.tolist(), block.hands))
+                surfaces = [(pid, surface, win, matches, won)
+                            for pid, wins, matches_row, won_row in zip(ids, block.surface_win.tolist(),
+                                                                        block.surface_matches.tolist(),
+                                                                        block.surface_points_won.tolist())
+                            for surface, win, matches, won in zip(SURFACES, wins, matches_row, won_row)]
+                weathers = [(pid, weather, win, matches)
+                            for pid, wins, matches_row in zip(ids, block.weather_win.tolist(),
+                                                               block.weather_matches.tolist())
+                            for weather, win, matches in zip(WEATHER_TYPES, wins, matches_row)]
+                loaded += len(players)
+                rows += self._flush(cursor, players, surfaces, weathers)
+                if progress:
+                    progress(loaded)
+            return loaded, rows
+
+        return self._run(fill)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Массовая загрузка игроков в базу')
+    parser.add_argument('source', help='CSV, JSON или JSON Lines файл с игроками')
+    parser.add_argument('--db', default='tennis_atp.db', help='файл базы данных')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--journal-mode', default='WAL')
+    parser.add_argument('--synchronous', default='NORMAL')
+    parser.add_argument('--seed', type=int, default=None, help='зерно генератора статистики')
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    loader = BulkLoader(db.conn, batch_size=args.batch_size, journal_mode=args.journal_mode,
+                        synchronous=args.synchronous, seed=args.seed)
+
+    def progress(count):
+        print(f"Загружено {count} игроков...", file=sys.stderr)
+
+    report = loader.load(iter_players_file(args.source), progress=progress)
+    print(f"✅ Загружено игроков: {report['players']} | строк: {report['rows']} | "
+          f"{report['seconds']:.2f} с | {report['rows_per_sec']:.0f} строк/с")
+    db.conn.close()
+
+
+if __name__ == "__main__":
+    main()
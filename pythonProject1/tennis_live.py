@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Живые вероятности победы по потоку розыгрышей
+
+    python tennis_live.py events.jsonl
+    cat events.jsonl | python tennis_live.py -
+    python tennis_live.py --listen tcp://127.0.0.1:9010
+    python tennis_live.py --listen unix:/tmp/tennis-live.sock
+
+События - JSON по одному на строку, матчей в потоке сколько угодно:
+
+    {"type": "start", "match": "m1", "player1": "Sinner", "player2": "Alcaraz",
+     "surface": "clay", "best_of": 5, "server": 1}
+    {"match": "m1", "winner": 1}            # очко выиграл игрок 1
+
+На каждое событие выводится строка JSON со счётом и вероятностью победы
+игрока 1. Счёт (очки, геймы, тай-брейк, сеты, до 2 или 3 побед) ведёт
+LiveMatch, вероятность - марковская модель tennis_markov по подачам,
+посчитанным из surface_stats.points_won. Таблицы вероятностей общие для
+всех матчей с теми же (квантованными) подачами, поэтому обновление после
+очка - поиск в словаре.
+"""
+import asyncio
+import json
+import sys
+import time
+
+from tennis_markov import SERVE_MAX, SERVE_MIN, load_points_won, match_table, serve_probabilities
+from tennis_system import SURFACES
+
+POINT_NAMES = ('0', '15', '30', '40')
+
+
+class LiveMatch:
+    """Счёт одного матча и его марковская таблица"""
+
+    def __init__(self, match_id, player1, player2, p1, p2, best_of=3, server=1, surface=None):
+        if server not in (1, 2):
+            raise ValueError("server должен быть 1 или 2")
+        self.match_id = match_id
+        self.players = (player1, player2)
+        self.surface = surface
+        self.serve = (p1, p2)
+        self.table = match_table(p1, p2, best_of)
+        self.best_of = best_of
+        self.sets = [0, 0]
+        self.games = [0, 0]
+        self.points = [0, 0]
+        self.set_scores = []
+        # Подающий гейм; в тай-брейке - подававший первое очко тай-брейка
+        self.server = server
+        self.tiebreak = False
+        self.winner = None
+
+    def _finish_set(self, winner):
+        self.set_scores.append(tuple(self.games))
+        self.sets[winner - 1] += 1
+        self.games = [0, 0]
+        if self.sets[winner - 1] >= self.table.sets_to_win:
+            self.winner = winner
+
+    def point(self, winner):
+        """Учесть розыгрыш, выигранный игроком winner (1 или 2)"""
+        if self.winner is not None:
+            raise ValueError(f"Матч {self.match_id} уже завершён")
+        if winner not in (1, 2):
+            raise ValueError("winner должен быть 1 или 2")
+        w, l = winner - 1, 2 - winner
+        self.points[w] += 1
+        a, b = self.points[w], self.points[l]
+
+        if self.tiebreak:
+            if a >= 7 and a - b >= 2:
+                self.games[w] += 1
+                self.points = [0, 0]
+                self.tiebreak = False
+                # Следующий сет начинает подавать принимавший первым в тай-брейке
+                self.server = 3 - self.server
+                self._finish_set(winner)
+            return
+
+        if a >= 4 and a - b >= 2:
+            self.games[w] += 1
+            self.points = [0, 0]
+            self.server = 3 - self.server
+            g, h = self.games[w], self.games[l]
+            if (g >= 6 and g - h >= 2) or g == 7:
+                self._finish_set(winner)
+            elif g == 6 and h == 6:
+                self.tiebreak = True
+
+    def probability(self):
+        """Вероятность победы игрока 1 при текущем счёте"""
+        if self.winner is not None:
+            return 1.0 if self.winner == 1 else 0.0
+        return self.table.in_play(self.sets[0], self.sets[1], self.games[0], self.games[1],
+                                  self.points[0], self.points[1], self.server, self.tiebreak)
+
+    def point_server(self):
+        if self.tiebreak:
+            return self.table.tiebreak_server(self.points[0], self.points[1], self.server)
+        return self.server
+
+    def score(self):
+        """Счёт строкой: '6-4 3-2 40-15', в тай-брейке '6-4 6-6 (5-4)'"""
+        parts = [f"{g1}-{g2}" for g1, g2 in self.set_scores]
+        if self.winner is not None:
+            return ' '.join(parts)
+        parts.append(f"{self.games[0]}-{self.games[1]}")
+        a, b = self.points
+        if self.tiebreak:
+            parts.append(f"({a}-{b})")
+        elif a >= 3 and b >= 3:
+            parts.append('40-40' if a == b else ('AD-40' if a > b else '40-AD'))
+        elif a or b:
+            parts.append(f"{POINT_NAMES[a]}-{POINT_NAMES[b]}")
+        return ' '.join(parts)
+
+    def to_dict(self):
+        data = {'match': self.match_id, 'score': self.score(), 'server': self.point_server(),
+                'probability': round(self.probability(), 6)}
+        if self.winner is not None:
+            data['winner'] = self.winner
+        return data
+
+
+class LivePipeline:
+    """Обработка событий многих одновременных матчей"""
+
+    def __init__(self, db):
+        self.db = db
+        # Подачи считаются по points_won - читаем их один раз
+        self.points_won = load_points_won(db.conn)
+        self.names = dict(db.query('SELECT id, name FROM players'))
+        self.matches = {}
+        self.events = 0
+        self.errors = 0
+
+    def _player(self, player):
+        if isinstance(player, int):
+            if player not in self.names:
+                raise ValueError(f"Игрока с id {player} нет в базе")
+            return player
+        player_id = self.db.find_player_id(str(player))
+        if player_id is None:
+            raise ValueError(f"Игрок '{player}' не найден")
+        return player_id
+
+    def start(self, event):
+        match_id = event['match']
+        surface = event.get('surface', 'hard')
+        if surface not in SURFACES:
+            raise ValueError(f"Неизвестное покрытие '{surface}'")
+        id1, id2 = self._player(event['player1']), self._player(event['player2'])
+        p1, p2 = serve_probabilities(self.points_won.get((id1, surface)), self.points_won.get((id2, surface)))
+        # Подачи можно задать явно (например, из внешней модели); 0 и 1
+        # делают тай-брейк бесконечным - ограничиваем, как и расчётные
+        p1, p2 = (min(SERVE_MAX, max(SERVE_MIN, float(event.get(key, p))))
+                  for key, p in (('p1_serve', p1), ('p2_serve', p2)))
+        match = LiveMatch(match_id, id1, id2, p1, p2, int(event.get('best_of', 3)),
+                          int(event.get('server', 1)), surface)
+        self.matches[match_id] = match
+        data = match.to_dict()
+        data.update(player1=self.names.get(id1), player2=self.names.get(id2))
+        return data
+
+    def process(self, event):
+        """Одно событие (dict) -> строка результата (dict)"""
+        self.events += 1
+        try:
+            kind = event.get('type', 'point')
+            if kind == 'start':
+                return self.start(event)
+            match = self.matches.get(event.get('match'))
+            if match is None:
+                raise ValueError(f"Матч '{event.get('match')}' не начат")
+            if kind == 'end':
+                del self.matches[match.match_id]
+                return match.to_dict()
+            if kind != 'point':
+                raise ValueError(f"Неизвестный тип события '{kind}'")
+            match.point(int(event['winner']))
+            data = match.to_dict()
+            if match.winner is not None:
+                del self.matches[match.match_id]
+            return data
+        except (KeyError, TypeError, ValueError) as e:
+            self.errors += 1
+            return {'match': event.get('match') if isinstance(event, dict) else None, 'error': str(e)}
+
+    def process_line(self, line):
+        """Строка JSON -> строка JSON результата (None для пустых строк)"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            self.events += 1
+            self.errors += 1
+            return json.dumps({'error': 'некорректный JSON'}, ensure_ascii=False)
+        if not isinstance(event, dict):
+            self.events += 1
+            self.errors += 1
+            return json.dumps({'error': 'событие должно быть объектом'}, ensure_ascii=False)
+        return json.dumps(self.process(event), ensure_ascii=False)
+
+    def run_lines(self, lines, out):
+        for line in lines:
+            result = self.process_line(line)
+            if result is not None:
+                out.write(result + '\n')
+        out.flush()
+
+    async def _handle(self, reader, writer, out):
+        # Ответы идут и клиенту, и в общий вывод
+        try:
+            async for line in reader:
+                result = self.process_line(line.decode('utf-8'))
+                if result is not None:
+                    data = result + '\n'
+                    out.write(data)
+                    writer.write(data.encode('utf-8'))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            out.flush()
+            writer.close()
+
+    async def serve(self, address, out):
+        """Слушать tcp://host:port или unix:/path; события всех клиентов - в один конвейер"""
+        handler = lambda reader, writer: self._handle(reader, writer, out)
+        if address.startswith('unix:'):
+            server = await asyncio.start_unix_server(handler, address[len('unix:'):])
+        else:
+            host, _, port = address[len('tcp://'):].rpartition(':') if address.startswith('tcp://') \
+                else address.rpartition(':')
+            server = await asyncio.start_server(handler, host or '127.0.0.1', int(port))
+        print(f"🎾 Приём событий: {address}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Живые вероятности победы по потоку розыгрышей')
+    parser.add_argument('source', nargs='?', default='-', help="файл JSON Lines или '-' (stdin)")
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--listen', default=None, help='tcp://host:port или unix:/path вместо файла')
+    parser.add_argument('--out', default=None, help='файл для результатов (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    pipeline = LivePipeline(db)
+    out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+    start = time.perf_counter()
+    try:
+        if args.listen:
+            asyncio.run(pipeline.serve(args.listen, out))
+        elif args.source == '-':
+            pipeline.run_lines(sys.stdin, out)
+        else:
+            with open(args.source, encoding='utf-8') as f:
+                pipeline.run_lines(f, out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        seconds = time.perf_counter() - start
+        print(f"Событий: {pipeline.events}, ошибок: {pipeline.errors}, "
+              f"{pipeline.events / seconds if seconds > 0 else 0:.0f} событий/с", file=sys.stderr)
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Нагрузочный тест HTTP сервиса (tennis_server.py)
+
+    python tennis_loadtest.py --url http://127.0.0.1:8080 --concurrency 32 --seconds 10
+
+Каждый клиент держит keep-alive соединение и по кругу запрашивает набор
+адресов. В конце печатаются запросов/с и задержки p50/p90/p99.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_PATHS = [
+    '/ranking?limit=50',
+    '/player?name=' + quote('Sinner'),
+    '/search?q=' + quote('Испания'),
+    '/top-surface?surface=clay&limit=10',
+    '/countries',
+    '/h2h?p1=' + quote('Sinner') + '&p2=' + quote('Alcaraz'),
+    '/predict?p1=' + quote('Medvedev') + '&p2=' + quote('Zverev') + '&surface=grass',
+]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _request(reader, writer, host, method, path, body=None):
+    data = body or b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(data)}\r\n"
+        f"Content-Type: application/json\r\n\r\n".encode('latin-1') + data)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host, port, requests, deadline, latencies, errors, offset):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            start = time.perf_counter()
+            status = await _request(reader, writer, host, method, path, body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(url, concurrency, seconds, paths=None, batch_size=0):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    requests = [('GET', path, None) for path in (paths or DEFAULT_PATHS)]
+    if batch_size:
+        body = json.dumps({'surface': 'clay',
+                           'pairs': [[i, i + 1] for i in range(1, batch_size + 1)]}).encode()
+        requests.append(('POST', '/predict', body))
+
+    latencies = []
+    errors = {}
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(_client(host, port, requests, deadline, latencies, errors, k)
+                           for k in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Нагрузочный тест HTTP сервиса')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help='добавить POST /predict с пачкой из N пар (id игроков 1..N+1)')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.concurrency, args.seconds, batch_size=args.batch_size))
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"Запросов: {report['requests']} | {report['rps']:.0f} запр/с")
+    print(f"Задержка: p50 {report['p50_ms']:.2f} мс | p90 {report['p90_ms']:.2f} мс | "
+          f"p99 {report['p99_ms']:.2f} мс")
+    if report['errors']:
+        print(f"Ошибки: {report['errors']}")
+
+
+if __name__ == "__main__":
+    main()
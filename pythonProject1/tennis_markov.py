@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Марковская модель теннисного матча по вероятностям выигрыша очка на подаче
+
+Игрок 1 выигрывает очко на своей подаче с вероятностью p1, игрок 2 - p2.
+Из этого точно (рекурсией по счёту) считаются вероятности выиграть гейм,
+тай-брейк (до 7, с разницей в 2, на 6:6 в любом сете), сет и матч до 2
+или 3 выигранных сетов из любого текущего счёта.
+
+Вероятности квантуются с шагом 1 / QUANT, и для каждой пары (p1, p2) и
+формата матча таблица MatchTable создаётся один раз (lru_cache) и сама
+запоминает посчитанные состояния - повторный запрос того же счёта
+становится поиском в словаре.
+
+Предматчевая вероятность (prematch_probabilities) считается той же
+рекурсией сразу для массивов подач: MatchTable работает и с массивами
+NumPy вместо чисел. Результаты запоминаются по квантованной паре
+подач, так что пакет из миллионов пар считает точно только уникальные
+пары, которых ещё нет в кеше, а остальное - поиск.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Средняя доля очков, выигранных на своей подаче в ATP
+SERVE_BASE = 0.64
+SERVE_MIN = 0.05
+SERVE_MAX = 0.95
+QUANT = 1000
+CACHE_SIZE = 4096
+# Предел записей в кеше предматчевых вероятностей (на формат матча)
+PREMATCH_CACHE_SIZE = 1000000
+
+# Модели прогноза: имя -> число сетов в матче
+MARKOV_MODELS = {'markov': 3, 'markov5': 5}
+
+
+def serve_probabilities(points_won1, points_won2):
+    """(p1, p2) - вероятности выиграть очко на своей подаче
+
+    points_won - доля всех выигранных очков на покрытии (surface_stats);
+    преимущество одного игрока над другим добавляется к средней подаче
+    его и вычитается из подачи соперника. Нет статистики - 0.5.
+    """
+    diff = (0.5 if points_won1 is None else points_won1) - (0.5 if points_won2 is None else points_won2)
+    clip = lambda p: min(SERVE_MAX, max(SERVE_MIN, p))
+    return clip(SERVE_BASE + diff), clip(SERVE_BASE - diff)
+
+
+def serve_probabilities_many(points_won1, points_won2):
+    """serve_probabilities для массивов points_won (NaN - нет статистики)"""
+    diff = (np.nan_to_num(np.asarray(points_won1, dtype=np.float64), nan=0.5)
+            - np.nan_to_num(np.asarray(points_won2, dtype=np.float64), nan=0.5))
+    return (np.clip(SERVE_BASE + diff, SERVE_MIN, SERVE_MAX),
+            np.clip(SERVE_BASE - diff, SERVE_MIN, SERVE_MAX))
+
+
+def quantize(p):
+    return int(round(min(1.0, max(0.0, p)) * QUANT))
+
+
+def _other(player):
+    return 3 - player
+
+
+def _set_over(g1, g2):
+    """Победитель сета по счёту в геймах (1, 2) или 0, если сет продолжается"""
+    if (g1 >= 6 and g1 - g2 >= 2) or g1 == 7:
+        return 1
+    if (g2 >= 6 and g2 - g1 >= 2) or g2 == 7:
+        return 2
+    return 0
+
+
+class MatchTable:
+    """Запоминаемые вероятности победы игрока 1 для пары (p1, p2) и формата матча"""
+
+    def __init__(self, p1, p2, best_of=3):
+        if best_of not in (3, 5):
+            raise ValueError(f"Матч играется до 2 или 3 побед в сетах, а не best_of={best_of}")
+        self.p = {1: p1, 2: p2}
+        self.best_of = best_of
+        self.sets_to_win = best_of // 2 + 1
+        self._game = {}
+        self._tiebreak = {}
+        self._match = {}
+
+    # --- гейм ---
+
+    def game(self, a, b, server):
+        """Вероятность, что подающий server выиграет гейм при счёте a:b в его пользу"""
+        if a >= 4 and a - b >= 2:
+            return 1.0
+        if b >= 4 and b - a >= 2:
+            return 0.0
+        if a >= 3 and b >= 3:
+            # Ровно / больше: зависят только от разницы
+            a, b = 3 + (a - b > 0), 3 + (b - a > 0)
+        key = (a, b, server)
+        value = self._game.get(key)
+        if value is None:
+            p = self.p[server]
+            if a == 3 and b == 3:
+                value = p * p / (p * p + (1 - p) * (1 - p))
+            else:
+                value = p * self.game(a + 1, b, server) + (1 - p) * self.game(a, b + 1, server)
+            self._game[key] = value
+        return value
+
+    def game_for_player1(self, a, b, server):
+        """Вероятность, что игрок 1 выиграет гейм; a, b - очки игроков 1 и 2"""
+        if server == 1:
+            return self.game(a, b, 1)
+        return 1.0 - self.game(b, a, 2)
+
+    # --- тай-брейк ---
+
+    @staticmethod
+    def tiebreak_server(a, b, first_server):
+        """Кто подаёт очко a + b тай-брейка: первое очко, затем смена через каждые два"""
+        return first_server if ((a + b + 1) // 2) % 2 == 0 else _other(first_server)
+
+    def _point_for_player1(self, server):
+        return self.p[1] if server == 1 else 1.0 - self.p[2]
+
+    def tiebreak(self, a, b, first_server):
+        """Вероятность, что игрок 1 выиграет тай-брейк при счёте a:b"""
+        if a >= 7 and a - b >= 2:
+            return 1.0
+        if b >= 7 and b - a >= 2:
+            return 0.0
+        key = (a, b, first_server)
+        value = self._tiebreak.get(key)
+        if value is None:
+            q = self._point_for_player1(self.tiebreak_server(a, b, first_server))
+            if a == b and a >= 6:
+                # Из равного счёта следующие два очка подают разные игроки
+                r = self._point_for_player1(self.tiebreak_server(a + 1, b, first_server))
+                value = q * r / (q * r + (1 - q) * (1 - r))
+            else:
+                value = (q * self.tiebreak(a + 1, b, first_server)
+                         + (1 - q) * self.tiebreak(a, b + 1, first_server))
+            self._tiebreak[key] = value
+        return value
+
+    # --- сет и матч ---
+
+    def _after_set(self, s1, s2, winner, next_server):
+        s1, s2 = (s1 + 1, s2) if winner == 1 else (s1, s2 + 1)
+        return self.match(s1, s2, 0, 0, next_server)
+
+    def _after_game(self, s1, s2, g1, g2, next_server):
+        winner = _set_over(g1, g2)
+        if winner:
+            return self._after_set(s1, s2, winner, next_server)
+        return self.match(s1, s2, g1, g2, next_server)
+
+    def match(self, s1=0, s2=0, g1=0, g2=0, server=1):
+        """Вероятность победы игрока 1 в матче перед геймом при счёте s1:s2 по сетам
+        и g1:g2 в сете; server подаёт этот гейм"""
+        if s1 >= self.sets_to_win:
+            return 1.0
+        if s2 >= self.sets_to_win:
+            return 0.0
+        key = (s1, s2, g1, g2, server)
+        value = self._match.get(key)
+        if value is None:
+            if g1 == 6 and g2 == 6:
+                # Тай-брейк; следующий сет начинает подавать принимавший первым
+                win = self.tiebreak(0, 0, server)
+                value = (win * self._after_set(s1, s2, 1, _other(server))
+                         + (1 - win) * self._after_set(s1, s2, 2, _other(server)))
+            else:
+                win = self.game_for_player1(0, 0, server)
+                value = (win * self._after_game(s1, s2, g1 + 1, g2, _other(server))
+                         + (1 - win) * self._after_game(s1, s2, g1, g2 + 1, _other(server)))
+            self._match[key] = value
+        return value
+
+    def in_play(self, s1, s2, g1, g2, a, b, server, tiebreak=False):
+        """Вероятность победы игрока 1 из любого счёта внутри гейма или тай-брейка
+
+        a, b - очки игроков 1 и 2 в текущем гейме (тай-брейке); server -
+        подающий гейм, а в тай-брейке - подававший первое очко тай-брейка.
+        """
+        if s1 >= self.sets_to_win:
+            return 1.0
+        if s2 >= self.sets_to_win:
+            return 0.0
+        if tiebreak:
+            win = self.tiebreak(a, b, server)
+            return (win * self._after_set(s1, s2, 1, _other(server))
+                    + (1 - win) * self._after_set(s1, s2, 2, _other(server)))
+        win = self.game_for_player1(a, b, server)
+        return (win * self._after_game(s1, s2, g1 + 1, g2, _other(server))
+                + (1 - win) * self._after_game(s1, s2, g1, g2 + 1, _other(server)))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _table(q1, q2, best_of):
+    return MatchTable(q1 / QUANT, q2 / QUANT, best_of)
+
+
+def match_table(p1, p2, best_of=3):
+    """Общая таблица для квантованных (p1, p2)"""
+    return _table(quantize(p1), quantize(p2), best_of)
+
+
+_prematch_cache = {3: {}, 5: {}}
+
+
+def _prematch_exact(p1, p2, best_of):
+    # Кто подаёт первым, решает жребий
+    table = MatchTable(p1, p2, best_of)
+    return 0.5 * (table.match(server=1) + table.match(server=2))
+
+
+def prematch_probabilities(p1, p2, best_of=3):
+    """Вероятности победы игрока 1 до начала матча для массивов подач p1, p2"""
+    if best_of not in _prematch_cache:
+        raise ValueError(f"Матч играется до 2 или 3 побед в сетах, а не best_of={best_of}")
+    q1 = np.rint(np.clip(np.asarray(p1, dtype=np.float64), 0.0, 1.0) * QUANT).astype(np.int64)
+    q2 = np.rint(np.clip(np.asarray(p2, dtype=np.float64), 0.0, 1.0) * QUANT).astype(np.int64)
+    keys, inverse = np.unique(q1 * (QUANT + 1) + q2, return_inverse=True)
+    keys = keys.tolist()
+
+    cache = _prematch_cache[best_of]
+    missing = [key for key in keys if key not in cache]
+    if missing:
+        if len(cache) + len(missing) > PREMATCH_CACHE_SIZE:
+            cache.clear()
+        m = np.array(missing, dtype=np.int64)
+        probs = _prematch_exact(m // (QUANT + 1) / QUANT, m % (QUANT + 1) / QUANT, best_of)
+        cache.update(zip(missing, np.broadcast_to(probs, m.shape).tolist()))
+    return np.array([cache[key] for key in keys])[inverse.ravel()].reshape(q1.shape)
+
+
+def prematch_probability(p1, p2, best_of=3):
+    """Вероятность победы игрока 1 до начала матча"""
+    return float(prematch_probabilities([p1], [p2], best_of)[0])
+
+
+def load_points_won(conn):
+    """{(player_id, покрытие): points_won} из surface_stats одним запросом"""
+    return {(pid, surface): points_won for pid, surface, points_won in conn.execute(
+        'SELECT player_id, surface, points_won FROM surface_stats WHERE points_won IS NOT NULL')}
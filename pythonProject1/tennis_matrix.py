@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Предрасчитанная матрица вероятностей побед для всех пар игроков
+
+Массив float32 формы (покрытие, погода, N, N): probs[s, w, i, j] -
+вероятность победы игрока i над j по формуле predict_match. После
+построения прогноз и противостояние - просто чтение элемента массива.
+При изменении очков или статистики одного игрока пересчитываются только
+его строка и столбец (O(N) вместо O(N²)).
+
+Память: 18 * N² * 4 байт - около 3 МБ для 200 игроков и 290 МБ для 2000,
+поэтому матрица включается явно (TennisDatabase.enable_probability_matrix).
+"""
+import os
+
+import numpy as np
+
+from tennis_predict import WEATHER_COLUMNS, predict_rows
+from tennis_system import DEFAULT_FORMULA, SURFACES
+
+
+class ProbabilityMatrix:
+    """Матрица вероятностей N×N для всех покрытий и погодных условий"""
+
+    def __init__(self, ids, probs, params=()):
+        self.ids = ids
+        self.probs = probs
+        # Параметры формулы, по которым посчитана матрица (() - исходные)
+        self.params = tuple(params)
+        self.index = {int(pid): i for i, pid in enumerate(ids)}
+
+    @classmethod
+    def build(cls, table, params=()):
+        """Посчитать матрицу по колоночной таблице игроков (params - FormulaParams)"""
+        n = len(table)
+        probs = np.empty((len(SURFACES), len(WEATHER_COLUMNS), n, n), dtype=np.float32)
+        rows = np.arange(n)
+        for s, surface in enumerate(SURFACES):
+            for w, weather in enumerate(WEATHER_COLUMNS):
+                for i in range(n):
+                    # Построчно, чтобы не держать в памяти временные массивы N² float64
+                    probs[s, w, i] = predict_rows(table, np.full(n, i), rows, surface, weather, *params)
+        return cls(table.ids.copy(), probs, params)
+
+    def update_players(self, table, player_ids, params=()):
+        """Пересчитать строки и столбцы изменившихся игроков"""
+        n = len(self.ids)
+        rows = np.arange(n)
+        for player_id in player_ids:
+            i = self.index[int(player_id)]
+            for s, surface in enumerate(SURFACES):
+                for w, weather in enumerate(WEATHER_COLUMNS):
+                    self.probs[s, w, i, :] = predict_rows(table, np.full(n, i), rows, surface, weather, *params)
+                    self.probs[s, w, :, i] = predict_rows(table, rows, np.full(n, i), surface, weather, *params)
+
+    def lookup(self, player1_id, player2_id, surface='hard', weather='sunny'):
+        """Вероятность победы player1 над player2"""
+        s = SURFACES.index(surface)
+        w = WEATHER_COLUMNS.index(weather)
+        return float(self.probs[s, w, self.index[player1_id], self.index[player2_id]])
+
+    def save(self, path):
+        """Сохранить матрицу на диск (несжатый .npz)"""
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, ids=self.ids, probs=self.probs, params=np.array(self.params, dtype=np.float64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        params = data['params'].tolist() if 'params' in data.files else ()
+        return cls(data['ids'], data['probs'], params)
+
+
+class MatrixCache:
+    """Матрица, привязанная к TennisDatabase и обновляемая при записи
+
+    Подписывается на уведомления о записи: изменение существующих игроков
+    обновляет их строки/столбцы, появление новых помечает матрицу
+    устаревшей - она перестроится при следующем обращении.
+    """
+
+    def __init__(self, db, path=None):
+        self.db = db
+        self.path = path
+        self.matrix = None
+        self.stale = True
+        self.dirty = False
+        if path and os.path.exists(path):
+            matrix = ProbabilityMatrix.load(path)
+            # Файл подходит, только если игроки и параметры формулы совпадают с базой
+            if (np.array_equal(matrix.ids, db.get_player_table().ids)
+                    and (matrix.params or tuple(DEFAULT_FORMULA)) == tuple(db.formula)):
+                self.matrix = matrix
+                self.stale = False
+        db.add_write_listener(self.on_write)
+
+    def on_write(self, player_ids):
+        if self.matrix is None or player_ids is None:
+            self.stale = True
+            return
+        if any(int(pid) not in self.matrix.index for pid in player_ids):
+            self.stale = True
+            return
+        self.matrix.update_players(self.db.get_player_table(), player_ids, self.db.formula)
+        self.dirty = True
+
+    def get(self):
+        """Актуальная матрица (перестраивается, если устарела)"""
+        if self.stale:
+            self.matrix = ProbabilityMatrix.build(self.db.get_player_table(), self.db.formula)
+            self.stale = False
+            self.dirty = True
+            self.save()
+        return self.matrix
+
+    def save(self):
+        """Записать матрицу на диск (после точечных обновлений - явно)"""
+        if self.matrix is not None and self.path:
+            self.matrix.save(self.path)
+            self.dirty = False
+
+    def lookup(self, player1_id, player2_id, surface='hard', weather='sunny'):
+        return self.get().lookup(player1_id, player2_id, surface, weather)
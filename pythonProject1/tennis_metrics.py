@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""Инструментирование TennisDatabase: время методов, счётчики SQL, медленные запросы
+
+Включается db.enable_metrics(). Пока метрики выключены, соединение и
+курсор отдаются как есть - остаётся одна проверка атрибута на обращение.
+При включении соединение и курсоры оборачиваются: каждый execute и
+fetch учитывается, для запросов дольше порога в журнал пишется
+EXPLAIN QUERY PLAN.
+"""
+import json
+import threading
+import time
+import weakref
+from collections import deque
+
+# Границы корзин гистограммы задержек, мс
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+
+
+def _normalize_sql(sql):
+    return ' '.join(sql.split())
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+
+    def add(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                return
+
+    def to_dict(self):
+        return {('inf' if b == float('inf') else str(b)): c for b, c in zip(BUCKETS_MS, self.counts) if c}
+
+
+class _Stat:
+    __slots__ = ('calls', 'total_ms', 'max_ms', 'sql', 'rows', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sql = 0
+        self.rows = 0
+        self.histogram = Histogram()
+
+    def add(self, ms, sql=0, rows=0):
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.sql += sql
+        self.rows += rows
+        self.histogram.add(ms)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.calls, 4) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'sql': self.sql,
+            'sql_per_call': round(self.sql / self.calls, 2) if self.calls else 0.0,
+            'rows': self.rows,
+            'histogram': self.histogram.to_dict(),
+        }
+
+
+class Metrics:
+    """Накопитель метрик: методы, SQL-запросы и журнал медленных запросов"""
+
+    def __init__(self, slow_query_ms=50.0, slow_log_size=100, explain=True):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.methods = {}
+        self.statements = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cursors = weakref.WeakKeyDictionary()
+
+    # --- учёт в текущем потоке ---
+
+    def _counters(self):
+        local = self._local
+        if not hasattr(local, 'sql'):
+            local.sql = 0
+            local.rows = 0
+            local.stack = []
+        return local
+
+    def method_started(self):
+        local = self._counters()
+        return local.sql, local.rows, time.perf_counter()
+
+    def method_finished(self, name, token):
+        sql0, rows0, start = token
+        ms = (time.perf_counter() - start) * 1000
+        local = self._counters()
+        with self._lock:
+            stat = self.methods.get(name)
+            if stat is None:
+                stat = self.methods[name] = _Stat()
+            stat.add(ms, local.sql - sql0, local.rows - rows0)
+
+    def record_statement(self, sql, ms, rows=0, executed=True):
+        local = self._counters()
+        if executed:
+            local.sql += 1
+        local.rows += rows
+        key = _normalize_sql(sql)
+        with self._lock:
+            stat = self.statements.get(key)
+            if stat is None:
+                stat = self.statements[key] = _Stat()
+            if executed:
+                stat.add(ms, 1, rows)
+            else:
+                # Время выборки строк добавляем к уже учтённому выполнению
+                stat.total_ms += ms
+                stat.rows += rows
+
+    def record_slow(self, conn, sql, params, ms):
+        plan = []
+        if self.explain and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            try:
+                plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params or ())]
+            except Exception as e:
+                plan = [f'EXPLAIN не удался: {e}']
+        entry = {
+            'sql': _normalize_sql(sql),
+            'params': repr(params)[:200] if params else '',
+            'ms': round(ms, 3),
+            'plan': plan,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with self._lock:
+            self.slow_log.append(entry)
+
+    # --- обёртки ---
+
+    def wrap_connection(self, conn):
+        return TracedConnection(conn, self)
+
+    def wrap_cursor(self, cursor):
+        # Храним только состояние (последний SQL), а не обёртку: обёртка
+        # ссылается на курсор, и слабый ключ тогда никогда бы не освободился
+        state = self._cursors.get(cursor)
+        if state is None:
+            state = self._cursors[cursor] = ['']
+        return TracedCursor(cursor, self, cursor.connection, state)
+
+    # --- экспорт ---
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.slow_log.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'methods': {name: stat.to_dict() for name, stat in self.methods.items()},
+                'statements': {sql: stat.to_dict() for sql, stat in self.statements.items()},
+                'slow_queries': list(self.slow_log),
+                'slow_query_ms': self.slow_query_ms,
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+    def format_text(self, top=15):
+        data = self.to_dict()
+        lines = [f"{'Метод':32} {'вызовов':>8} {'ср. мс':>9} {'макс мс':>9} {'SQL/вызов':>10} {'строк':>8}"]
+        for name, s in sorted(data['methods'].items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(f"{name:32} {s['calls']:8d} {s['avg_ms']:9.3f} {s['max_ms']:9.3f} "
+                         f"{s['sql_per_call']:10.1f} {s['rows']:8d}")
+        lines.append('')
+        lines.append(f"{'SQL':60} {'выполн.':>8} {'всего мс':>10} {'строк':>8}")
+        statements = sorted(data['statements'].items(), key=lambda item: -item[1]['total_ms'])[:top]
+        for sql, s in statements:
+            short = sql if len(sql) <= 60 else sql[:57] + '...'
+            lines.append(f"{short:60} {s['calls']:8d} {s['total_ms']:10.3f} {s['rows']:8d}")
+        if data['slow_queries']:
+            lines.append('')
+            lines.append(f"Медленные запросы (> {self.slow_query_ms} мс):")
+            for entry in data['slow_queries']:
+                lines.append(f"  {entry['ms']:.1f} мс  {entry['sql'][:100]}")
+                for detail in entry['plan']:
+                    lines.append(f"      {detail}")
+        return '\n'.join(lines)
+
+
+class TracedCursor:
+    """Курсор, учитывающий выполнение запросов и выбранные строки"""
+
+    def __init__(self, cursor, metrics, conn, state=None):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._conn = conn
+        # Последний выполненный SQL общий для всех обёрток одного курсора
+        self._state = state if state is not None else ['']
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        self._cursor.execute(sql, params)
+        ms = (time.perf_counter() - start) * 1000
+        self._state[0] = sql
+        self._metrics.record_statement(sql, ms)
+        if ms >= self._metrics.slow_query_ms:
+            self._metrics.record_slow(self._conn, sql, params, ms)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        ms = (time.perf_counter() - start) * 1000
+        self._state[0] = sql
+        self._metrics.record_statement(sql, ms, max(self._cursor.rowcount, 0))
+        return self
+
+    def _fetched(self, start, rows):
+        self._metrics.record_statement(self._state[0], (time.perf_counter() - start) * 1000, rows, executed=False)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, 1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __iter__(self):
+        count = 0
+        start = time.perf_counter()
+        for row in self._cursor:
+            count += 1
+            yield row
+        self._fetched(start, count)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    """Соединение, чьи execute и cursor() отдают TracedCursor"""
+
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def cursor(self):
+        return self._metrics.wrap_cursor(self._conn.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def main():
+    import argparse
+    import contextlib
+    import io
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Профиль запросов основных операций')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--slow-ms', type=float, default=5.0)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('player1', nargs='?', default='Sinner')
+    parser.add_argument('player2', nargs='?', default='Alcaraz')
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    metrics = db.enable_metrics(slow_query_ms=args.slow_ms)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.get_player_head_to_head(args.player1, args.player2)
+        db.predict_match(args.player1, args.player2, 'clay', 'rainy')
+        db.analyze_player(args.player1)
+        db.search_players(args.player2)
+        db.get_top_players_by_surface('grass')
+        db.get_country_stats()
+    print(metrics.to_json(indent=2) if args.json else metrics.format_text())
+
+
+if __name__ == "__main__":
+    main()
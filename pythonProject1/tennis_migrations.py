@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""Версионные миграции схемы базы
+
+Каждая миграция - (версия, название, функция). Применённые версии
+записываются в таблицу schema_version; migrate() выполняет только
+недостающие, по порядку, каждую в своей транзакции. Старые файлы
+tennis_atp.db без schema_version обновляются на месте.
+"""
+import sqlite3
+from datetime import datetime
+
+
+def _create_base_tables(conn):
+    """Исходные таблицы (как раньше создавал create_tables)"""
+    # Таблица игроков
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ranking INTEGER,
+            name TEXT,
+            country TEXT,
+            points INTEGER,
+            age INTEGER,
+            hand TEXT
+        )
+    ''')
+
+    # Таблица покрытий
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS surface_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER,
+            surface TEXT CHECK(surface IN ('hard', 'clay', 'grass')),
+            win_rate REAL,
+            matches INTEGER,
+            points_won REAL,
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    ''')
+
+    # Таблица погоды
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weather_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER,
+            weather TEXT CHECK(weather IN ('sunny', 'rainy', 'windy', 'indoor', 'hot', 'cold')),
+            win_rate REAL,
+            matches INTEGER,
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    ''')
+
+    # Таблица турниров
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tournaments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            surface TEXT,
+            location TEXT,
+            level TEXT CHECK(level IN ('GS', 'Masters 1000', 'ATP 500', 'ATP 250'))
+        )
+    ''')
+
+
+def _remove_duplicates(conn):
+    """Убрать дубликаты, созданные повторной загрузкой игроков
+
+    Остаётся самая ранняя запись игрока (name, country) и самая ранняя
+    строка статистики на (player_id, surface) / (player_id, weather).
+    """
+    conn.execute('''
+        DELETE FROM players
+        WHERE id NOT IN (SELECT MIN(id) FROM players GROUP BY name, country)
+    ''')
+    for table in ('surface_stats', 'weather_stats'):
+        conn.execute(f'DELETE FROM {table} WHERE player_id NOT IN (SELECT id FROM players)')
+    conn.execute('''
+        DELETE FROM surface_stats
+        WHERE id NOT IN (SELECT MIN(id) FROM surface_stats GROUP BY player_id, surface)
+    ''')
+    conn.execute('''
+        DELETE FROM weather_stats
+        WHERE id NOT IN (SELECT MIN(id) FROM weather_stats GROUP BY player_id, weather)
+    ''')
+
+
+# Индексы players / surface_stats / weather_stats: (имя, DDL)
+TABLE_INDEXES = [
+    ('ux_players_name_country',
+     'CREATE UNIQUE INDEX IF NOT EXISTS ux_players_name_country ON players(name, country)'),
+    ('ux_surface_stats_player_surface',
+     'CREATE UNIQUE INDEX IF NOT EXISTS ux_surface_stats_player_surface ON surface_stats(player_id, surface)'),
+    ('ux_weather_stats_player_weather',
+     'CREATE UNIQUE INDEX IF NOT EXISTS ux_weather_stats_player_weather ON weather_stats(player_id, weather)'),
+    ('idx_surface_stats_surface_win',
+     'CREATE INDEX IF NOT EXISTS idx_surface_stats_surface_win ON surface_stats(surface, win_rate)'),
+    ('idx_players_ranking', 'CREATE INDEX IF NOT EXISTS idx_players_ranking ON players(ranking)'),
+]
+
+
+def create_table_indexes(conn):
+    for _, sql in TABLE_INDEXES:
+        conn.execute(sql)
+
+
+def drop_table_indexes(conn):
+    """Снять индексы на время загрузки в пустую базу; вернуть - create_table_indexes"""
+    for name, _ in TABLE_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def _add_indexes(conn):
+    """Покрывающие индексы для горячих запросов и ограничения уникальности"""
+    _remove_duplicates(conn)
+    create_table_indexes(conn)
+
+
+def _add_player_aliases(conn):
+    """Псевдонимы игроков (латинское написание, прозвища) для поиска по имени"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_aliases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id INTEGER NOT NULL,
+            alias TEXT NOT NULL,
+            FOREIGN KEY (player_id) REFERENCES players(id),
+            UNIQUE (player_id, alias)
+        )
+    ''')
+
+
+def _add_matches_and_ratings(conn):
+    """Результаты матчей и рейтинги Эло игроков (общий 'all' и по покрытиям)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER,
+            player1_id INTEGER NOT NULL,
+            player2_id INTEGER NOT NULL,
+            score TEXT,
+            winner_id INTEGER NOT NULL CHECK(winner_id IN (player1_id, player2_id)),
+            round TEXT,
+            match_date TEXT,
+            surface TEXT CHECK(surface IN ('hard', 'clay', 'grass')),
+            FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
+            FOREIGN KEY (player1_id) REFERENCES players(id),
+            FOREIGN KEY (player2_id) REFERENCES players(id),
+            FOREIGN KEY (winner_id) REFERENCES players(id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(match_date, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_player1 ON matches(player1_id, match_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_player2 ON matches(player2_id, match_date)')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_ratings (
+            player_id INTEGER NOT NULL,
+            surface TEXT NOT NULL CHECK(surface IN ('all', 'hard', 'clay', 'grass')),
+            rating REAL NOT NULL,
+            matches INTEGER NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (player_id, surface),
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    ''')
+
+
+# Сводка по странам: вычесть старую строку игрока, прибавить новую
+_ADD_PLAYER = '''
+    INSERT INTO country_summary (country, players, ranked, ranking_sum, points_sum)
+    VALUES (NEW.country, 1, NEW.ranking IS NOT NULL, COALESCE(NEW.ranking, 0), COALESCE(NEW.points, 0))
+    ON CONFLICT (country) DO UPDATE SET
+        players = players + 1,
+        ranked = ranked + excluded.ranked,
+        ranking_sum = ranking_sum + excluded.ranking_sum,
+        points_sum = points_sum + excluded.points_sum;
+'''
+_REMOVE_PLAYER = '''
+    UPDATE country_summary SET
+        players = players - 1,
+        ranked = ranked - (OLD.ranking IS NOT NULL),
+        ranking_sum = ranking_sum - COALESCE(OLD.ranking, 0),
+        points_sum = points_sum - COALESCE(OLD.points, 0)
+    WHERE country = OLD.country;
+    DELETE FROM country_summary WHERE country = OLD.country AND players <= 0;
+'''
+_ADD_LEADER = '''
+    INSERT INTO surface_leaderboard (surface, win_rate, player_id, name, country, ranking, matches)
+    SELECT NEW.surface, NEW.win_rate, NEW.player_id, p.name, p.country, p.ranking, NEW.matches
+    FROM players p
+    WHERE p.id = NEW.player_id AND NEW.win_rate IS NOT NULL;
+'''
+_REMOVE_LEADER = '''
+    DELETE FROM surface_leaderboard
+    WHERE surface = OLD.surface AND win_rate = OLD.win_rate AND player_id = OLD.player_id;
+'''
+
+# Триггеры сводок: (имя, событие, условие, тело)
+SUMMARY_TRIGGERS = [
+    ('trg_players_insert_summary', 'AFTER INSERT ON players', 'NEW.country IS NOT NULL', _ADD_PLAYER),
+    ('trg_players_delete_summary', 'AFTER DELETE ON players', 'OLD.country IS NOT NULL', _REMOVE_PLAYER),
+    ('trg_players_update_summary_old', 'AFTER UPDATE OF country, ranking, points ON players',
+     'OLD.country IS NOT NULL', _REMOVE_PLAYER),
+    ('trg_players_update_summary_new', 'AFTER UPDATE OF country, ranking, points ON players',
+     'NEW.country IS NOT NULL', _ADD_PLAYER),
+    # Статистика могла появиться раньше игрока
+    ('trg_players_insert_leaderboard', 'AFTER INSERT ON players', None, '''
+        INSERT INTO surface_leaderboard (surface, win_rate, player_id, name, country, ranking, matches)
+        SELECT s.surface, s.win_rate, s.player_id, NEW.name, NEW.country, NEW.ranking, s.matches
+        FROM surface_stats s
+        WHERE s.player_id = NEW.id AND s.win_rate IS NOT NULL;
+    '''),
+    ('trg_players_update_leaderboard', 'AFTER UPDATE OF name, country, ranking ON players', None, '''
+        UPDATE surface_leaderboard SET name = NEW.name, country = NEW.country, ranking = NEW.ranking
+        WHERE player_id = NEW.id;
+    '''),
+    ('trg_players_delete_leaderboard', 'AFTER DELETE ON players', None,
+     'DELETE FROM surface_leaderboard WHERE player_id = OLD.id;'),
+    ('trg_surface_stats_insert_leaderboard', 'AFTER INSERT ON surface_stats', None, _ADD_LEADER),
+    ('trg_surface_stats_update_leaderboard', 'AFTER UPDATE ON surface_stats', None,
+     _REMOVE_LEADER + _ADD_LEADER),
+    ('trg_surface_stats_delete_leaderboard', 'AFTER DELETE ON surface_stats', None, _REMOVE_LEADER),
+]
+
+
+def create_summary_triggers(conn):
+    for name, event, condition, body in SUMMARY_TRIGGERS:
+        when = f'WHEN {condition}' if condition else ''
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} {when} BEGIN {body} END')
+
+
+def drop_summary_triggers(conn):
+    """Снять триггеры сводок (для массовой загрузки); False - сводок в схеме нет"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'country_summary'").fetchone()
+    if not exists:
+        return False
+    for name, _, _, _ in SUMMARY_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    return True
+
+
+def refresh_summaries(conn, first_player_id=None):
+    """Пересчитать сводки запросами по множеству строк
+
+    country_summary пересчитывается целиком (один GROUP BY); в
+    surface_leaderboard добавляются игроки с id >= first_player_id
+    (None - таблица строится заново).
+    """
+    conn.execute('DELETE FROM country_summary')
+    conn.execute('''
+        INSERT INTO country_summary (country, players, ranked, ranking_sum, points_sum)
+        SELECT country, COUNT(*), COUNT(ranking), COALESCE(SUM(ranking), 0), COALESCE(SUM(points), 0)
+        FROM players
+        WHERE country IS NOT NULL
+        GROUP BY country
+    ''')
+    if first_player_id is None:
+        conn.execute('DELETE FROM surface_leaderboard')
+        first_player_id = 0
+    # Строки берём по индексу player_id (последовательное чтение) и сортируем
+    # по ключу таблицы-лидерборда: «+» не даёт выбрать индекс (surface, win_rate),
+    # обход которого обращается к строкам surface_stats вразнобой
+    conn.execute('''
+        INSERT OR REPLACE INTO surface_leaderboard (surface, win_rate, player_id, name, country, ranking, matches)
+        SELECT s.surface, s.win_rate, s.player_id, p.name, p.country, p.ranking, s.matches
+        FROM surface_stats s
+        JOIN players p ON p.id = s.player_id
+        WHERE s.win_rate IS NOT NULL AND s.player_id >= ?
+        ORDER BY +s.surface, s.win_rate, s.player_id
+    ''', (first_player_id,))
+
+
+def _add_summary_tables(conn):
+    """Материализованные сводки для статистики стран и лидеров покрытий
+
+    country_summary - число игроков, сумма рейтингов и очков по стране;
+    surface_leaderboard - строки surface_stats с данными игрока,
+    отсортированные по (surface, win_rate) в самом B-дереве таблицы.
+    Обе таблицы поддерживаются триггерами при любой записи в players и
+    surface_stats, чтение топа - O(limit) без GROUP BY и сортировки.
+    Игроки без страны и статистика без win_rate в сводки не попадают.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS country_summary (
+            country TEXT PRIMARY KEY,
+            players INTEGER NOT NULL,
+            ranked INTEGER NOT NULL,
+            ranking_sum INTEGER NOT NULL,
+            points_sum INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_country_summary_points ON country_summary(points_sum)')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS surface_leaderboard (
+            surface TEXT NOT NULL,
+            win_rate REAL NOT NULL,
+            player_id INTEGER NOT NULL,
+            name TEXT,
+            country TEXT,
+            ranking INTEGER,
+            matches INTEGER,
+            PRIMARY KEY (surface, win_rate, player_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_surface_leaderboard_player ON surface_leaderboard(player_id)')
+
+    create_summary_triggers(conn)
+    refresh_summaries(conn)
+
+
+def _add_ranking_history(conn):
+    """Недельная история рейтинга: ключевые кадры и дельты
+
+    ranking_weeks - записанные недели (понедельник) и признак ключевого
+    кадра; ranking_history - строки (игрок, неделя) только для игроков,
+    у которых изменились место или очки (в ключевом кадре - все игроки).
+    ranking = NULL означает, что игрок выбыл из рейтинга.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ranking_weeks (
+            id INTEGER PRIMARY KEY,
+            week TEXT NOT NULL UNIQUE,
+            keyframe INTEGER NOT NULL DEFAULT 0,
+            recorded_at TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ranking_history (
+            player_id INTEGER NOT NULL,
+            week_id INTEGER NOT NULL,
+            ranking INTEGER,
+            points INTEGER,
+            PRIMARY KEY (player_id, week_id),
+            FOREIGN KEY (player_id) REFERENCES players(id),
+            FOREIGN KEY (week_id) REFERENCES ranking_weeks(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ranking_history_week ON ranking_history(week_id)')
+
+
+def _add_formula_params(conn):
+    """Погода в результатах матчей и подобранные параметры формулы прогноза"""
+    conn.execute('''
+        ALTER TABLE matches ADD COLUMN
+            weather TEXT CHECK(weather IN ('sunny', 'rainy', 'windy', 'indoor', 'hot', 'cold'))
+    ''')
+    # Одна строка: действующие параметры и их качество на истории матчей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS formula_params (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            surface_weight REAL NOT NULL,
+            weather_weight REAL NOT NULL,
+            prob_min REAL NOT NULL,
+            prob_max REAL NOT NULL,
+            matches INTEGER,
+            log_loss REAL,
+            brier REAL,
+            fitted_at TEXT
+        )
+    ''')
+
+
+def _drop_redundant_indexes(conn):
+    """Индексы (player_id, surface/weather, win_rate) планировщик не выбирает -
+    уникальные ux_* с тем же префиксом берутся всегда; они только замедляли запись
+    """
+    conn.execute('DROP INDEX IF EXISTS idx_surface_stats_player_surface_win')
+    conn.execute('DROP INDEX IF EXISTS idx_weather_stats_player_weather_win')
+
+
+# Упорядоченный список миграций. Новые добавлять только в конец.
+MIGRATIONS = [
+    (1, 'base tables', _create_base_tables),
+    (2, 'covering indexes and unique constraints', _add_indexes),
+    (3, 'player aliases', _add_player_aliases),
+    (4, 'matches and elo ratings', _add_matches_and_ratings),
+    (5, 'country and surface summary tables', _add_summary_tables),
+    (6, 'weekly ranking history', _add_ranking_history),
+    (7, 'match weather and formula parameters', _add_formula_params),
+    (8, 'drop redundant win_rate indexes', _drop_redundant_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT
+        )
+    ''')
+
+
+def current_version(conn):
+    """Текущая версия схемы (0 - миграции не применялись)"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """Применить недостающие миграции до версии target (по умолчанию последней)
+
+    Возвращает список применённых версий.
+    """
+    target = LATEST_VERSION if target is None else target
+    if current_version(conn) >= target:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if version > target:
+            break
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _ensure_version_table(conn)
+            # Перепроверяем под блокировкой: миграцию мог применить другой процесс
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                         (version, name, datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# Горячие запросы системы: (название, SQL, параметры)
+HOT_QUERIES = [
+    ('surface win_rate',
+     'SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (1, 'hard')),
+    ('weather win_rate',
+     'SELECT win_rate FROM weather_stats WHERE player_id = ? AND weather = ?', (1, 'sunny')),
+    ('player surface stats',
+     'SELECT surface, win_rate, matches FROM surface_stats WHERE player_id = ? ORDER BY win_rate DESC', (1,)),
+    ('player weather stats',
+     'SELECT weather, win_rate, matches FROM weather_stats WHERE player_id = ? ORDER BY win_rate DESC', (1,)),
+    ('top by surface', '''
+        SELECT player_id, name, country, ranking, win_rate, matches
+        FROM surface_leaderboard
+        WHERE surface = ?
+        ORDER BY win_rate DESC
+        LIMIT ?
+     ''', ('hard', 10)),
+    ('country stats', '''
+        SELECT country, players, CAST(ranking_sum AS REAL) / ranked, points_sum
+        FROM country_summary
+        WHERE players >= 2
+        ORDER BY points_sum DESC
+        LIMIT ?
+     ''', (15,)),
+    ('ranking', 'SELECT ranking, name, country, points FROM players ORDER BY ranking LIMIT ?', (50,)),
+    ('ranking as of', '''
+        SELECT ranking, points
+        FROM ranking_history
+        WHERE player_id = ? AND week_id BETWEEN ? AND ?
+        ORDER BY week_id DESC
+        LIMIT 1
+     ''', (1, 1, 10)),
+    ('ranking replay', '''
+        SELECT player_id, MAX(week_id), ranking, points
+        FROM ranking_history
+        WHERE week_id BETWEEN ? AND ?
+        GROUP BY player_id
+     ''', (1, 10)),
+]
+
+
+def explain(conn, sql, params=()):
+    """Строки EXPLAIN QUERY PLAN для запроса"""
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+
+
+def _is_full_scan(detail):
+    # «SCAN t» без индекса - полный просмотр таблицы
+    return detail.startswith('SCAN') and 'USING' not in detail
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Проверить, что горячие запросы используют индексы
+
+    Возвращает список (название, план, ok).
+    """
+    report = []
+    for name, sql, params in queries:
+        plan = explain(conn, sql, params)
+        ok = not any(_is_full_scan(detail) for detail in plan)
+        report.append((name, plan, ok))
+    return report
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Миграции схемы базы')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--check', action='store_true', help='проверить планы горячих запросов')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    before = current_version(conn)
+    applied = migrate(conn)
+    print(f"Версия схемы: {before} -> {current_version(conn)} (применено: {applied or 'нет'})")
+
+    if args.check:
+        failed = 0
+        for name, plan, ok in check_query_plans(conn):
+            print(f"{'✅' if ok else '❌'} {name}")
+            for detail in plan:
+                print(f"     {detail}")
+            failed += not ok
+        conn.close()
+        raise SystemExit(1 if failed else 0)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
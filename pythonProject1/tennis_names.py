@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Поиск игроков по имени: триграммный индекс с транслитерацией
+
+Для каждого игрока индексируются имя, его латинская транслитерация,
+псевдонимы из таблицы player_aliases и страна. Запрос и имена
+приводятся к общему «скелету» (нижний регистр, латиница, упрощённая
+фонетика), поэтому "Sinner" находит "Янник Синнер", а "Alcaraz" -
+"Карлос Алькарас". Результаты resolve() кешируются (LRU).
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from itertools import chain
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+
+# Упрощение написания, чтобы транслитерация и оригинальная латиница сходились
+_PHONETIC_RULES = [
+    ('shch', 'sh'), ('dzh', 'j'), ('dj', 'j'), ('zh', 'j'), ('kh', 'h'),
+    ('tch', 'ch'), ('tz', 'c'), ('ch', 'c'), ('ck', 'k'), ('ph', 'f'), ('ts', 'c'),
+    ('sh', 's'), ('qu', 'k'), ('x', 'ks'), ('w', 'v'), ('au', 'o'), ('oe', 'o'),
+    ('ou', 'u'), ('ei', 'e'), ('y', 'i'), ('z', 's'), ('c', 'k'), ('q', 'k'), ('j', 'i'),
+]
+
+_NON_WORD = re.compile(r'[^a-z0-9 ]+')
+_DOUBLE = re.compile(r'(.)\1+')
+
+# Минимальное сходство для resolve()
+MIN_SCORE = 0.5
+# Скелет запроса короче этого ищется только целым словом, не подстрокой
+MIN_SUBSTRING = 3
+# Запросы, которые не должны находить игрока (проверка строгости resolve)
+MUST_MISS = ('a', 'qqq', 'zzzzqqq', 'США', 'xx')
+
+
+def transliterate(text):
+    """Транслитерация кириллицы в латиницу (нижний регистр)"""
+    return ''.join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in text.lower())
+
+
+def skeleton(text):
+    """Нормализованный «скелет» строки для нечёткого сравнения"""
+    text = transliterate(text).replace('-', ' ').replace("'", '')
+    text = _NON_WORD.sub('', text)
+    for old, new in _PHONETIC_RULES:
+        text = text.replace(old, new)
+    text = _DOUBLE.sub(r'\1', text)
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    """Триграммы каждого слова, дополненного пробелами по краям"""
+    grams = set()
+    for word in text.split():
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameResolver:
+    """Триграммный индекс имён, псевдонимов и стран игроков
+
+    Индекс читают потоки пула без блокировки: добавление не меняет
+    множества и списки, которые может обходить поиск, а подменяет их
+    новыми (копирование при записи); добавления идут под _write_lock.
+    """
+
+    def __init__(self, conn, cache_size=4096):
+        self.conn = conn
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build()
+
+    def build(self):
+        """Построить индекс по таблицам players и player_aliases"""
+        self._postings = {}      # триграмма -> set(key)
+        self._keys = []          # key -> (player_id, skeleton, is_country, число триграмм)
+        self._ranking = {}
+        with self._cache_lock:
+            self._cache.clear()
+
+        rows = self.conn.execute('SELECT id, name, country, ranking FROM players').fetchall()
+        for player_id, name, country, ranking in rows:
+            self._add_player(player_id, name, country, ranking)
+
+        aliases = self.conn.execute('SELECT player_id, alias FROM player_aliases').fetchall()
+        for player_id, alias in aliases:
+            self._add_key(player_id, alias, False)
+
+    def _add_key(self, player_id, text, is_country, copy=False):
+        if not text:
+            return
+        key = len(self._keys)
+        norm = skeleton(text)
+        grams = trigrams(norm)
+        self._keys.append((player_id, norm, is_country, len(grams)))
+        for gram in grams:
+            if copy:
+                self._postings[gram] = self._postings.get(gram, set()) | {key}
+            else:
+                self._postings.setdefault(gram, set()).add(key)
+
+    def _add_player(self, player_id, name, country, ranking, copy=False):
+        self._ranking[player_id] = ranking if ranking is not None else float('inf')
+        self._add_key(player_id, name, False, copy)
+        self._add_key(player_id, country, True, copy)
+
+    def add_player(self, player_id, name, country, ranking, aliases=()):
+        """Добавить игрока в индекс без полной перестройки"""
+        with self._write_lock:
+            self._add_player(player_id, name, country, ranking, copy=True)
+            for alias in aliases:
+                self._add_key(player_id, alias, False, copy=True)
+            with self._cache_lock:
+                self._cache.clear()
+
+    def add_alias(self, player_id, alias):
+        with self._write_lock:
+            self._add_key(player_id, alias, False, copy=True)
+            with self._cache_lock:
+                self._cache.clear()
+
+    def _substring_keys(self, norm, countries):
+        """Ключи, содержащие norm: пересечение списков по триграммам внутри слов
+
+        Если в запросе нет слова из 3+ букв, пересекать нечего - такие
+        совпадения найдёт только подсчёт общих триграмм.
+        """
+        inner = {word[i:i + 3] for word in norm.split() for i in range(len(word) - 2)}
+        if not inner:
+            return []
+        postings = sorted((self._postings.get(gram, ()) for gram in inner), key=len)
+        if not postings[0]:
+            return []
+        candidates = postings[0].intersection(*postings[1:])
+        keys = self._keys
+        return [key for key in candidates
+                if norm in keys[key][1] and (countries or not keys[key][2])]
+
+    def search(self, query, limit=10, countries=False, min_score=MIN_SCORE):
+        """Ранжированный нечёткий поиск: список (player_id, score)
+
+        Подстрока в имени оценивается выше любых частичных совпадений;
+        при равной оценке выше стоит игрок с лучшим рейтингом.
+        countries=True - искать также по стране.
+
+        Сначала ищутся совпадения подстрокой; если их хватает на limit
+        игроков, триграммы остальных имён не считаются. Скелет запроса
+        короче MIN_SUBSTRING (например, 'a' или 'США' -> 'sa') подстрокой
+        не ищется - он нашёлся бы почти в любом имени; такой запрос
+        совпадает только с целым словом.
+        """
+        norm = skeleton(query)
+        if not norm:
+            return []
+        keys = self._keys
+        short = len(norm) < MIN_SUBSTRING
+        best = {}
+
+        found = () if short else self._substring_keys(norm, countries)
+        for key in found:
+            player_id, text = keys[key][:2]
+            score = 1.0 + len(norm) / len(text)
+            if score >= min_score and score > best.get(player_id, 0.0):
+                best[player_id] = score
+
+        if len(best) < limit:
+            grams = trigrams(norm)
+            # Оценка частичного совпадения не больше доли общих триграмм, поэтому
+            # у подходящего ключа не меньше needed общих триграмм и он есть хотя
+            # бы в одном из len(grams) - needed + 1 самых коротких списков
+            needed = max(1, math.ceil(min_score * len(grams) - 1e-9))
+            if short:
+                # Целое слово содержит все триграммы запроса
+                needed = len(grams)
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set().union(*postings[:len(grams) - needed + 1]).difference(found)
+            counts = Counter(chain.from_iterable(candidates.intersection(p) for p in postings))
+            for key, count in counts.items():
+                if count < needed:
+                    continue
+                player_id, text, is_country, text_grams = keys[key]
+                if is_country and not countries or short and norm not in text.split():
+                    continue
+                if not short and norm in text:
+                    score = 1.0 + len(norm) / len(text)
+                else:
+                    # Доля триграмм запроса, найденных в имени, с небольшим
+                    # штрафом за длину имени (при равной доле короче - точнее)
+                    score = count / len(grams) - 0.1 * (1 - count / text_grams)
+                if score >= min_score and score > best.get(player_id, 0.0):
+                    best[player_id] = score
+
+        ranking = self._ranking
+        return heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1], ranking.get(item[0], 0)))
+
+    def resolve(self, query):
+        """id лучше всего подходящего игрока или None (страны не учитываются)"""
+        key = query.strip().lower()
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        found = self.search(query, limit=1, countries=False)
+        player_id = found[0][0] if found else None
+
+        with self._cache_lock:
+            self._cache[key] = player_id
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return player_id
+
+
+def check_misses(resolver, queries=MUST_MISS):
+    """Запросы, которые ошибочно нашли игрока: [(запрос, player_id)]"""
+    return [(query, player_id) for query in queries
+            for player_id in [resolver.resolve(query)] if player_id is not None]
+
+
+def main():
+    import argparse
+    import sqlite3
+    import sys
+
+    parser = argparse.ArgumentParser(description='Поиск игроков по имени')
+    parser.add_argument('queries', nargs='*', help='имена для поиска')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--check', action='store_true',
+                        help='проверить, что запросы MUST_MISS не находят игрока')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    resolver = NameResolver(conn)
+    names = dict(conn.execute('SELECT id, name FROM players'))
+    for query in args.queries:
+        found = resolver.search(query, args.limit)
+        print(f"{query}: " + (', '.join(f"{names[pid]} ({score:.2f})" for pid, score in found) or 'не найден'))
+    if args.check:
+        wrong = check_misses(resolver)
+        for query, player_id in wrong:
+            print(f"❌ '{query}' нашёл игрока {names[player_id]}")
+        print(f"Проверено запросов: {len(MUST_MISS)}, ложных совпадений: {len(wrong)}")
+        conn.close()
+        sys.exit(1 if wrong else 0)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Пул соединений SQLite для многопоточного доступа
+
+Чтения идут через пул read-only соединений (WAL позволяет им работать
+параллельно друг с другом и с записью), все записи - через одно
+соединение в отдельном потоке-писателе с очередью заданий.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+DEFAULT_PRAGMAS = {
+    'cache_size': -64000,          # 64 МБ страничного кеша на соединение
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+class ConnectionPool:
+    """Пул читателей и единственный писатель"""
+
+    def __init__(self, db_name, pool_size=4, pragmas=None, timeout=30.0):
+        if db_name == ':memory:':
+            raise ValueError("Пул соединений требует файл базы, а не :memory:")
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.timeout = timeout
+
+        self._readers = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+        self._jobs = queue.Queue()
+        self._writer_ready = threading.Event()
+        self._writer = threading.Thread(target=self._writer_loop, name='tennis-writer', daemon=True)
+        self._writer.start()
+        self._writer_ready.wait()
+
+    # --- читатели ---
+
+    def _connect_reader(self):
+        conn = sqlite3.connect(f'file:{self.db_name}?mode=ro', uri=True,
+                               timeout=self.timeout, check_same_thread=False)
+        _apply_pragmas(conn, self.pragmas)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Взять read-only соединение на время блока with
+
+        Соединение в каждый момент используется одним потоком, поэтому
+        check_same_thread=False здесь безопасен.
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                conn = self._connect_reader()
+            else:
+                try:
+                    conn = self._readers.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Нет свободного соединения в пуле (pool_size={self.pool_size}) "
+                                       f"за {self.timeout} с") from None
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    # --- писатель ---
+
+    def _writer_loop(self):
+        self.writer_conn = sqlite3.connect(self.db_name, timeout=self.timeout)
+        self.writer_conn.execute('PRAGMA journal_mode = WAL')
+        self.writer_conn.execute('PRAGMA synchronous = NORMAL')
+        _apply_pragmas(self.writer_conn, self.pragmas)
+        self._writer_ready.set()
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(self.writer_conn)
+                if self.writer_conn.in_transaction:
+                    self.writer_conn.commit()
+                future.set_result(result)
+            except BaseException as e:
+                if self.writer_conn.in_transaction:
+                    self.writer_conn.rollback()
+                future.set_exception(e)
+        self.writer_conn.close()
+
+    def submit_write(self, fn):
+        """Поставить fn(conn) в очередь писателя. Возвращает Future"""
+        future = Future()
+        self._jobs.put((fn, future))
+        return future
+
+    def write(self, fn):
+        """Выполнить fn(conn) в потоке-писателе и дождаться результата"""
+        if threading.current_thread() is self._writer:
+            return fn(self.writer_conn)
+        return self.submit_write(fn).result()
+
+    def in_writer(self):
+        return threading.current_thread() is self._writer
+
+    def close(self):
+        self._jobs.put(None)
+        self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def run_benchmark(db_name, threads=(1, 2, 4, 8), seconds=2.0, pool_size=None):
+    """Пропускная способность чтения в зависимости от числа потоков
+
+    Каждый поток в цикле вызывает тяжёлые и лёгкие методы чтения
+    TennisDatabase. Возвращает список (потоков, операций/с).
+    """
+    import contextlib
+    import io
+
+    from tennis_system import TennisDatabase
+
+    db = TennisDatabase(db_name, pool_size=pool_size or max(threads))
+    db.cursor.execute('SELECT id FROM players ORDER BY ranking LIMIT 50')
+    ids = [row[0] for row in db.cursor.fetchall()]
+
+    def workload(stop, counter, index):
+        done = 0
+        while not stop.is_set():
+            player_id = ids[done % len(ids)]
+            db.get_player_surface_stats(player_id)
+            db.get_player_weather_stats(player_id)
+            db.get_country_stats()
+            db.get_top_players_by_surface('clay', 20)
+            done += 1
+        counter[index] = done * 4
+
+    results = []
+    # Методы печатают результат - в бенчмарке вывод не нужен
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for count in threads:
+            stop = threading.Event()
+            counter = [0] * count
+            workers = [threading.Thread(target=workload, args=(stop, counter, i)) for i in range(count)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            time.sleep(seconds)
+            stop.set()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            results.append((count, sum(counter) / elapsed))
+            sink.seek(0)
+            sink.truncate()
+    db.close()
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Бенчмарк параллельного чтения')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--threads', default='1,2,4,8', help='список числа потоков через запятую')
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    threads = tuple(int(t) for t in args.threads.split(','))
+    base = None
+    print(f"{'Потоков':>8} {'оп/с':>12} {'ускорение':>10}")
+    for count, rate in run_benchmark(args.db, threads, args.seconds):
+        base = base or rate
+        print(f"{count:8d} {rate:12.0f} {rate / base:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Пакетный прогноз матчей по колоночной таблице игроков в памяти
+
+Очки игроков, win_rate и points_won по покрытиям и win_rate по погоде
+один раз читаются из базы в массивы NumPy, после чего формула
+predict_match (или марковская модель) считается сразу для всей пачки
+пар без обращений к SQLite.
+"""
+import numpy as np
+
+from tennis_system import (SURFACES, SURFACE_WEIGHT, WEATHER_WEIGHT,
+                           PROB_MIN, PROB_MAX)
+
+# Все значения погоды, разрешённые схемой weather_stats
+WEATHER_COLUMNS = ('sunny', 'rainy', 'windy', 'indoor', 'hot', 'cold')
+
+
+class PlayerTable:
+    """Колоночная таблица игроков: id, очки, win_rate по покрытиям/погоде
+    и points_won по покрытиям
+
+    Отсутствующая статистика хранится как NaN.
+    """
+
+    def __init__(self, ids, points, surface_win, weather_win, surface_points_won=None):
+        self.ids = ids
+        self.points = points
+        self.surface_win = surface_win
+        self.weather_win = weather_win
+        if surface_points_won is None:
+            surface_points_won = np.full(surface_win.shape, np.nan)
+        self.surface_points_won = surface_points_won
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Загрузить таблицу из базы тремя запросами"""
+        rows = conn.execute('SELECT id, points FROM players ORDER BY id').fetchall()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        points = np.array([r[1] or 0 for r in rows], dtype=np.float64)
+
+        surface_win = np.full((len(ids), len(SURFACES)), np.nan)
+        weather_win = np.full((len(ids), len(WEATHER_COLUMNS)), np.nan)
+        surface_points_won = np.full((len(ids), len(SURFACES)), np.nan)
+        table = cls(ids, points, surface_win, weather_win, surface_points_won)
+
+        surface_col = {s: i for i, s in enumerate(SURFACES)}
+        stats = conn.execute('SELECT player_id, surface, win_rate, points_won FROM surface_stats').fetchall()
+        table._fill(surface_win, surface_col, stats)
+        table._fill(surface_points_won, surface_col, stats, value=3)
+
+        weather_col = {w: i for i, w in enumerate(WEATHER_COLUMNS)}
+        stats = conn.execute('SELECT player_id, weather, win_rate FROM weather_stats').fetchall()
+        table._fill(weather_win, weather_col, stats)
+        return table
+
+    def _fill(self, matrix, columns, stats, value=2):
+        if not stats:
+            return
+        player_ids = np.array([s[0] for s in stats], dtype=np.int64)
+        cols = np.array([columns.get(s[1], -1) for s in stats], dtype=np.int64)
+        values = np.array([s[value] for s in stats], dtype=np.float64)
+        rows = np.searchsorted(self.ids, player_ids)
+        rows = np.minimum(rows, len(self.ids) - 1)
+        ok = (cols >= 0) & (len(self.ids) > 0) & (self.ids[rows] == player_ids)
+        matrix[rows[ok], cols[ok]] = values[ok]
+
+    def refresh(self, conn, player_ids):
+        """Перечитать очки и статистику уже известных игроков
+
+        Возвращает False, если среди player_ids есть новые игроки - тогда
+        таблицу нужно загрузить заново. Вызывается потоком-писателем, пока
+        читатели считают прогнозы по той же таблице: новые строки собираются
+        отдельно и записываются одним присваиванием на массив, без
+        промежуточного NaN, который читатель принял бы за «нет статистики».
+        """
+        player_ids = sorted({int(pid) for pid in player_ids})
+        if not player_ids:
+            return True
+        try:
+            rows = self.rows(player_ids)
+        except KeyError:
+            return False
+
+        marks = ','.join('?' * len(player_ids))
+        points = dict(conn.execute(f'SELECT id, points FROM players WHERE id IN ({marks})', player_ids))
+        surface_col = {v: i for i, v in enumerate(SURFACES)}
+        stats = conn.execute(f'SELECT player_id, surface, win_rate, points_won FROM surface_stats '
+                             f'WHERE player_id IN ({marks})', player_ids).fetchall()
+        surface_win = self._block(player_ids, surface_col, stats)
+        surface_points_won = self._block(player_ids, surface_col, stats, value=3)
+        stats = conn.execute(f'SELECT player_id, weather, win_rate FROM weather_stats '
+                             f'WHERE player_id IN ({marks})', player_ids).fetchall()
+        weather_win = self._block(player_ids, {v: i for i, v in enumerate(WEATHER_COLUMNS)}, stats)
+
+        self.points[rows] = [points.get(pid) or 0 for pid in player_ids]
+        self.surface_win[rows] = surface_win
+        self.surface_points_won[rows] = surface_points_won
+        self.weather_win[rows] = weather_win
+        return True
+
+    @staticmethod
+    def _block(player_ids, columns, stats, value=2):
+        # Новые строки игроков player_ids (по порядку) для одного массива статистики
+        block = np.full((len(player_ids), len(columns)), np.nan)
+        index = {pid: i for i, pid in enumerate(player_ids)}
+        for stat in stats:
+            col = columns.get(stat[1])
+            if col is not None:
+                block[index[stat[0]], col] = stat[value]
+        return block
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, player_ids):
+        """Индексы строк для массива id игроков (KeyError для неизвестных)"""
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids, player_ids)
+        rows = np.minimum(rows, max(len(self.ids) - 1, 0))
+        if len(self.ids) == 0 or np.any(self.ids[rows] != player_ids):
+            missing = player_ids[(len(self.ids) == 0) | (self.ids[rows] != player_ids)]
+            raise KeyError(f"Игроки не найдены: {missing[:10].tolist()}")
+        return rows
+
+    def surface_column(self, surface):
+        return self.surface_win[:, SURFACES.index(surface)]
+
+    def weather_column(self, weather):
+        return self.weather_win[:, WEATHER_COLUMNS.index(weather)]
+
+
+def predict_rows(table, rows1, rows2, surface='hard', weather='sunny',
+                 surface_weight=SURFACE_WEIGHT, weather_weight=WEATHER_WEIGHT,
+                 prob_min=PROB_MIN, prob_max=PROB_MAX):
+    """Вероятности победы первого игрока для массивов строк таблицы
+
+    Та же формула, что и в predict_match: доля очков плюс поправки на
+    покрытие и погоду (только если статистика есть у обоих) и ограничение.
+    """
+    p1 = table.points[rows1]
+    p2 = table.points[rows2]
+    total = p1 + p2
+    prob = np.divide(p1, total, out=np.full(len(p1), 0.5), where=total > 0)
+
+    s = table.surface_column(surface)
+    diff = s[rows1] - s[rows2]
+    prob += np.where(np.isnan(diff), 0.0, diff) * surface_weight
+
+    w = table.weather_column(weather)
+    diff = w[rows1] - w[rows2]
+    prob += np.where(np.isnan(diff), 0.0, diff) * weather_weight
+
+    return np.clip(prob, prob_min, prob_max)
+
+
+def predict_matches(table, pairs, surface='hard', weather='sunny', params=None):
+    """Вероятности победы первого игрока для пар (player1_id, player2_id)
+
+    params - FormulaParams (веса и ограничение), по умолчанию исходные.
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    rows1 = table.rows(pairs[:, 0])
+    rows2 = table.rows(pairs[:, 1])
+    return predict_rows(table, rows1, rows2, surface, weather, *(params or ()))
+
+
+def predict_markov_rows(table, rows1, rows2, surface='hard', best_of=3):
+    """Марковская вероятность победы первого игрока для массивов строк таблицы
+
+    Подачи считаются по points_won на покрытии (tennis_markov), погода не
+    учитывается.
+    """
+    from tennis_markov import prematch_probabilities, serve_probabilities_many
+    column = table.surface_points_won[:, SURFACES.index(surface)]
+    p1, p2 = serve_probabilities_many(column[rows1], column[rows2])
+    return prematch_probabilities(p1, p2, best_of)
+
+
+def predict_markov(table, pairs, surface='hard', best_of=3):
+    """predict_markov_rows для пар (player1_id, player2_id)"""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    return predict_markov_rows(table, table.rows(pairs[:, 0]), table.rows(pairs[:, 1]), surface, best_of)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Рейтинги Эло по результатам матчей: общий и по каждому покрытию
+
+Каждый матч меняет рейтинг обоих игроков в двух «дорожках»: общей
+('all') и на покрытии матча. Коэффициент K убывает с опытом игрока
+(K = 250 / (матчей + 5) ** 0.4), так новички быстрее находят свой
+уровень. Вероятность победы считается по смеси общего рейтинга и
+рейтинга на покрытии.
+
+Новый матч обновляет рейтинги за O(1) (EloRatings.update). Полный
+пересчёт истории (EloRatings.replay) векторный: матчи раскладываются на
+слои, в каждом из которых игрок встречается не более одного раза, и слой
+обновляется одной операцией NumPy. Порядок матчей каждого игрока при
+этом сохраняется, поэтому результат совпадает с последовательным
+проигрыванием.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from tennis_system import SURFACES
+
+OVERALL = 'all'
+INITIAL_RATING = 1500.0
+K_SCALE = 250.0
+K_OFFSET = 5.0
+K_SHAPE = 0.4
+# Доля рейтинга на покрытии в прогнозе (остальное - общий рейтинг)
+SURFACE_BLEND = 0.5
+
+
+def k_factor(matches):
+    """K для игрока с заданным числом сыгранных матчей (число или массив)"""
+    return K_SCALE / (matches + K_OFFSET) ** K_SHAPE
+
+
+def expected_score(rating1, rating2):
+    """Ожидаемый результат первого игрока (число или массив)"""
+    return 1.0 / (1.0 + 10.0 ** ((rating2 - rating1) / 400.0))
+
+
+def _layers(winners, losers, n_keys):
+    """Номер слоя каждого матча: на 1 больше последнего слоя его игроков"""
+    last = [0] * n_keys
+    layer = [0] * len(winners)
+    for i, (w, l) in enumerate(zip(winners.tolist(), losers.tolist())):
+        current = max(last[w], last[l]) + 1
+        last[w] = last[l] = layer[i] = current
+    return np.asarray(layer, dtype=np.int64)
+
+
+def _replay_track(winners, losers, n_keys):
+    """Проиграть матчи одной дорожки: рейтинги и число матчей по ключам"""
+    ratings = np.full(n_keys, INITIAL_RATING)
+    counts = np.zeros(n_keys, dtype=np.int64)
+    if len(winners) == 0:
+        return ratings, counts
+
+    layer = _layers(winners, losers, n_keys)
+    order = np.argsort(layer, kind='stable')
+    bounds = np.searchsorted(layer[order], np.arange(1, layer.max() + 2))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        idx = order[start:end]
+        w, l = winners[idx], losers[idx]
+        # Внутри слоя ключи не повторяются - обновления независимы
+        delta = 1.0 - expected_score(ratings[w], ratings[l])
+        kw, kl = k_factor(counts[w]), k_factor(counts[l])
+        ratings[w] += kw * delta
+        ratings[l] -= kl * delta
+        counts[w] += 1
+        counts[l] += 1
+    return ratings, counts
+
+
+class EloRatings:
+    """Рейтинги Эло в памяти: {(player_id, дорожка): [рейтинг, матчей]}"""
+
+    def __init__(self, ratings=None):
+        self.ratings = ratings if ratings is not None else {}
+
+    def get(self, player_id, track=OVERALL):
+        entry = self.ratings.get((player_id, track))
+        return entry[0] if entry else INITIAL_RATING
+
+    def _update_track(self, winner_id, loser_id, track):
+        winner = self.ratings.setdefault((winner_id, track), [INITIAL_RATING, 0])
+        loser = self.ratings.setdefault((loser_id, track), [INITIAL_RATING, 0])
+        delta = 1.0 - expected_score(winner[0], loser[0])
+        winner[0] += k_factor(winner[1]) * delta
+        loser[0] -= k_factor(loser[1]) * delta
+        winner[1] += 1
+        loser[1] += 1
+
+    def update(self, winner_id, loser_id, surface=None):
+        """Учесть один матч; возвращает изменённые ключи (player_id, дорожка)"""
+        tracks = [OVERALL] if surface is None else [OVERALL, surface]
+        for track in tracks:
+            self._update_track(winner_id, loser_id, track)
+        return [(pid, track) for track in tracks for pid in (winner_id, loser_id)]
+
+    def blended(self, player_id, surface=None):
+        """Рейтинг для прогноза: смесь общего и рейтинга на покрытии"""
+        overall = self.get(player_id)
+        entry = self.ratings.get((player_id, surface)) if surface else None
+        if entry is None:
+            return overall
+        return (1 - SURFACE_BLEND) * overall + SURFACE_BLEND * entry[0]
+
+    def probability(self, player1_id, player2_id, surface=None):
+        """Вероятность победы player1 над player2"""
+        return float(expected_score(self.blended(player1_id, surface), self.blended(player2_id, surface)))
+
+    def probability_many(self, pairs, surface=None):
+        """Вероятности для пар (id1, id2) - массив NumPy"""
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        cache = {}
+        for pid in np.unique(pairs).tolist():
+            cache[pid] = self.blended(pid, surface)
+        r1 = np.array([cache[pid] for pid in pairs[:, 0].tolist()])
+        r2 = np.array([cache[pid] for pid in pairs[:, 1].tolist()])
+        return expected_score(r1, r2)
+
+    def top(self, track=OVERALL, limit=10):
+        """Лучшие (player_id, рейтинг, матчей) по дорожке"""
+        rows = [(pid, r, n) for (pid, t), (r, n) in self.ratings.items() if t == track]
+        rows.sort(key=lambda row: -row[1])
+        return rows[:limit]
+
+    @classmethod
+    def replay(cls, winners, losers, surfaces):
+        """Пересчитать рейтинги по всей истории (матчи в хронологическом порядке)
+
+        winners, losers - id игроков, surfaces - покрытие или None для каждого матча.
+        """
+        winners = np.asarray(winners, dtype=np.int64)
+        losers = np.asarray(losers, dtype=np.int64)
+        player_ids, inverse = np.unique(np.concatenate([winners, losers]), return_inverse=True)
+        w_idx, l_idx = inverse[:len(winners)], inverse[len(winners):]
+        n = len(player_ids)
+        ratings = {}
+
+        def collect(track, values, counts):
+            for i in np.flatnonzero(counts).tolist():
+                ratings[(int(player_ids[i]), track)] = [float(values[i]), int(counts[i])]
+
+        values, counts = _replay_track(w_idx, l_idx, n)
+        collect(OVERALL, values, counts)
+
+        surface_index = np.array([SURFACES.index(s) if s in SURFACES else -1 for s in surfaces],
+                                 dtype=np.int64)
+        for s, surface in enumerate(SURFACES):
+            mask = surface_index == s
+            values, counts = _replay_track(w_idx[mask], l_idx[mask], n)
+            collect(surface, values, counts)
+        return cls(ratings)
+
+    # --- хранение в базе ---
+
+    @classmethod
+    def from_connection(cls, conn):
+        rows = conn.execute('SELECT player_id, surface, rating, matches FROM player_ratings').fetchall()
+        return cls({(pid, track): [rating, matches] for pid, track, rating, matches in rows})
+
+    @classmethod
+    def rebuild_from_connection(cls, conn):
+        """Пересчитать по таблице matches (по дате, затем по id)"""
+        rows = conn.execute('''
+            SELECT winner_id, CASE WHEN winner_id = player1_id THEN player2_id ELSE player1_id END,
+                   surface
+            FROM matches
+            ORDER BY match_date, id
+        ''').fetchall()
+        if not rows:
+            return cls()
+        winners, losers, surfaces = zip(*rows)
+        return cls.replay(winners, losers, surfaces)
+
+    def save(self, conn, keys=None):
+        """Записать рейтинги (все или только keys); commit - за вызывающим"""
+        keys = self.ratings.keys() if keys is None else keys
+        now = datetime.now().isoformat(timespec='seconds')
+        conn.executemany('''
+            INSERT INTO player_ratings (player_id, surface, rating, matches, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (player_id, surface) DO UPDATE SET
+                rating = excluded.rating,
+                matches = excluded.matches,
+                updated_at = excluded.updated_at
+        ''', [(pid, track, *self.ratings[(pid, track)], now) for pid, track in keys])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Рейтинги Эло по таблице matches')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать по всей истории матчей')
+    parser.add_argument('--surface', default=OVERALL, choices=[OVERALL] + SURFACES)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    from tennis_system import TennisDatabase
+
+    db = TennisDatabase(args.db)
+    if args.rebuild:
+        count = db.rebuild_ratings()
+        print(f"Пересчитано по {count} матчам")
+    names = dict(db.query('SELECT id, name FROM players'))
+    print(f"\nЭЛО ({args.surface.upper()}):")
+    for i, (pid, rating, matches) in enumerate(db.get_ratings().top(args.surface, args.limit), 1):
+        print(f"{i:3d}. {names.get(pid, pid):25} {rating:7.1f} | Матчи: {matches}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Типизированные результаты аналитических методов TennisDatabase
+
+Все записи - именованные кортежи: компактны (без __dict__), сравнимы,
+распаковываются как обычные кортежи и переводятся в словарь через
+_asdict() для JSON.
+"""
+from collections import namedtuple
+
+PlayerInfo = namedtuple('PlayerInfo', 'id name country ranking points')
+
+RankingEntry = namedtuple('RankingEntry', 'id ranking name country points')
+
+SurfaceStat = namedtuple('SurfaceStat', 'surface win_rate matches')
+
+WeatherStat = namedtuple('WeatherStat', 'weather win_rate matches')
+
+PlayerAnalysis = namedtuple('PlayerAnalysis', 'player surfaces weather')
+
+SimilarPlayer = namedtuple('SimilarPlayer', 'id name country ranking points distance')
+
+SurfaceLeader = namedtuple('SurfaceLeader', 'id name country ranking win_rate matches')
+
+CountryStat = namedtuple('CountryStat', 'country players avg_ranking total_points')
+
+SearchResult = namedtuple('SearchResult', 'id ranking name country points age score')
+
+SurfaceComparison = namedtuple('SurfaceComparison', 'surface player1_rate player2_rate')
+
+HistoricalRanking = namedtuple('HistoricalRanking', 'id name country ranking points week')
+
+CalibrationBucket = namedtuple('CalibrationBucket', 'low high matches predicted observed')
+
+BacktestReport = namedtuple('BacktestReport', 'params matches log_loss brier accuracy calibration')
+
+# Результат из шарда: тур (atp, wta, ...) и запись этого шарда
+TourResult = namedtuple('TourResult', 'tour result')
+
+TourCountryStat = namedtuple('TourCountryStat', 'country players avg_ranking total_points tours')
+
+
+class Prediction(namedtuple('Prediction',
+                            'player1_id player1 player2_id player2 surface weather probability')):
+    """Прогноз матча: probability - вероятность победы первого игрока"""
+    __slots__ = ()
+
+    @property
+    def favourite(self):
+        return self.player1 if self.probability > 0.5 else self.player2
+
+
+class SimilarPlayers(namedtuple('SimilarPlayers', 'player neighbours')):
+    __slots__ = ()
+
+
+class HeadToHead(namedtuple('HeadToHead', 'player1 player2 surfaces prediction')):
+    """Противостояние: игроки (PlayerInfo), сравнение покрытий и общий прогноз"""
+    __slots__ = ()
+
+    @property
+    def points_diff(self):
+        return abs(self.player1.points - self.player2.points)
+
+
+def to_json(value):
+    """Рекурсивно перевести записи в структуры для json.dumps"""
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        data = {key: to_json(item) for key, item in value._asdict().items()}
+        if isinstance(value, Prediction):
+            data['favourite'] = value.favourite
+        return data
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    return value
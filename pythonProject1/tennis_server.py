@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""HTTP JSON сервис поверх TennisDatabase (только стандартная библиотека)
+
+Запуск: python tennis_server.py --db tennis_atp.db --port 8080
+
+    GET  /ranking?limit=50
+    GET  /player?name=Sinner
+    GET  /search?q=Испания
+    GET  /top-surface?surface=clay&limit=10
+    GET  /countries
+    GET  /h2h?p1=Sinner&p2=Alcaraz
+    GET  /predict?p1=Sinner&p2=Alcaraz&surface=hard&weather=sunny&model=elo
+    GET  /health                   (в том числе счётчики кеша результатов)
+    POST /predict  {"surface": "clay", "weather": "sunny", "model": "formula", "pairs": [["Sinner", "Alcaraz"], ...]}
+
+Работа с SQLite идёт в пуле потоков (TennisDatabase с пулом соединений),
+одинаковые одновременные GET-запросы выполняются один раз.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from tennis_predict import WEATHER_COLUMNS
+from tennis_results import to_json
+from tennis_system import PREDICTION_MODELS, SURFACES, TennisDatabase
+
+MAX_BODY = 10 * 1024 * 1024
+MAX_BATCH = 100000
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise HttpError(400, f"Не указан параметр '{name}'")
+        return default
+    return values[0]
+
+
+def _int_param(params, name, default):
+    try:
+        return int(_param(params, name, str(default)))
+    except ValueError:
+        raise HttpError(400, f"Параметр '{name}' должен быть числом")
+
+
+def _model(model):
+    if model not in PREDICTION_MODELS:
+        raise HttpError(400, f"Неизвестная модель '{model}'")
+    return model
+
+
+def _surface(surface):
+    if surface not in SURFACES:
+        raise HttpError(400, f"Неизвестное покрытие '{surface}'")
+    return surface
+
+
+def _weather(weather):
+    if weather not in WEATHER_COLUMNS:
+        raise HttpError(400, f"Неизвестная погода '{weather}'")
+    return weather
+
+
+class TennisService:
+    """Обработчики запросов: синхронные функции, выполняются в пуле потоков"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _player(self, name):
+        player_id = self.db.find_player_id(name)
+        if player_id is None:
+            raise HttpError(404, f"Игрок '{name}' не найден")
+        row = self.db.query('SELECT id, ranking, name, country, points, age, hand FROM players WHERE id = ?',
+                            (player_id,))[0]
+        return dict(zip(('id', 'ranking', 'name', 'country', 'points', 'age', 'hand'), row))
+
+    def ranking(self, params):
+        return to_json(list(self.db.ranking(_int_param(params, 'limit', 50))))
+
+    def player(self, params):
+        player = self._player(_param(params, 'name'))
+        player['surfaces'] = to_json(self.db.get_player_surface_stats(player['id']))
+        player['weather'] = to_json(self.db.get_player_weather_stats(player['id']))
+        return player
+
+    def search(self, params):
+        results = self.db.search(_param(params, 'q'), limit=_int_param(params, 'limit', 20))
+        return [dict(item._asdict(), score=round(item.score, 3)) for item in results]
+
+    def top_surface(self, params):
+        surface = _surface(_param(params, 'surface', 'hard'))
+        return to_json(self.db.top_by_surface(surface, _int_param(params, 'limit', 10)))
+
+    def countries(self, params):
+        return to_json(self.db.country_stats(_int_param(params, 'limit', 15)))
+
+    def h2h(self, params):
+        p1, p2 = _param(params, 'p1'), _param(params, 'p2')
+        result = self.db.head_to_head(p1, p2)
+        if result is None:
+            raise HttpError(404, f"Игрок '{p1}' или '{p2}' не найден")
+        data = to_json(result)
+        data['points_diff'] = result.points_diff
+        return data
+
+    def predict(self, params):
+        p1, p2 = _param(params, 'p1'), _param(params, 'p2')
+        surface = _surface(_param(params, 'surface', 'hard'))
+        weather = _weather(_param(params, 'weather', 'sunny'))
+        model = _model(_param(params, 'model', 'formula'))
+        result = self.db.prediction(p1, p2, surface, weather, model)
+        if result is None:
+            raise HttpError(404, f"Игрок '{p1}' или '{p2}' не найден")
+        return to_json(result)
+
+    def predict_batch(self, body):
+        """Пакетный прогноз: пары имён или id, одно векторное вычисление"""
+        pairs = body.get('pairs')
+        if not isinstance(pairs, list) or len(pairs) > MAX_BATCH:
+            raise HttpError(400, f"'pairs' должен быть списком не длиннее {MAX_BATCH}")
+        surface = _surface(body.get('surface', 'hard'))
+        weather = _weather(body.get('weather', 'sunny'))
+        model = _model(body.get('model', 'formula'))
+
+        ids = []
+        for pair in pairs:
+            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                raise HttpError(400, "Каждая пара - список из двух игроков")
+            pair_ids = []
+            for player in pair:
+                player_id = player if isinstance(player, int) else self.db.find_player_id(str(player))
+                if player_id is None:
+                    raise HttpError(404, f"Игрок '{player}' не найден")
+                pair_ids.append(player_id)
+            ids.append(pair_ids)
+
+        try:
+            probs = self.db.predict_matches(ids, surface, weather, model) if ids else []
+        except (KeyError, ValueError) as e:
+            raise HttpError(400, str(e))
+        return {'surface': surface, 'weather': weather, 'model': model,
+                'pairs': ids, 'probabilities': [float(p) for p in probs]}
+
+
+GET_ROUTES = {
+    '/ranking': 'ranking',
+    '/player': 'player',
+    '/search': 'search',
+    '/top-surface': 'top_surface',
+    '/countries': 'countries',
+    '/h2h': 'h2h',
+    '/predict': 'predict',
+}
+
+
+class TennisServer:
+    """Асинхронный HTTP/1.1 сервер с keep-alive и склейкой одинаковых запросов"""
+
+    def __init__(self, db, workers=8):
+        self.service = TennisService(db)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tennis-http')
+        self.inflight = {}
+        self.coalesced = 0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def _get(self, path, query):
+        handler = GET_ROUTES.get(path)
+        if handler is None:
+            raise HttpError(404, f"Нет такого адреса: {path}")
+        params = parse_qs(query)
+        key = (path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+        # Одинаковый запрос уже выполняется - ждём его результат
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._run(getattr(self.service, handler), params))
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    async def dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        if method == 'GET':
+            if parts.path == '/health':
+                return {'status': 'ok', 'coalesced': self.coalesced,
+                        'cache': self.service.db.result_cache_stats()}
+            return await self._get(parts.path, parts.query)
+        if method == 'POST' and parts.path == '/predict':
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise HttpError(400, "Тело запроса - не JSON")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Ожидается JSON-объект")
+            return await self._run(self.service.predict_batch, payload)
+        raise HttpError(405, f"Метод {method} не поддерживается для {parts.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                # Тело с неизвестной длиной не дочитать - соединение после ответа закрываем
+                keep_alive = (headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                              and length >= 0)
+
+                try:
+                    if length < 0:
+                        raise HttpError(400, "Некорректный заголовок Content-Length")
+                    if length > MAX_BODY:
+                        raise HttpError(413, "Слишком большое тело запроса")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': e.message}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"🎾 Сервер запущен: http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HTTP JSON сервис теннисной системы')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8, help='потоков для работы с SQLite')
+    parser.add_argument('--cache-size', type=int, default=10000, help='записей в кеше результатов (0 - без кеша)')
+    parser.add_argument('--cache-ttl', type=float, default=60.0, help='срок жизни записи кеша, с (0 - без срока)')
+    parser.add_argument('--cache-warm', type=int, default=20, help='прогреть кеш лучшими N игроками')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = TennisDatabase(args.db, pool_size=args.workers)
+    if args.cache_size > 0:
+        db.enable_result_cache(args.cache_size, args.cache_ttl, args.cache_warm)
+    print(f"База открыта за {time.perf_counter() - started:.3f} с")
+    try:
+        asyncio.run(TennisServer(db, args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""Несколько туров рядом: по файлу SQLite на тур и параллельные запросы ко всем
+
+    python tennis_shards.py --dir tours search Синнер
+    python tennis_shards.py --shard atp=tennis_atp.db --shard wta=tennis_wta.db countries
+    python tennis_shards.py --dir tours top-surface clay --limit 5 --tours atp,wta
+    python tennis_shards.py --dir tours analyze wta:Свёнтек
+
+Шард - обычная база TennisDatabase одного тура (atp, wta, challenger,
+itf, ...), открывается при первом обращении к этому туру. Запрос к одному
+туру трогает только его шард, поэтому новые туры не замедляют его.
+
+Игрок задаётся именем или 'тур:имя'. Без тура маршрутизатор ищет имя во
+всех шардах параллельно, выбирает лучшее совпадение и запоминает, в каком
+шарде игрок. Общие запросы (поиск, страны, лучшие на покрытии) идут во
+все шарды в пуле потоков; отсортированные ответы шардов сливаются
+k-путевым слиянием (heapq.merge) без общей пересортировки.
+"""
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tennis_results import PlayerAnalysis, Prediction, TourCountryStat, TourResult
+from tennis_system import TennisDatabase
+
+TOURS = ('atp', 'wta', 'challenger', 'itf')
+SHARD_TEMPLATE = 'tennis_{tour}.db'
+# Read-only соединений в пуле каждого шарда
+SHARD_POOL_SIZE = 2
+ROUTE_CACHE_SIZE = 10000
+
+
+def shard_path(directory, tour):
+    return os.path.join(directory, SHARD_TEMPLATE.format(tour=tour))
+
+
+def split_player(player):
+    """'wta:Свёнтек' -> ('wta', 'Свёнтек'); без тура - (None, имя)"""
+    tour, sep, name = player.partition(':')
+    if sep and tour.strip().lower() and ' ' not in tour.strip():
+        return tour.strip().lower(), name.strip()
+    return None, player.strip()
+
+
+class ShardedStore:
+    """Шарды по турам, маршрутизатор игроков и параллельные общие запросы"""
+
+    def __init__(self, paths, pool_size=SHARD_POOL_SIZE, workers=None):
+        """paths - {тур: файл базы}; порядок туров - порядок при равенстве в слиянии"""
+        if not paths:
+            raise ValueError("Нужен хотя бы один шард")
+        self.paths = {tour.lower(): path for tour, path in paths.items()}
+        self.pool_size = pool_size
+        self._shards = {}
+        self._open_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers or len(self.paths),
+                                            thread_name_prefix='tennis-shard')
+        self._routes = {}
+        self._routes_lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory, tours=None, create=False, **kwargs):
+        """Шарды tennis_<тур>.db в directory: существующие или (create=True) все tours"""
+        tours = tours or TOURS
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        paths = {tour: shard_path(directory, tour) for tour in tours
+                 if create or os.path.exists(shard_path(directory, tour))}
+        if not paths:
+            raise FileNotFoundError(f"В {directory} нет шардов {SHARD_TEMPLATE.format(tour='<тур>')}")
+        return cls(paths, **kwargs)
+
+    @property
+    def tours(self):
+        return list(self.paths)
+
+    def shard(self, tour):
+        """TennisDatabase тура (открывается при первом обращении)"""
+        db = self._shards.get(tour)
+        if db is None:
+            if tour not in self.paths:
+                raise KeyError(f"Нет шарда тура '{tour}', доступны: {', '.join(self.paths)}")
+            with self._open_lock:
+                db = self._shards.get(tour)
+                if db is None:
+                    # Пул соединений: шард читают потоки fan-out и вызывающий поток
+                    db = TennisDatabase(self.paths[tour], pool_size=self.pool_size)
+                    self._shards[tour] = db
+        return db
+
+    def opened(self):
+        """Туры, шарды которых уже открыты"""
+        return [tour for tour in self.paths if tour in self._shards]
+
+    def close(self):
+        self._executor.shutdown()
+        with self._open_lock:
+            for db in self._shards.values():
+                db.close()
+            self._shards.clear()
+
+    def _fan_out(self, fn, tours=None):
+        """[(тур, fn(db))] по всем (или указанным) турам, параллельно"""
+        tours = list(tours or self.paths)
+        # Открываем в вызывающем потоке: основное соединение шарда привязано к нему
+        shards = [self.shard(tour) for tour in tours]
+        if len(shards) == 1:
+            return [(tours[0], fn(shards[0]))]
+        return list(zip(tours, self._executor.map(fn, shards)))
+
+    # --- маршрутизация игроков ---
+
+    def locate(self, player):
+        """(тур, player_id) игрока по имени или 'тур:имя'; None - не найден"""
+        tour, name = split_player(player)
+        if tour is not None:
+            player_id = self.shard(tour).find_player_id(name)
+            return (tour, player_id) if player_id is not None else None
+
+        key = name.lower()
+        with self._routes_lock:
+            route = self._routes.get(key)
+        if route is not None:
+            return route
+
+        def best(db):
+            found = db.get_name_resolver().search(name, limit=1)
+            return found[0] if found else None
+
+        route, best_score = None, None
+        for tour, found in self._fan_out(best):
+            # При равной оценке побеждает тур, указанный раньше
+            if found is not None and (best_score is None or found[1] > best_score):
+                route, best_score = (tour, found[0]), found[1]
+        if route is not None:
+            with self._routes_lock:
+                if len(self._routes) >= ROUTE_CACHE_SIZE:
+                    self._routes.clear()
+                self._routes[key] = route
+        return route
+
+    def _player_info(self, player):
+        route = self.locate(player)
+        if route is None:
+            return None, None
+        return route[0], self.shard(route[0]).player_record(route[1])
+
+    def player_analysis(self, player):
+        """TourResult(тур, PlayerAnalysis) или None"""
+        tour, info = self._player_info(player)
+        if info is None:
+            return None
+        db = self.shard(tour)
+        return TourResult(tour, PlayerAnalysis(info, db.get_player_surface_stats(info.id),
+                                               db.get_player_weather_stats(info.id)))
+
+    def prediction(self, player1, player2, surface='hard', weather='sunny', model='formula'):
+        """TourResult(тур, Prediction) или None; игроки должны быть из одного тура"""
+        tour1, p1 = self._player_info(player1)
+        tour2, p2 = self._player_info(player2)
+        if p1 is None or p2 is None:
+            return None
+        if tour1 != tour2:
+            raise ValueError(f"Игроки из разных туров: {p1.name} ({tour1}), {p2.name} ({tour2})")
+        probability = self.shard(tour1).match_probability(p1.id, p2.id, surface, weather, model)
+        return TourResult(tour1, Prediction(p1.id, p1.name, p2.id, p2.name, surface, weather, probability))
+
+    def add_player(self, tour, ranking, name, country, points, age=None, hand='right'):
+        """Добавить игрока в шард тура; возвращает его id в шарде"""
+        player_id = self.shard(tour).add_player_with_stats(ranking, name, country, points, age, hand)
+        if player_id is not None:
+            # Новое имя может подходить к запросам лучше запомненных маршрутов
+            with self._routes_lock:
+                self._routes.clear()
+        return player_id
+
+    # --- общие запросы ---
+
+    def search(self, search_term, limit=20, tours=None):
+        """Поиск во всех турах: список TourResult(тур, SearchResult) по убыванию совпадения"""
+        parts = self._fan_out(lambda db: db.search(search_term, limit), tours)
+        merged = heapq.merge(*([TourResult(tour, r) for r in results] for tour, results in parts),
+                             key=lambda item: -item.result.score)
+        return [item for _, item in zip(range(limit), merged)]
+
+    def top_by_surface(self, surface='hard', limit=10, tours=None):
+        """Лучшие на покрытии во всех турах: список TourResult(тур, SurfaceLeader)"""
+        parts = self._fan_out(lambda db: db.top_by_surface(surface, limit), tours)
+        merged = heapq.merge(*([TourResult(tour, r) for r in results] for tour, results in parts),
+                             key=lambda item: -item.result.win_rate)
+        return [item for _, item in zip(range(limit), merged)]
+
+    def country_stats(self, limit=15, tours=None):
+        """Страны по сумме очков во всех турах: список TourCountryStat
+
+        Сводки стран из шардов (country_summary, отсортированы по стране)
+        сливаются по названию страны, строки одной страны складываются.
+        """
+        parts = self._fan_out(lambda db: db.query(
+            'SELECT country, players, ranked, ranking_sum, points_sum FROM country_summary '
+            'WHERE players > 0 ORDER BY country'), tours)
+        merged = heapq.merge(*([(row, tour) for row in rows] for tour, rows in parts),
+                             key=lambda item: item[0][0])
+
+        stats, current = [], None
+        for (country, players, ranked, ranking_sum, points_sum), tour in merged:
+            if current is None or current[0] != country:
+                current = [country, 0, 0, 0, 0, []]
+                stats.append(current)
+            current[1] += players
+            current[2] += ranked
+            current[3] += ranking_sum
+            current[4] += points_sum
+            current[5].append(tour)
+
+        result = [TourCountryStat(country, players, ranking_sum / ranked if ranked else None, points_sum, tours)
+                  for country, players, ranked, ranking_sum, points_sum, tours in stats if players >= 2]
+        result.sort(key=lambda stat: -stat.total_points)
+        return result[:limit]
+
+
+def main():
+    import argparse
+    import json
+    import sys
+
+    from tennis_predict import WEATHER_COLUMNS
+    from tennis_results import to_json
+    from tennis_system import PREDICTION_MODELS, SURFACES
+
+    parser = argparse.ArgumentParser(description='Запросы к нескольким турам (шардам)')
+    parser.add_argument('--dir', default=None, help=f"каталог с шардами {SHARD_TEMPLATE.format(tour='<тур>')}")
+    parser.add_argument('--shard', action='append', default=[], help="тур=файл (можно несколько)")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--tours', default=None, help='только эти туры, через запятую')
+    common.add_argument('--limit', type=int, default=None)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('search', parents=[common]).add_argument('query')
+    sub.add_parser('countries', parents=[common])
+    sub.add_parser('top-surface', parents=[common]).add_argument('surface', nargs='?', default='hard',
+                                                                 choices=SURFACES)
+    sub.add_parser('locate').add_argument('player')
+    sub.add_parser('analyze').add_argument('player')
+    predict = sub.add_parser('predict')
+    predict.add_argument('player1')
+    predict.add_argument('player2')
+    predict.add_argument('--surface', default='hard', choices=SURFACES)
+    predict.add_argument('--weather', default='sunny', choices=WEATHER_COLUMNS)
+    predict.add_argument('--model', default='formula', choices=PREDICTION_MODELS)
+    args = parser.parse_args()
+
+    if any('=' not in item for item in args.shard):
+        parser.error('--shard задаётся как тур=файл')
+    paths = dict(item.split('=', 1) for item in args.shard)
+    if args.dir:
+        for tour in TOURS:
+            if tour not in paths and os.path.exists(shard_path(args.dir, tour)):
+                paths[tour] = shard_path(args.dir, tour)
+    if not paths:
+        parser.error('укажите --dir или --shard тур=файл')
+    store = ShardedStore(paths)
+    tours = args.tours.split(',') if getattr(args, 'tours', None) else None
+    try:
+        if args.command == 'search':
+            result = store.search(args.query, args.limit or 20, tours)
+        elif args.command == 'countries':
+            result = store.country_stats(args.limit or 15, tours)
+        elif args.command == 'top-surface':
+            result = store.top_by_surface(args.surface, args.limit or 10, tours)
+        elif args.command == 'locate':
+            result = store.locate(args.player)
+        elif args.command == 'analyze':
+            result = store.player_analysis(args.player)
+        else:
+            result = store.prediction(args.player1, args.player2, args.surface, args.weather, args.model)
+        if result is None:
+            print("Игрок не найден", file=sys.stderr)
+            sys.exit(1)
+        for item in (result if isinstance(result, list) else [result]):
+            print(json.dumps(to_json(item), ensure_ascii=False))
+        print(f"Открыто шардов: {len(store.opened())} из {len(store.paths)}", file=sys.stderr)
+    except (KeyError, ValueError) as e:
+        # Неизвестный тур или игроки из разных туров
+        print(e.args[0] if e.args else e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Поиск похожих игроков: k ближайших соседей по вектору статистики
+
+Вектор игрока: win_rate, points_won и matches на каждом покрытии,
+win_rate и matches в каждой погоде, возраст, рабочая рука и очки.
+Признаки нормируются (z-оценка), умножаются на корень из веса группы и
+сравниваются по евклидову расстоянию полным перебором в NumPy - для
+десятков тысяч игроков это быстрее и проще дерева.
+"""
+import numpy as np
+
+from tennis_predict import WEATHER_COLUMNS
+from tennis_system import SURFACES
+
+# Веса групп признаков по умолчанию
+DEFAULT_WEIGHTS = {
+    'surface': 1.0,
+    'weather': 0.5,
+    'age': 0.5,
+    'hand': 0.5,
+    'points': 1.0,
+}
+
+# Сколько строк запроса обрабатывать за раз в query_all (память: блок × N)
+QUERY_CHUNK = 2048
+
+
+def feature_names():
+    """Имена признаков в порядке столбцов и их группы"""
+    names = []
+    for surface in SURFACES:
+        for stat in ('win_rate', 'points_won', 'matches'):
+            names.append((f'{surface}_{stat}', 'surface'))
+    for weather in WEATHER_COLUMNS:
+        for stat in ('win_rate', 'matches'):
+            names.append((f'{weather}_{stat}', 'weather'))
+    names.append(('age', 'age'))
+    names.append(('hand', 'hand'))
+    names.append(('points', 'points'))
+    return names
+
+
+def load_features(conn):
+    """Сырые признаки всех игроков: (ids, матрица N×F), пропуски - NaN"""
+    names = feature_names()
+    column = {name: i for i, (name, _) in enumerate(names)}
+
+    players = conn.execute('SELECT id, age, hand, points FROM players ORDER BY id').fetchall()
+    ids = np.array([p[0] for p in players], dtype=np.int64)
+    features = np.full((len(ids), len(names)), np.nan)
+    row_of = {pid: i for i, pid in enumerate(ids.tolist())}
+
+    for i, (_, age, hand, points) in enumerate(players):
+        features[i, column['age']] = age if age is not None else np.nan
+        features[i, column['hand']] = 1.0 if hand == 'left' else 0.0
+        # Очки распределены очень неравномерно - берём логарифм
+        features[i, column['points']] = np.log1p(points or 0)
+
+    for player_id, surface, win_rate, matches, points_won in conn.execute(
+            'SELECT player_id, surface, win_rate, matches, points_won FROM surface_stats'):
+        i = row_of.get(player_id)
+        if i is None:
+            continue
+        features[i, column[f'{surface}_win_rate']] = win_rate
+        features[i, column[f'{surface}_points_won']] = points_won
+        features[i, column[f'{surface}_matches']] = matches
+
+    for player_id, weather, win_rate, matches in conn.execute(
+            'SELECT player_id, weather, win_rate, matches FROM weather_stats'):
+        i = row_of.get(player_id)
+        if i is None or f'{weather}_win_rate' not in column:
+            continue
+        features[i, column[f'{weather}_win_rate']] = win_rate
+        features[i, column[f'{weather}_matches']] = matches
+
+    return ids, features
+
+
+def normalize(features, weights=None):
+    """z-оценка по столбцам с учётом весов групп; пропуски - среднее (0)"""
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    scale = np.array([np.sqrt(weights.get(name, weights.get(group, 1.0)))
+                      for name, group in feature_names()])
+
+    # Среднее и разброс по заполненным значениям столбца; столбцы без данных
+    # (например, погода hot/cold) получают 0 и 1. Считаем явно, а не через
+    # nanmean/nanstd: их предупреждения пришлось бы глушить глобальным
+    # фильтром warnings, а он не потокобезопасен
+    missing = np.isnan(features)
+    counts = np.maximum((~missing).sum(axis=0), 1)
+    with np.errstate(invalid='ignore'):
+        mean = np.where(missing, 0.0, features).sum(axis=0) / counts
+        deviations = np.where(missing, 0.0, features - mean)
+    std = np.sqrt((deviations ** 2).sum(axis=0) / counts)
+    std = np.where(std > 0, std, 1.0)
+
+    vectors = (deviations / std) * scale
+    return vectors.astype(np.float32)
+
+
+class SimilarityIndex:
+    """Индекс векторов игроков для запросов «k ближайших»"""
+
+    def __init__(self, ids, vectors):
+        self.ids = ids
+        self.vectors = vectors
+        self.norms = np.einsum('ij,ij->i', vectors, vectors)
+        self.index = {int(pid): i for i, pid in enumerate(ids)}
+
+    @classmethod
+    def from_connection(cls, conn, weights=None):
+        ids, features = load_features(conn)
+        return cls(ids, normalize(features, weights))
+
+    def _distances(self, rows):
+        # |a - b|² = |a|² + |b|² - 2ab, одним умножением матриц на блок
+        d = self.norms[rows, None] + self.norms[None, :] - 2.0 * (self.vectors[rows] @ self.vectors.T)
+        np.maximum(d, 0, out=d)
+        d[np.arange(len(rows)), rows] = np.inf   # сам игрок не сосед
+        return d
+
+    def _top_k(self, d, k):
+        k = min(k, d.shape[1] - 1)
+        if k <= 0:
+            return np.empty((d.shape[0], 0), dtype=np.int64), np.empty((d.shape[0], 0))
+        part = np.argpartition(d, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(d, part, axis=1), axis=1)
+        nearest = np.take_along_axis(part, order, axis=1)
+        return nearest, np.sqrt(np.take_along_axis(d, nearest, axis=1))
+
+    def query(self, player_id, k=5):
+        """k ближайших к игроку: список (player_id, distance)"""
+        row = self.index[int(player_id)]
+        nearest, dist = self._top_k(self._distances(np.array([row])), k)
+        return [(int(self.ids[j]), float(x)) for j, x in zip(nearest[0], dist[0])]
+
+    def query_all(self, k=5):
+        """Соседи для всех игроков сразу: (ids, neighbour_ids N×k, distances N×k)"""
+        n = len(self.ids)
+        k = min(k, max(n - 1, 0))
+        neighbours = np.empty((n, k), dtype=np.int64)
+        distances = np.empty((n, k), dtype=np.float32)
+        for start in range(0, n, QUERY_CHUNK):
+            rows = np.arange(start, min(start + QUERY_CHUNK, n))
+            nearest, dist = self._top_k(self._distances(rows), k)
+            neighbours[rows] = self.ids[nearest]
+            distances[rows] = dist
+        return self.ids, neighbours, distances
+
+
+class SimilarityCache:
+    """Индекс, привязанный к TennisDatabase и перестраиваемый после записей"""
+
+    def __init__(self, db, weights=None):
+        self.db = db
+        self.weights = weights
+        self.index = None
+        db.add_write_listener(self.on_write)
+
+    def on_write(self, player_ids):
+        # Нормировка зависит от всех игроков - перестраиваем лениво целиком
+        self.index = None
+
+    def set_weights(self, weights):
+        self.weights = weights
+        self.index = None
+
+    def get(self):
+        if self.index is None:
+            self.index = SimilarityIndex.from_connection(self.db.conn, self.weights)
+        return self.index
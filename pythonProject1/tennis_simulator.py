@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Монте-Карло симуляция турнирной сетки на основе модели прогноза
+
+Матрица вероятностей побед для всех пар участников считается один раз,
+затем N сеток разыгрываются векторно (все симуляции одного круга -
+одна операция NumPy). Большие прогоны делятся между процессами.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tennis_predict import predict_rows
+
+# Симуляций в одном блоке NumPy (ограничивает память: блок x размер сетки)
+CHUNK_SIZE = 100000
+# С какого числа симуляций имеет смысл пул процессов
+PARALLEL_THRESHOLD = 200000
+
+
+def seeded_order(size):
+    """Позиции посеянных в сетке: [1, size, ...] - 1-й и 2-й встречаются только в финале"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [x for seed in order for x in (seed, total - seed)]
+    return order
+
+
+def round_names(size):
+    """Названия кругов для сетки заданного размера"""
+    rounds = int(np.log2(size))
+    names = []
+    for r in range(rounds):
+        left = size >> r
+        if left == 8:
+            names.append('1/4')
+        elif left == 4:
+            names.append('1/2')
+        elif left == 2:
+            names.append('Финал')
+        else:
+            names.append(f'1/{left // 2}')
+    names.append('Титул')
+    return names
+
+
+def win_probability_matrix(table, rows, surface='hard', weather='sunny', params=None):
+    """Матрица P[i, j] - вероятность победы участника i над j"""
+    rows = np.asarray(rows)
+    n = len(rows)
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    prob = predict_rows(table, rows[i.ravel()], rows[j.ravel()], surface, weather, *(params or ()))
+    return prob.reshape(n, n)
+
+
+def _with_byes(prob, draw_slots):
+    """Добавить виртуального участника «бай», который всегда проигрывает"""
+    n = prob.shape[0]
+    full = np.empty((n + 1, n + 1))
+    full[:n, :n] = prob
+    full[:n, n] = 1.0
+    full[n, :n] = 0.0
+    full[n, n] = 0.5
+    slots = np.array([n if s is None else s for s in draw_slots], dtype=np.int32)
+    return full, slots
+
+
+def simulate_counts(prob, slots, n_sims, seed=None):
+    """Разыграть n_sims сеток. Возвращает счётчики counts[round, participant]
+
+    counts[r, i] - сколько раз участник i дошёл до круга r (r=0 - старт,
+    последний - титул).
+    """
+    rng = np.random.default_rng(seed)
+    n = prob.shape[0]
+    size = len(slots)
+    rounds = int(np.log2(size))
+    flat = np.ascontiguousarray(prob).ravel()
+    counts = np.zeros((rounds + 1, n), dtype=np.int64)
+
+    done = 0
+    while done < n_sims:
+        block = min(CHUNK_SIZE, n_sims - done)
+        current = np.broadcast_to(slots, (block, size))
+        counts[0] += np.bincount(current.ravel(), minlength=n)
+        for r in range(1, rounds + 1):
+            a = current[:, 0::2]
+            b = current[:, 1::2]
+            p = flat[a * n + b]
+            current = np.where(rng.random(p.shape) < p, a, b)
+            counts[r] += np.bincount(current.ravel(), minlength=n)
+        done += block
+    return counts
+
+
+def _simulate_job(args):
+    prob, slots, n_sims, seed = args
+    return simulate_counts(prob, slots, n_sims, seed)
+
+
+class TournamentOdds:
+    """Результат симуляции: вероятности дойти до каждого круга и выиграть титул"""
+
+    def __init__(self, player_ids, names, rounds, reach, n_sims, seconds):
+        self.player_ids = player_ids
+        self.names = names
+        self.rounds = rounds
+        self.reach = reach
+        self.n_sims = n_sims
+        self.seconds = seconds
+
+    @property
+    def title(self):
+        return self.reach[:, -1]
+
+    def favourites(self, limit=10):
+        """Участники по убыванию вероятности титула: (player_id, name, prob)"""
+        order = np.argsort(-self.title)[:limit]
+        return [(self.player_ids[i], self.names[i], float(self.title[i])) for i in order]
+
+    def print_table(self, limit=16):
+        print(f"\n🏆 ШАНСЫ НА ТИТУЛ ({self.n_sims} симуляций, {self.seconds:.2f} с)")
+        print(f"{'='*70}")
+        header = ''.join(f"{name:>8}" for name in self.rounds[1:])
+        print(f"{'Игрок':25}{header}")
+        for i in np.argsort(-self.title)[:limit]:
+            cells = ''.join(f"{p:8.1%}" for p in self.reach[i, 1:])
+            print(f"{self.names[i]:25}{cells}")
+
+
+def simulate_tournament(table, draw, surface='hard', weather='sunny', n_sims=100000,
+                        workers=None, seed=None, names=None, params=None):
+    """Симулировать сетку draw (список id игроков, None - бай)
+
+    Размер сетки должен быть степенью двойки (32/64/128...); params -
+    FormulaParams формулы прогноза (по умолчанию исходные).
+    """
+    size = len(draw)
+    if size < 2 or size & (size - 1):
+        raise ValueError(f"Размер сетки должен быть степенью двойки, получено {size}")
+
+    start = time.perf_counter()
+    player_ids = [pid for pid in draw if pid is not None]
+    if len(set(player_ids)) != len(player_ids):
+        raise ValueError("Игрок встречается в сетке дважды")
+    rows = table.rows(player_ids)
+    prob = win_probability_matrix(table, rows, surface, weather, params)
+
+    index = {pid: i for i, pid in enumerate(player_ids)}
+    prob, slots = _with_byes(prob, [None if pid is None else index[pid] for pid in draw])
+
+    seeds = np.random.SeedSequence(seed)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and n_sims >= PARALLEL_THRESHOLD:
+        parts = [n_sims // workers + (1 if k < n_sims % workers else 0) for k in range(workers)]
+        jobs = [(prob, slots, part, child) for part, child in zip(parts, seeds.spawn(workers)) if part]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = sum(pool.map(_simulate_job, jobs))
+    else:
+        counts = simulate_counts(prob, slots, n_sims, seeds)
+
+    n = len(player_ids)
+    reach = (counts[:, :n] / n_sims).T
+    if names is None:
+        names = [str(pid) for pid in player_ids]
+    return TournamentOdds(player_ids, names, round_names(size), reach, n_sims,
+                          time.perf_counter() - start)
+
+
+def main():
+    import argparse
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Симуляция турнирной сетки')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--size', type=int, default=128, help='размер сетки (32/64/128)')
+    parser.add_argument('--surface', default=None, help='покрытие (по умолчанию из турнира или hard)')
+    parser.add_argument('--weather', default='sunny')
+    parser.add_argument('--tournament', type=int, default=None, help='id турнира из таблицы tournaments')
+    parser.add_argument('--sims', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    db = TennisDatabase(args.db)
+    odds = db.simulate_tournament(size=args.size, surface=args.surface, weather=args.weather,
+                                  tournament_id=args.tournament, n_sims=args.sims,
+                                  workers=args.workers, seed=args.seed)
+    odds.print_table()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Быстрый холодный старт: снимок базы только для чтения
+
+    python tennis_snapshot.py --db tennis_atp.db --mode memory
+
+Два режима:
+  memory - база целиком копируется в соединение :memory: через backup API,
+           дальше все запросы идут без обращений к диску;
+  mmap   - файл открывается с immutable=1 (без блокировок и проверок
+           изменений) и отображается в память через mmap.
+
+Снимок не видит изменений файла после открытия и не принимает записи,
+поэтому подходит для короткоживущих CLI-процессов и рабочих процессов,
+которые только читают. Если версия схемы совпадает с последней, DDL
+не выполняется вовсе.
+"""
+import os
+import sqlite3
+import time
+
+from tennis_migrations import LATEST_VERSION, current_version, migrate
+
+SNAPSHOT_MODES = ('memory', 'mmap')
+
+SNAPSHOT_PRAGMAS = {
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+def _source_uri(db_name, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return f'file:{db_name}?{query}'
+
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+def load_memory(db_name):
+    """Скопировать базу в соединение :memory: (backup API)"""
+    source = sqlite3.connect(_source_uri(db_name, mode='ro'), uri=True)
+    try:
+        conn = sqlite3.connect(':memory:')
+        source.backup(conn)
+    finally:
+        source.close()
+    return conn
+
+
+def open_immutable(db_name):
+    """Открыть файл как неизменяемый и отобразить его в память целиком"""
+    # immutable=1 не читает WAL: несброшенные в файл страницы были бы потеряны
+    wal = db_name + '-wal'
+    if os.path.exists(wal) and os.path.getsize(wal) > 0:
+        raise RuntimeError(f"У {db_name} есть несброшенный WAL: выполните "
+                           f"PRAGMA wal_checkpoint(TRUNCATE) или используйте режим memory")
+    conn = sqlite3.connect(_source_uri(db_name, immutable=1), uri=True)
+    conn.execute(f'PRAGMA mmap_size = {os.path.getsize(db_name)}')
+    return conn
+
+
+def open_snapshot(db_name, mode='memory'):
+    """Соединение-снимок базы db_name в режиме mode ('memory' или 'mmap')
+
+    Миграции применяются только к копии в памяти и только если схема
+    файла устарела; для mmap устаревшая схема - ошибка (файл не меняется).
+    """
+    if mode not in SNAPSHOT_MODES:
+        raise ValueError(f"Неизвестный режим снимка '{mode}' (ожидается {', '.join(SNAPSHOT_MODES)})")
+    if db_name == ':memory:' or not os.path.exists(db_name):
+        raise FileNotFoundError(f"Для снимка нужен существующий файл базы: {db_name}")
+
+    conn = load_memory(db_name) if mode == 'memory' else open_immutable(db_name)
+    _apply_pragmas(conn, SNAPSHOT_PRAGMAS)
+    version = current_version(conn)
+    if version < LATEST_VERSION:
+        if mode != 'memory':
+            conn.close()
+            raise RuntimeError(f"Схема {db_name} устарела (версия {version} < {LATEST_VERSION}): "
+                               f"примените миграции или используйте режим memory")
+        migrate(conn)
+    conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+def main():
+    import argparse
+
+    from tennis_system import TennisDatabase
+
+    parser = argparse.ArgumentParser(description='Время холодного старта: файл и снимки')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--mode', default=None, choices=SNAPSHOT_MODES,
+                        help='только этот режим (по умолчанию - сравнить все)')
+    args = parser.parse_args()
+
+    modes = [args.mode] if args.mode else [None] + list(SNAPSHOT_MODES)
+    for mode in modes:
+        start = time.perf_counter()
+        db = TennisDatabase(args.db, snapshot=mode)
+        opened = time.perf_counter()
+        list(db.ranking(10))
+        first = time.perf_counter()
+        db.close()
+        print(f"{mode or 'file':8} открытие: {(opened - start) * 1000:7.2f} мс | "
+              f"первый запрос: {(first - start) * 1000:7.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,535 @@
 # -*- coding: utf-8 -*-
 import sqlite3
 import hashlib
+from collections import namedtuple
 from datetime import datetime
+import functools
+import inspect
 import random
+import threading
+import time
+
+import tennis_console
+from tennis_migrations import migrate
+from tennis_results import (CountryStat, HeadToHead, HistoricalRanking, PlayerAnalysis, PlayerInfo,
+                            Prediction, RankingEntry, SearchResult, SimilarPlayer, SimilarPlayers,
+                            SurfaceComparison, SurfaceLeader, SurfaceStat, WeatherStat)
+
+# Все 200 игроков рейтинга ATP 2025: (ranking, name, country, points, age, hand)
+ATP_2025_PLAYERS = [
+    (1, "Карлос Алькарас", "Испания", 12050, 21, "right"),
+    (2, "Янник Синнер", "Италия", 11500, 23, "right"),
+    (3, "Александр Зверев", "Германия", 5160, 27, "right"),
+    (4, "Новак Джокович", "Сербия", 4830, 37, "right"),
+    (5, "Феликс Оже-Альяссим", "Канада", 4245, 24, "right"),
+    (6, "Тейлор Фриц", "США", 4135, 26, "right"),
+    (7, "Алекс де Минор", "Австралия", 4135, 25, "right"),
+    (8, "Лоренцо Музетти", "Италия", 4040, 23, "right"),
+    (9, "Бен Шелтон", "США", 3970, 22, "left"),
+    (10, "Джек Дрейпер", "Великобритания", 2990, 22, "left"),
+    (11, "Александр Бублик", "Казахстан", 2870, 27, "right"),
+    (12, "Каспер Рууд", "Норвегия", 2835, 25, "right"),
+    (13, "Даниил Медведев", "Россия", 2760, 28, "right"),
+    (14, "Алехандро Давидович-Фокина", "Испания", 2635, 25, "right"),
+    (15, "Хольгер Руне", "Дания", 2590, 21, "right"),
+    (16, "Андрей Рублёв", "Россия", 2520, 26, "right"),
+    (17, "Иржи Легечка", "Чехия", 2325, 24, "right"),
+    (18, "Карен Хачанов", "Россия", 2320, 28, "right"),
+    (19, "Якуб Меншик", "Чехия", 2180, 19, "right"),
+    (20, "Томми Пол", "США", 2100, 26, "right"),
+    (21, "Франсиско Серундоло", "Аргентина", 2085, 25, "right"),
+    (22, "Флавио Коболли", "Италия", 2025, 22, "right"),
+    (23, "Денис Шаповалов", "Канада", 1675, 25, "left"),
+    (24, "Жоао Фонсека", "Бразилия", 1635, 19, "right"),
+    (25, "Таллон Грикспор", "Нидерланды", 1615, 23, "right"),
+    (26, "Лучано Дардери", "Италия", 1609, 21, "right"),
+    (27, "Кэмерон Норри", "Великобритания", 1573, 28, "left"),
+    (28, "Лёнер Тьен", "США", 1550, 21, "right"),
+    (29, "Артур Риндеркнеш", "Франция", 1540, 23, "right"),
+    (30, "Фрэнсис Тиафо", "США", 1510, 26, "right"),
+    (31, "Валантен Вашеро", "Монако", 1483, 22, "right"),
+    (32, "Томаш Махач", "Чехия", 1445, 28, "right"),
+    (33, "Брэндон Накашима", "США", 1430, 22, "right"),
+    (34, "Стефанос Циципас", "Греция", 1425, 25, "right"),
+    (35, "Корентен Муте", "Франция", 1408, 27, "right"),
+    (36, "Хауме Мунар", "Испания", 1395, 27, "right"),
+    (37, "Уго Умбер", "Франция", 1380, 25, "right"),
+    (38, "Алекс Михельсен", "США", 1325, 20, "right"),
+    (39, "Лоренцо Сонего", "Италия", 1265, 28, "right"),
+    (40, "Артюр Фис", "Франция", 1250, 22, "right"),
+    (41, "Габриэль Диалло", "Канада", 1253, 24, "right"),
+    (42, "Александр Мюллер", "Франция", 1230, 27, "right"),
+    (43, "Зизу Бергс", "Болгария", 1218, 24, "right"),
+    (44, "Григор Димитров", "Болгария", 1180, 33, "right"),
+    (45, "Себастьян Баэс", "Аргентина", 1155, 26, "right"),
+    (46, "Даниэль Альтмайер", "Германия", 1148, 26, "right"),
+    (47, "Нуну Боржеш", "Португалия", 1145, 28, "right"),
+    (48, "Себастьян Корда", "США", 1100, 24, "right"),
+    (49, "Камило Уго Карабельи", "Аргентина", 1053, 25, "right"),
+    (50, "Райлли Опелка", "США", 1026, 26, "right"),
+    (51, "Фабиан Марожан", "Венгрия", 1025, 25, "right"),
+    (52, "Миомир Кецманович", "Сербия", 1025, 26, "right"),
+    (53, "Дженсон Бруксби", "США", 1017, 23, "right"),
+    (54, "Алексей Попырин", "Австралия", 1000, 23, "right"),
+    (55, "Мартон Фучович", "Венгрия", 963, 31, "right"),
+    (56, "Маттео Берреттини", "Италия", 945, 28, "right"),
+    (57, "Валентен Руае", "Франция", 936, 26, "right"),
+    (58, "Джованни Мпетчи Перрикар", "Франция", 925, 29, "right"),
+    (59, "Томас Мартин Этчеверри", "Аргентина", 920, 24, "right"),
+    (60, "Александр Ковачевич", "США", 890, 25, "right"),
+    (61, "Маттео Арнальди", "Италия", 883, 22, "right"),
+    (62, "Камиль Майхшак", "Польша", 861, 27, "right"),
+    (63, "Теренс Атман", "Франция", 855, 26, "right"),
+    (64, "Маркос Гирон", "США", 855, 30, "right"),
+    (65, "Дамир Джумхур", "Босния и Герцеговина", 850, 31, "right"),
+    (66, "Артур Казо", "Франция", 848, 28, "right"),
+    (67, "Франсиско Комесанья", "Аргентина", 845, 27, "right"),
+    (68, "Гаэль Монфис", "Франция", 825, 37, "right"),
+    (69, "Адриан Маннарино", "Франция", 817, 35, "right"),
+    (70, "Итан Куинн", "США", 802, 20, "right"),
+    (71, "Джейкоб Фирнли", "Великобритания", 787, 20, "right"),
+    (72, "Мариано Навоне", "Аргентина", 785, 23, "right"),
+    (73, "Хуберт Хуркач", "Польша", 775, 27, "right"),
+    (74, "Маттия Беллуччи", "Италия", 766, 22, "right"),
+    (75, "Марин Чилич", "Хорватия", 765, 35, "right"),
+    (76, "Йеспер де Йонг", "Нидерланды", 763, 23, "right"),
+    (77, "Ботик ван де Зандсхулп", "Нидерланды", 756, 27, "right"),
+    (78, "Адам Уолтон", "Австралия", 740, 25, "right"),
+    (79, "Филип Мисолич", "Австрия", 726, 28, "right"),
+    (80, "Кристьян Гарин", "Чили", 726, 28, "right"),
+    (81, "Алехандро Табило", "Чили", 721, 29, "right"),
+    (82, "Александар Вукич", "Австралия", 718, 30, "right"),
+    (83, "Хамад Меджедович", "Сербия", 718, 20, "right"),
+    (84, "Ян-Леннард Штруфф", "Германия", 711, 33, "right"),
+    (85, "Хуан-Мануэль Серундоло", "Аргентина", 710, 26, "right"),
+    (86, "Джеймс Дакворт", "Австралия", 704, 32, "right"),
+    (87, "Рафаэль Коллиньон", "Бельгия", 704, 24, "right"),
+    (88, "Эмилио Нава", "США", 684, 25, "right"),
+    (89, "Пабло Карреньо-Буста", "Испания", 681, 33, "right"),
+    (90, "Элиот Спиццирри", "США", 680, 21, "right"),
+    (91, "Кентен Алис", "Франция", 679, 23, "right"),
+    (92, "Роберто Баутиста-Агут", "Испания", 670, 35, "right"),
+    (93, "Педро Мартинес-Портеро", "Испания", 668, 27, "right"),
+    (94, "Бенжамен Бонзи", "Франция", 667, 28, "right"),
+    (95, "Александр Шевченко", "Казахстан", 662, 23, "right"),
+    (96, "Далибор Сврчина", "Чехия", 661, 20, "right"),
+    (97, "Юго Гастон", "Франция", 653, 23, "right"),
+    (98, "Ласло Джере", "Сербия", 652, 27, "right"),
+    (99, "Тристан Скулкейт", "Австралия", 649, 23, "right"),
+    (100, "Синтаро Мочизуки", "Япония", 647, 21, "right"),
+    (101, "Вит Коприва", "Чехия", 636, 21, "right"),
+    (102, "Карлос Табернер", "Испания", 636, 26, "right"),
+    (103, "Янник Ханфман", "Германия", 631, 32, "right"),
+    (104, "Игнасио Бусе", "Перу", 627, 25, "right"),
+    (105, "Роман Андрес Бурручага", "Аргентина", 615, 21, "right"),
+    (106, "Тьяго Агустин Тиранте", "Аргентина", 612, 22, "right"),
+    (107, "Лука Нарди", "Италия", 599, 21, "right"),
+    (108, "Джордан Томпсон", "Австралия", 586, 29, "right"),
+    (109, "Николоз Басилашвили", "Грузия", 573, 31, "right"),
+    (110, "Йосихито Нисиока", "Япония", 566, 28, "right"),
+    (111, "Томас Барриос-Вера", "Чили", 564, 27, "right"),
+    (112, "Маккензи Макдональд", "США", 559, 28, "right"),
+    (113, "Брендон Холт", "США", 559, 25, "right"),
+    (114, "Ринки Хидзиката", "Австралия", 556, 22, "right"),
+    (115, "Кристофер О'Коннелл", "Австралия", 546, 29, "right"),
+    (116, "Александр Блокс", "Бельгия", 542, 23, "right"),
+    (117, "Борна Чорич", "Хорватия", 538, 27, "right"),
+    (118, "Патрик Кипсон", "США", 533, 24, "right"),
+    (119, "Давид Гоффен", "Бельгия", 525, 34, "right"),
+    (120, "Душан Лайович", "Сербия", 519, 32, "right"),
+    (121, "Эльмер Мёллер", "Дания", 517, 22, "right"),
+    (122, "Бу Юньчаокэтэ", "Китай", 509, 25, "right"),
+    (123, "Николас Харри", "Чили", 501, 24, "right"),
+    (124, "Чун Син Цен", "Китайский Тайбэй", 498, 23, "right"),
+    (125, "Ян Хоински", "Великобритания", 498, 28, "right"),
+    (126, "Билли Харрис", "Великобритания", 490, 24, "right"),
+    (127, "Отто Виртанен", "Финляндия", 488, 27, "right"),
+    (128, "Дино Прижмич", "Хорватия", 487, 24, "right"),
+    (129, "Лиам Драсль", "Канада", 476, 21, "right"),
+    (130, "Марко Трунгеллити", "Аргентина", 474, 31, "right"),
+    (131, "Роберто Карбальес-Баэна", "Испания", 469, 31, "right"),
+    (132, "Вилюс Гаубас", "Литва", 469, 20, "right"),
+    (133, "Николай Будков Кьер", "Норвегия", 464, 25, "right"),
+    (134, "Себастьян Офнер", "Австрия", 463, 27, "right"),
+    (135, "Мартин Ландалус-Лакамбра", "Испания", 455, 27, "right"),
+    (136, "Эшарги Моэ", "Тунис", 452, 26, "right"),
+    (137, "Франческо Пассаро", "Италия", 449, 23, "right"),
+    (138, "Кириян Жаке", "Франция", 442, 23, "right"),
+    (139, "Франческо Маэстрелли", "Италия", 442, 28, "right"),
+    (140, "Уго Дельен", "Боливия", 438, 26, "right"),
+    (141, "Андреа Пеллегрино", "Италия", 438, 29, "right"),
+    (142, "Лукаш Клейн", "Словакия", 436, 25, "right"),
+    (143, "Захари Свайда", "США", 431, 26, "right"),
+    (144, "Адольфо Даниэль Вальехо", "Парагвай", 431, 22, "right"),
+    (145, "Юго Бланше", "Франция", 427, 23, "right"),
+    (146, "Колтон Смит", "США", 424, 23, "right"),
+    (147, "Со Симабукуро", "Япония", 414, 26, "right"),
+    (148, "Марк Лаял", "Эстония", 413, 26, "right"),
+    (149, "Титуан Дрог", "Франция", 410, 21, "right"),
+    (150, "Маттео Джиганте", "Италия", 407, 22, "right"),
+    (151, "Коулман Вон", "Гонконг", 406, 21, "right"),
+    (152, "Жайме Фария", "Португалия", 405, 18, "right"),
+    (153, "Даниэль-Элаи Галан", "Колумбия", 405, 27, "right"),
+    (154, "Джулио Цеппьери", "Италия", 405, 22, "right"),
+    (155, "Пьер-Юг Эрбер", "Франция", 399, 32, "right"),
+    (156, "Кей Нисикори", "Япония", 397, 34, "right"),
+    (157, "Стэн Вавринка", "Швейцария", 397, 39, "right"),
+    (158, "Энрике Роша", "Португалия", 394, 25, "right"),
+    (159, "Йосуке Ватануки", "Япония", 380, 25, "right"),
+    (160, "Гуй Ден Оуден", "Нидерланды", 372, 26, "right"),
+    (161, "Хуан Пабло Фикович", "Аргентина", 369, 23, "right"),
+    (162, "Лука Микрут", "Хорватия", 367, 25, "right"),
+    (163, "Гарол Майо", "Франция", 361, 24, "right"),
+    (164, "Жомбор Пирош", "Венгрия", 353, 25, "right"),
+    (165, "Даниэль Мерида-Агилар", "Испания", 353, 21, "right"),
+    (166, "Люка Ван Аш", "Франция", 352, 25, "right"),
+    (167, "Нишеш Басаваредди", "США", 349, 23, "right"),
+    (168, "Рафаэль Ходар", "Испания", 349, 28, "right"),
+    (169, "Виталий Сачко", "Украина", 349, 27, "right"),
+    (170, "Николас Мехия", "Колумбия", 348, 24, "right"),
+    (171, "Алекс Болт", "Австралия", 339, 31, "right"),
+    (172, "Роман Сафиуллин", "Россия", 338, 26, "right"),
+    (173, "Элиас Имер", "Швеция", 337, 28, "right"),
+    (174, "Джей Кларк", "Великобритания", 336, 29, "right"),
+    (175, "Уго Гренье", "Франция", 334, 25, "right"),
+    (176, "Зденек Коларж", "Чехия", 331, 29, "right"),
+    (177, "Мартин Дамм-мл.", "США", 330, 20, "right"),
+    (178, "Юрий Родионов", "Австрия", 329, 24, "right"),
+    (179, "Алекс Баррена", "Аргентина", 327, 27, "right"),
+    (180, "Леандро Риди", "Швейцария", 326, 23, "right"),
+    (181, "Тристан Бойер", "США", 326, 22, "right"),
+    (182, "Дэйн Суини", "Австралия", 323, 31, "right"),
+    (183, "У Ибин", "Китай", 322, 24, "right"),
+    (184, "Джэйсон Каблер", "Австралия", 321, 31, "right"),
+    (185, "Федерико-Агустин Гомес", "Аргентина", 319, 26, "right"),
+    (186, "Бернард Томич", "Австралия", 319, 31, "right"),
+    (187, "Рэи Сакамото", "Япония", 318, 22, "right"),
+    (188, "Даниэль Эванс", "Великобритания", 317, 34, "right"),
+    (189, "Юстин Энгель", "Германия", 316, 25, "right"),
+    (190, "Жером Ким", "Швейцария", 315, 25, "right"),
+    (191, "Джеймс Маккейб", "Австралия", 315, 30, "right"),
+    (192, "Майкл Чжэн", "США", 315, 19, "right"),
+    (193, "Артур Фери", "Великобритания", 313, 29, "right"),
+    (194, "Аугуст Хольмгрен", "Дания", 312, 25, "right"),
+    (195, "Стефано Травалья", "Италия", 308, 28, "right"),
+    (196, "Альваро Гильен-Меса", "Эквадор", 308, 26, "right"),
+    (197, "Тьяго Монтейро", "Бразилия", 304, 29, "right"),
+    (198, "Даниил Глинка", "Эстония", 300, 25, "right"),
+    (199, "Оливер Кроуфорд", "США", 300, 25, "right"),
+    (200, "Саша Геймар-Вайенбург", "Франция", 297, 25, "right"),
+]
+
+
+SURFACES = ['hard', 'clay', 'grass']
+WEATHER_TYPES = ['sunny', 'rainy', 'windy', 'indoor']
+
+# Параметры формулы прогноза
+SURFACE_WEIGHT = 0.3
+WEATHER_WEIGHT = 0.2
+PROB_MIN = 0.1
+PROB_MAX = 0.9
+
+# Параметры формулы вместе; подобранные по истории хранятся в formula_params
+FormulaParams = namedtuple('FormulaParams', 'surface_weight weather_weight prob_min prob_max')
+DEFAULT_FORMULA = FormulaParams(SURFACE_WEIGHT, WEATHER_WEIGHT, PROB_MIN, PROB_MAX)
+
+# Источники вероятности: формула по очкам и статистике, рейтинги Эло по матчам
+# или марковская модель по points_won (матч до 2 или до 3 побед в сетах)
+PREDICTION_MODELS = ('formula', 'elo', 'markov', 'markov5')
+
+
+# Правила генерации статистики (векторная версия - tennis_generator)
+CLAY_BONUS = 0.1
+TOP_STABLE_RANKING = 10
+
+
+def has_clay_bonus(country):
+    """Игроки «грунтовых» стран получают бонус к win_rate на грунте"""
+    country = country.lower()
+    return 'clay' in country or 'испания' in country or 'аргентина' in country
+
+
+def generate_player_stats(ranking, country, rng=random):
+    """Сгенерировать статистику игрока по покрытиям и погоде
+
+    Возвращает (surface_rows, weather_rows) без player_id:
+    (surface, win_rate, matches, points_won) и (weather, win_rate, matches).
+    """
+    surface_rows = []
+    for surface in SURFACES:
+        # Более реалистичная статистика в зависимости от типа игрока
+        if has_clay_bonus(country):
+            clay_bonus = CLAY_BONUS if surface == 'clay' else 0
+        else:
+            clay_bonus = 0
+
+        win_rate = rng.uniform(0.45, 0.75) + clay_bonus
+        matches = rng.randint(15, 100)
+        points_won = rng.uniform(0.48, 0.52)
+        surface_rows.append((surface, win_rate, matches, points_won))
+
+    weather_rows = []
+    for weather in WEATHER_TYPES:
+        # Некоторые игроки лучше в определенных условиях
+        if ranking <= TOP_STABLE_RANKING:  # Топ-10 более стабильны
+            win_rate = rng.uniform(0.55, 0.80)
+        else:
+            win_rate = rng.uniform(0.40, 0.70)
+
+        matches = rng.randint(10, 60)
+        weather_rows.append((weather, win_rate, matches))
+
+    return surface_rows, weather_rows
+
+
+def _fetch_records(cursor, sql, params, record, chunk):
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk)
+        if not rows:
+            return
+        for row in rows:
+            yield record._make(row)
+
+
+def _traced(self, method, args, kwargs):
+    """Вызвать метод, учитывая время и запросы, если включены метрики"""
+    metrics = self._metrics
+    if metrics is None:
+        return method(self, *args, **kwargs)
+    token = metrics.method_started()
+    try:
+        return method(self, *args, **kwargs)
+    finally:
+        metrics.method_finished(method.__name__, token)
+
+
+def _reads(method):
+    """Метод только читает: при включённом пуле берёт read-only соединение"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._pool is None or getattr(self._local, 'conn', None) is not None:
+            return _traced(self, method, args, kwargs)
+        with self._pool.reader() as conn:
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+            try:
+                return _traced(self, method, args, kwargs)
+            finally:
+                self._local.conn = None
+                self._local.cursor = None
+    return wrapper
+
+
+def _writes(method):
+    """Метод пишет в базу: при включённом пуле выполняется в потоке-писателе"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.snapshot:
+            raise RuntimeError(f"База открыта снимком ({self.snapshot}) только для чтения: "
+                               f"{method.__name__} недоступен")
+        if self._pool is None or self._pool.in_writer():
+            return _traced(self, method, args, kwargs)
+        
+        def job(conn):
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+            try:
+                return _traced(self, method, args, kwargs)
+            finally:
+                self._local.conn = None
+                self._local.cursor = None
+        return self._pool.write(job)
+    return wrapper
+
+
+def _cached(players=1):
+    """Результат метода хранится в кеше результатов, если он включён
+
+    Ключ - имя метода и аргументы (с умолчаниями); первые players
+    аргументов - id игроков, при записи которых результат устаревает.
+    Стоит над _reads: попадание в кеш не берёт соединение из пула.
+    Списки отдаются копией, чтобы изменение результата вызывающим не
+    портило запись кеша (элементы - неизменяемые namedtuple).
+    """
+    def decorate(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self._result_cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (method.__name__,) + bound.args[1:]
+            value = cache.get(key, key[1:players + 1], lambda: method(self, *args, **kwargs))
+            return list(value) if isinstance(value, list) else value
+        return wrapper
+    return decorate
+
 
 class TennisDatabase:
-    def __init__(self, db_name='tennis_atp.db'):
+    def __init__(self, db_name='tennis_atp.db', pool_size=None, pragmas=None, snapshot=None):
+        """pool_size - включить пул read-only соединений и поток-писатель
+        для многопоточной работы; pragmas - PRAGMA для соединений пула;
+        snapshot - открыть базу снимком только для чтения: 'memory' (копия
+        в памяти) или 'mmap' (см. tennis_snapshot). Время открытия - в
+        startup_seconds.
+        """
+        start = time.perf_counter()
+        if snapshot and pool_size:
+            raise ValueError("Снимок базы не совместим с пулом соединений")
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+        self.snapshot = snapshot
+        if snapshot:
+            from tennis_snapshot import open_snapshot
+            self._conn = open_snapshot(db_name, snapshot)
+        else:
+            self._conn = sqlite3.connect(db_name)
+        self._cursor = self._conn.cursor()
+        self._local = threading.local()
+        self._pool = None
+        self._metrics = None
+        self._player_table = None
+        self._name_resolver = None
+        self._write_listeners = []
+        self._prob_matrix = None
+        self._similarity = None
+        self._ratings = None
+        self._result_cache = None
+        if not snapshot:
+            # Миграции сами пропускают DDL, если версия схемы уже последняя
+            self.create_tables()
+        self.formula = self._load_formula_params()
+        
+        if pool_size:
+            from tennis_pool import ConnectionPool
+            self._pool = ConnectionPool(db_name, pool_size, pragmas)
+        self.startup_seconds = time.perf_counter() - start
+    
+    @property
+    def conn(self):
+        """Соединение текущего потока (из пула) или основное"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._conn
+        if self._metrics is not None:
+            return self._metrics.wrap_connection(conn)
+        return conn
+    
+    @property
+    def cursor(self):
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._cursor
+        if self._metrics is not None:
+            return self._metrics.wrap_cursor(cursor)
+        return cursor
+    
+    def enable_metrics(self, slow_query_ms=50.0, slow_log_size=100, explain=True):
+        """Включить учёт времени методов, SQL-запросов и журнал медленных запросов"""
+        from tennis_metrics import Metrics
+        if self._metrics is None:
+            self._metrics = Metrics(slow_query_ms, slow_log_size, explain)
+        return self._metrics
+    
+    def disable_metrics(self):
+        """Выключить метрики; возвращает накопленные данные"""
+        metrics, self._metrics = self._metrics, None
+        return metrics
+    
+    def enable_result_cache(self, max_entries=None, ttl=None, warm=None):
+        """Включить кеш результатов чтения по игрокам (см. tennis_cache)
+
+        Кешируются карточки игроков, их статистика и вероятности матчей;
+        записи через TennisDatabase удаляют только записи изменённых
+        игроков. ttl - срок жизни записи в секундах (если базу меняют и
+        другие процессы); warm - прогреть кеш лучшими warm игроками.
+        """
+        from tennis_cache import DEFAULT_MAX_ENTRIES, ResultCache
+        if self._result_cache is None:
+            self._result_cache = ResultCache(max_entries or DEFAULT_MAX_ENTRIES, ttl)
+            self.add_write_listener(self._result_cache.invalidate)
+        if warm:
+            self.warm_result_cache(warm)
+        return self._result_cache
+    
+    def disable_result_cache(self):
+        """Выключить кеш результатов; возвращает его (со счётчиками)"""
+        cache, self._result_cache = self._result_cache, None
+        if cache is not None:
+            self._write_listeners.remove(cache.invalidate)
+        return cache
+    
+    def result_cache_stats(self):
+        """Счётчики кеша результатов или None, если кеш не включён"""
+        cache = self._result_cache
+        return cache.stats() if cache is not None else None
+    
+    def warm_result_cache(self, limit=None):
+        """Загрузить в кеш карточки и статистику лучших limit игроков рейтинга"""
+        from tennis_cache import WARM_TOP
+        if self._result_cache is None:
+            raise RuntimeError("Кеш результатов не включён (enable_result_cache)")
+        ids = [row[0] for row in self.query('SELECT id FROM players ORDER BY ranking LIMIT ?',
+                                            (limit or WARM_TOP,))]
+        for player_id in ids:
+            self.player_record(player_id)
+            self.get_player_surface_stats(player_id)
+            self.get_player_weather_stats(player_id)
+        return len(ids)
+    
+    def close(self):
+        """Закрыть пул и основное соединение"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        self._conn.close()
     
     def create_tables(self):
-        """Создание всех таблиц базы данных"""
-        # Таблица игроков
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS players (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ranking INTEGER,
-                name TEXT,
-                country TEXT,
-                points INTEGER,
-                age INTEGER,
-                hand TEXT
-            )
-        ''')
-        
-        # Таблица покрытий
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS surface_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_id INTEGER,
-                surface TEXT CHECK(surface IN ('hard', 'clay', 'grass')),
-                win_rate REAL,
-                matches INTEGER,
-                points_won REAL,
-                FOREIGN KEY (player_id) REFERENCES players(id)
-            )
-        ''')
-        
-        # Таблица погоды
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weather_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_id INTEGER,
-                weather TEXT CHECK(weather IN ('sunny', 'rainy', 'windy', 'indoor', 'hot', 'cold')),
-                win_rate REAL,
-                matches INTEGER,
-                FOREIGN KEY (player_id) REFERENCES players(id)
-            )
-        ''')
-        
-        # Таблица турниров
+        """Создание всех таблиц базы данных (применение миграций схемы)"""
+        migrate(self.conn)
+    
+    def _load_formula_params(self):
+        row = self.conn.execute(
+            'SELECT surface_weight, weather_weight, prob_min, prob_max FROM formula_params WHERE id = 1').fetchone()
+        return FormulaParams._make(row) if row else DEFAULT_FORMULA
+    
+    def set_formula_params(self, params=None):
+        """Прогнозировать по параметрам params (FormulaParams, None - исходные) без записи в базу"""
+        self.formula = FormulaParams._make(params) if params is not None else DEFAULT_FORMULA
+        if self._prob_matrix is not None:
+            self._prob_matrix.stale = True
+        if self._result_cache is not None:
+            self._result_cache.invalidate(None)
+    
+    @_writes
+    def save_formula_params(self, params, report=None):
+        """Записать параметры формулы в базу и начать прогнозировать по ним
+
+        report - BacktestReport подбора (сохраняются число матчей и метрики).
+        """
+        params = FormulaParams._make(params)
         self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tournaments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                surface TEXT,
-                location TEXT,
-                level TEXT CHECK(level IN ('GS', 'Masters 1000', 'ATP 500', 'ATP 250'))
-            )
-        ''')
-        
+            INSERT OR REPLACE INTO formula_params
+                (id, surface_weight, weather_weight, prob_min, prob_max, matches, log_loss, brier, fitted_at)
+            VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (*params, report.matches if report else None, report.log_loss if report else None,
+              report.brier if report else None, datetime.now().isoformat(timespec='seconds')))
         self.conn.commit()
+        self.set_formula_params(params)
+    
+    @_reads
+    def backtest(self, params=None, buckets=10):
+        """Качество формулы на таблице matches: BacktestReport (tennis_backtest)
+
+        params - FormulaParams (по умолчанию действующие).
+        """
+        from tennis_backtest import evaluate, load_matches
+        return evaluate(load_matches(self.conn, self.get_player_table()), params or self.formula, buckets)
     
+    @_writes
     def add_player_with_stats(self, ranking, name, country, points, age=None, hand='right'):
         """Добавить игрока со статистикой"""
         try:
@@ -74,258 +540,183 @@ class TennisDatabase:
             ''', (ranking, name, country, points, age, hand))
             
             player_id = self.cursor.lastrowid
+            surface_rows, weather_rows = generate_player_stats(ranking, country)
             
-            # Генерируем статистику по покрытиям
-            surfaces = ['hard', 'clay', 'grass']
-            for surface in surfaces:
-                # Более реалистичная статистика в зависимости от типа игрока
-                if 'clay' in country.lower() or 'испания' in country.lower() or 'аргентина' in country.lower():
-                    clay_bonus = 0.1 if surface == 'clay' else 0
-                else:
-                    clay_bonus = 0
-                
-                win_rate = random.uniform(0.45, 0.75) + clay_bonus
-                matches = random.randint(15, 100)
-                points_won = random.uniform(0.48, 0.52)
-                
+            # Статистика по покрытиям
+            for surface, win_rate, matches, points_won in surface_rows:
                 self.cursor.execute('''
                     INSERT INTO surface_stats (player_id, surface, win_rate, matches, points_won)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (player_id, surface, win_rate, matches, points_won))
             
-            # Генерируем статистику по погоде
-            weather_types = ['sunny', 'rainy', 'windy', 'indoor']
-            for weather in weather_types:
-                # Некоторые игроки лучше в определенных условиях
-                if ranking <= 10:  # Топ-10 более стабильны
-                    win_rate = random.uniform(0.55, 0.80)
-                else:
-                    win_rate = random.uniform(0.40, 0.70)
-                
-                matches = random.randint(10, 60)
-                
+            # Статистика по погоде
+            for weather, win_rate, matches in weather_rows:
                 self.cursor.execute('''
                     INSERT INTO weather_stats (player_id, weather, win_rate, matches)
                     VALUES (?, ?, ?, ?)
                 ''', (player_id, weather, win_rate, matches))
             
             self.conn.commit()
+            self._notify_write([player_id])
+            if self._name_resolver is not None:
+                self._name_resolver.add_player(player_id, name, country, ranking)
             return player_id
             
         except Exception as e:
+            # Не оставляем игрока без статистики в незавершённой транзакции
+            self.conn.rollback()
             print(f"Ошибка добавления {name}: {e}")
             return None
     
-    def load_all_200_players(self):
-        """Загрузить ВСЕХ 200 игроков из вашего списка"""
+    def add_write_listener(self, callback):
+        """Подписаться на записи: callback(player_ids), None - изменилось всё"""
+        self._write_listeners.append(callback)
+    
+    def _notify_write(self, player_ids=None):
+        """Обновить кеши после записи в базу"""
+        if self._player_table is not None:
+            if player_ids is None or not self._player_table.refresh(self.conn, player_ids):
+                self._player_table = None
+        for callback in self._write_listeners:
+            callback(player_ids)
+    
+    @_writes
+    def update_player_points(self, player_id, points, ranking=None):
+        """Обновить очки (и, если указан, рейтинг) игрока"""
+        self.cursor.execute('UPDATE players SET points = ?, ranking = COALESCE(?, ranking) WHERE id = ?',
+                            (points, ranking, player_id))
+        self.conn.commit()
+        self._notify_write([player_id])
+    
+    @_writes
+    def update_surface_stats(self, player_id, surface, win_rate, matches=None, points_won=None):
+        """Записать статистику игрока на покрытии (вставка или обновление)"""
+        self.cursor.execute('''
+            INSERT INTO surface_stats (player_id, surface, win_rate, matches, points_won)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (player_id, surface) DO UPDATE SET
+                win_rate = excluded.win_rate,
+                matches = COALESCE(excluded.matches, matches),
+                points_won = COALESCE(excluded.points_won, points_won)
+        ''', (player_id, surface, win_rate, matches, points_won))
+        self.conn.commit()
+        self._notify_write([player_id])
+    
+    @_writes
+    def update_weather_stats(self, player_id, weather, win_rate, matches=None):
+        """Записать статистику игрока в погодных условиях (вставка или обновление)"""
+        self.cursor.execute('''
+            INSERT INTO weather_stats (player_id, weather, win_rate, matches)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (player_id, weather) DO UPDATE SET
+                win_rate = excluded.win_rate,
+                matches = COALESCE(excluded.matches, matches)
+        ''', (player_id, weather, win_rate, matches))
+        self.conn.commit()
+        self._notify_write([player_id])
+    
+    @_writes
+    def add_match(self, player1_id, player2_id, winner_id, score=None, surface=None,
+                  tournament_id=None, match_date=None, round=None):
+        """Записать результат матча и обновить рейтинги Эло обоих игроков"""
+        return self.add_matches([{
+            'player1_id': player1_id, 'player2_id': player2_id, 'winner_id': winner_id,
+            'score': score, 'surface': surface, 'tournament_id': tournament_id,
+            'match_date': match_date, 'round': round,
+        }])[0]
+    
+    @_writes
+    def add_matches(self, matches):
+        """Записать результаты матчей одной транзакцией, возвращает их id
+
+        matches - словари с ключами player1_id, player2_id, winner_id и
+        необязательными score, surface, weather, tournament_id, match_date,
+        round. Покрытие по умолчанию берётся из турнира. Рейтинги обновляются
+        по каждому матчу за O(1), без пересчёта истории.
+        """
+        ratings = self.get_ratings()
+        tournament_surfaces = {}
+        changed = set()
+        ids = []
+        try:
+            for match in matches:
+                surface = match.get('surface')
+                tournament_id = match.get('tournament_id')
+                if surface is None and tournament_id is not None:
+                    if tournament_id not in tournament_surfaces:
+                        self.cursor.execute('SELECT surface FROM tournaments WHERE id = ?', (tournament_id,))
+                        row = self.cursor.fetchone()
+                        tournament_surfaces[tournament_id] = row[0] if row and row[0] in SURFACES else None
+                    surface = tournament_surfaces[tournament_id]
+                
+                self.cursor.execute('''
+                    INSERT INTO matches (tournament_id, player1_id, player2_id, score, winner_id,
+                                         round, match_date, surface, weather)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (tournament_id, match['player1_id'], match['player2_id'], match.get('score'),
+                      match['winner_id'], match.get('round'), match.get('match_date'), surface,
+                      match.get('weather')))
+                ids.append(self.cursor.lastrowid)
+                
+                winner = match['winner_id']
+                loser = match['player2_id'] if winner == match['player1_id'] else match['player1_id']
+                changed.update(ratings.update(winner, loser, surface))
+            
+            ratings.save(self.conn, changed)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            # Рейтинги в памяти уже учли часть матчей - перечитаем из базы
+            self._ratings = None
+            raise
+        if self._result_cache is not None:
+            # Изменились только рейтинги Эло участников - статистика и таблицы те же
+            self._result_cache.invalidate({pid for pid, _ in changed})
+        return ids
+    
+    @_reads
+    def get_ratings(self):
+        """Рейтинги Эло игроков (загружаются из player_ratings один раз)"""
+        if self._ratings is None:
+            from tennis_ratings import EloRatings
+            self._ratings = EloRatings.from_connection(self.conn)
+        return self._ratings
+    
+    @_writes
+    def rebuild_ratings(self):
+        """Пересчитать рейтинги Эло по всей истории матчей; возвращает число матчей
+
+        Матчи проигрываются по дате (затем по id), поэтому результаты,
+        добавленные не в хронологическом порядке, учитываются правильно.
+        """
+        from tennis_ratings import EloRatings
+        ratings = EloRatings.rebuild_from_connection(self.conn)
+        self.cursor.execute('DELETE FROM player_ratings')
+        ratings.save(self.conn)
+        self.conn.commit()
+        self._ratings = ratings
+        if self._result_cache is not None:
+            self._result_cache.invalidate(None)
+        self.cursor.execute('SELECT COUNT(*) FROM matches')
+        return self.cursor.fetchone()[0]
+    
+    @_writes
+    def load_all_200_players(self, bulk=False):
+        """Загрузить ВСЕХ 200 игроков из вашего списка
+
+        bulk=False - построчная загрузка через add_player_with_stats
+        (эталонный медленный путь), bulk=True - одна транзакция через BulkLoader.
+        """
         print("Загрузка 200 игроков ATP рейтинга 2025...")
         
-        # ВСЕ 200 ИГРОКОВ ИЗ ВАШЕГО СПИСКА
-        all_players = [
-            (1, "Карлос Алькарас", "Испания", 12050, 21, "right"),
-            (2, "Янник Синнер", "Италия", 11500, 23, "right"),
-            (3, "Александр Зверев", "Германия", 5160, 27, "right"),
-            (4, "Новак Джокович", "Сербия", 4830, 37, "right"),
-            (5, "Феликс Оже-Альяссим", "Канада", 4245, 24, "right"),
-            (6, "Тейлор Фриц", "США", 4135, 26, "right"),
-            (7, "Алекс де Минор", "Австралия", 4135, 25, "right"),
-            (8, "Лоренцо Музетти", "Италия", 4040, 23, "right"),
-            (9, "Бен Шелтон", "США", 3970, 22, "left"),
-            (10, "Джек Дрейпер", "Великобритания", 2990, 22, "left"),
-            (11, "Александр Бублик", "Казахстан", 2870, 27, "right"),
-            (12, "Каспер Рууд", "Норвегия", 2835, 25, "right"),
-            (13, "Даниил Медведев", "Россия", 2760, 28, "right"),
-            (14, "Алехандро Давидович-Фокина", "Испания", 2635, 25, "right"),
-            (15, "Хольгер Руне", "Дания", 2590, 21, "right"),
-            (16, "Андрей Рублёв", "Россия", 2520, 26, "right"),
-            (17, "Иржи Легечка", "Чехия", 2325, 24, "right"),
-            (18, "Карен Хачанов", "Россия", 2320, 28, "right"),
-            (19, "Якуб Меншик", "Чехия", 2180, 19, "right"),
-            (20, "Томми Пол", "США", 2100, 26, "right"),
-            (21, "Франсиско Серундоло", "Аргентина", 2085, 25, "right"),
-            (22, "Флавио Коболли", "Италия", 2025, 22, "right"),
-            (23, "Денис Шаповалов", "Канада", 1675, 25, "left"),
-            (24, "Жоао Фонсека", "Бразилия", 1635, 19, "right"),
-            (25, "Таллон Грикспор", "Нидерланды", 1615, 23, "right"),
-            (26, "Лучано Дардери", "Италия", 1609, 21, "right"),
-            (27, "Кэмерон Норри", "Великобритания", 1573, 28, "left"),
-            (28, "Лёнер Тьен", "США", 1550, 21, "right"),
-            (29, "Артур Риндеркнеш", "Франция", 1540, 23, "right"),
-            (30, "Фрэнсис Тиафо", "США", 1510, 26, "right"),
-            (31, "Валантен Вашеро", "Монако", 1483, 22, "right"),
-            (32, "Томаш Махач", "Чехия", 1445, 28, "right"),
-            (33, "Брэндон Накашима", "США", 1430, 22, "right"),
-            (34, "Стефанос Циципас", "Греция", 1425, 25, "right"),
-            (35, "Корентен Муте", "Франция", 1408, 27, "right"),
-            (36, "Хауме Мунар", "Испания", 1395, 27, "right"),
-            (37, "Уго Умбер", "Франция", 1380, 25, "right"),
-            (38, "Алекс Михельсен", "США", 1325, 20, "right"),
-            (39, "Лоренцо Сонего", "Италия", 1265, 28, "right"),
-            (40, "Артюр Фис", "Франция", 1250, 22, "right"),
-            (41, "Габриэль Диалло", "Канада", 1253, 24, "right"),
-            (42, "Александр Мюллер", "Франция", 1230, 27, "right"),
-            (43, "Зизу Бергс", "Болгария", 1218, 24, "right"),
-            (44, "Григор Димитров", "Болгария", 1180, 33, "right"),
-            (45, "Себастьян Баэс", "Аргентина", 1155, 26, "right"),
-            (46, "Даниэль Альтмайер", "Германия", 1148, 26, "right"),
-            (47, "Нуну Боржеш", "Португалия", 1145, 28, "right"),
-            (48, "Себастьян Корда", "США", 1100, 24, "right"),
-            (49, "Камило Уго Карабельи", "Аргентина", 1053, 25, "right"),
-            (50, "Райлли Опелка", "США", 1026, 26, "right"),
-            (51, "Фабиан Марожан", "Венгрия", 1025, 25, "right"),
-            (52, "Миомир Кецманович", "Сербия", 1025, 26, "right"),
-            (53, "Дженсон Бруксби", "США", 1017, 23, "right"),
-            (54, "Алексей Попырин", "Австралия", 1000, 23, "right"),
-            (55, "Мартон Фучович", "Венгрия", 963, 31, "right"),
-            (56, "Маттео Берреттини", "Италия", 945, 28, "right"),
-            (57, "Валентен Руае", "Франция", 936, 26, "right"),
-            (58, "Джованни Мпетчи Перрикар", "Франция", 925, 29, "right"),
-            (59, "Томас Мартин Этчеверри", "Аргентина", 920, 24, "right"),
-            (60, "Александр Ковачевич", "США", 890, 25, "right"),
-            (61, "Маттео Арнальди", "Италия", 883, 22, "right"),
-            (62, "Камиль Майхшак", "Польша", 861, 27, "right"),
-            (63, "Теренс Атман", "Франция", 855, 26, "right"),
-            (64, "Маркос Гирон", "США", 855, 30, "right"),
-            (65, "Дамир Джумхур", "Босния и Герцеговина", 850, 31, "right"),
-            (66, "Артур Казо", "Франция", 848, 28, "right"),
-            (67, "Франсиско Комесанья", "Аргентина", 845, 27, "right"),
-            (68, "Гаэль Монфис", "Франция", 825, 37, "right"),
-            (69, "Адриан Маннарино", "Франция", 817, 35, "right"),
-            (70, "Итан Куинн", "США", 802, 20, "right"),
-            (71, "Джейкоб Фирнли", "Великобритания", 787, 20, "right"),
-            (72, "Мариано Навоне", "Аргентина", 785, 23, "right"),
-            (73, "Хуберт Хуркач", "Польша", 775, 27, "right"),
-            (74, "Маттия Беллуччи", "Италия", 766, 22, "right"),
-            (75, "Марин Чилич", "Хорватия", 765, 35, "right"),
-            (76, "Йеспер де Йонг", "Нидерланды", 763, 23, "right"),
-            (77, "Ботик ван де Зандсхулп", "Нидерланды", 756, 27, "right"),
-            (78, "Адам Уолтон", "Австралия", 740, 25, "right"),
-            (79, "Филип Мисолич", "Австрия", 726, 28, "right"),
-            (80, "Кристьян Гарин", "Чили", 726, 28, "right"),
-            (81, "Алехандро Табило", "Чили", 721, 29, "right"),
-            (82, "Александар Вукич", "Австралия", 718, 30, "right"),
-            (83, "Хамад Меджедович", "Сербия", 718, 20, "right"),
-            (84, "Ян-Леннард Штруфф", "Германия", 711, 33, "right"),
-            (85, "Хуан-Мануэль Серундоло", "Аргентина", 710, 26, "right"),
-            (86, "Джеймс Дакворт", "Австралия", 704, 32, "right"),
-            (87, "Рафаэль Коллиньон", "Бельгия", 704, 24, "right"),
-            (88, "Эмилио Нава", "США", 684, 25, "right"),
-            (89, "Пабло Карреньо-Буста", "Испания", 681, 33, "right"),
-            (90, "Элиот Спиццирри", "США", 680, 21, "right"),
-            (91, "Кентен Алис", "Франция", 679, 23, "right"),
-            (92, "Роберто Баутиста-Агут", "Испания", 670, 35, "right"),
-            (93, "Педро Мартинес-Портеро", "Испания", 668, 27, "right"),
-            (94, "Бенжамен Бонзи", "Франция", 667, 28, "right"),
-            (95, "Александр Шевченко", "Казахстан", 662, 23, "right"),
-            (96, "Далибор Сврчина", "Чехия", 661, 20, "right"),
-            (97, "Юго Гастон", "Франция", 653, 23, "right"),
-            (98, "Ласло Джере", "Сербия", 652, 27, "right"),
-            (99, "Тристан Скулкейт", "Австралия", 649, 23, "right"),
-            (100, "Синтаро Мочизуки", "Япония", 647, 21, "right"),
-            (101, "Вит Коприва", "Чехия", 636, 21, "right"),
-            (102, "Карлос Табернер", "Испания", 636, 26, "right"),
-            (103, "Янник Ханфман", "Германия", 631, 32, "right"),
-            (104, "Игнасио Бусе", "Перу", 627, 25, "right"),
-            (105, "Роман Андрес Бурручага", "Аргентина", 615, 21, "right"),
-            (106, "Тьяго Агустин Тиранте", "Аргентина", 612, 22, "right"),
-            (107, "Лука Нарди", "Италия", 599, 21, "right"),
-            (108, "Джордан Томпсон", "Австралия", 586, 29, "right"),
-            (109, "Николоз Басилашвили", "Грузия", 573, 31, "right"),
-            (110, "Йосихито Нисиока", "Япония", 566, 28, "right"),
-            (111, "Томас Барриос-Вера", "Чили", 564, 27, "right"),
-            (112, "Маккензи Макдональд", "США", 559, 28, "right"),
-            (113, "Брендон Холт", "США", 559, 25, "right"),
-            (114, "Ринки Хидзиката", "Австралия", 556, 22, "right"),
-            (115, "Кристофер О'Коннелл", "Австралия", 546, 29, "right"),
-            (116, "Александр Блокс", "Бельгия", 542, 23, "right"),
-            (117, "Борна Чорич", "Хорватия", 538, 27, "right"),
-            (118, "Патрик Кипсон", "США", 533, 24, "right"),
-            (119, "Давид Гоффен", "Бельгия", 525, 34, "right"),
-            (120, "Душан Лайович", "Сербия", 519, 32, "right"),
-            (121, "Эльмер Мёллер", "Дания", 517, 22, "right"),
-            (122, "Бу Юньчаокэтэ", "Китай", 509, 25, "right"),
-            (123, "Николас Харри", "Чили", 501, 24, "right"),
-            (124, "Чун Син Цен", "Китайский Тайбэй", 498, 23, "right"),
-            (125, "Ян Хоински", "Великобритания", 498, 28, "right"),
-            (126, "Билли Харрис", "Великобритания", 490, 24, "right"),
-            (127, "Отто Виртанен", "Финляндия", 488, 27, "right"),
-            (128, "Дино Прижмич", "Хорватия", 487, 24, "right"),
-            (129, "Лиам Драсль", "Канада", 476, 21, "right"),
-            (130, "Марко Трунгеллити", "Аргентина", 474, 31, "right"),
-            (131, "Роберто Карбальес-Баэна", "Испания", 469, 31, "right"),
-            (132, "Вилюс Гаубас", "Литва", 469, 20, "right"),
-            (133, "Николай Будков Кьер", "Норвегия", 464, 25, "right"),
-            (134, "Себастьян Офнер", "Австрия", 463, 27, "right"),
-            (135, "Мартин Ландалус-Лакамбра", "Испания", 455, 27, "right"),
-            (136, "Эшарги Моэ", "Тунис", 452, 26, "right"),
-            (137, "Франческо Пассаро", "Италия", 449, 23, "right"),
-            (138, "Кириян Жаке", "Франция", 442, 23, "right"),
-            (139, "Франческо Маэстрелли", "Италия", 442, 28, "right"),
-            (140, "Уго Дельен", "Боливия", 438, 26, "right"),
-            (141, "Андреа Пеллегрино", "Италия", 438, 29, "right"),
-            (142, "Лукаш Клейн", "Словакия", 436, 25, "right"),
-            (143, "Захари Свайда", "США", 431, 26, "right"),
-            (144, "Адольфо Даниэль Вальехо", "Парагвай", 431, 22, "right"),
-            (145, "Юго Бланше", "Франция", 427, 23, "right"),
-            (146, "Колтон Смит", "США", 424, 23, "right"),
-            (147, "Со Симабукуро", "Япония", 414, 26, "right"),
-            (148, "Марк Лаял", "Эстония", 413, 26, "right"),
-            (149, "Титуан Дрог", "Франция", 410, 21, "right"),
-            (150, "Маттео Джиганте", "Италия", 407, 22, "right"),
-            (151, "Коулман Вон", "Гонконг", 406, 21, "right"),
-            (152, "Жайме Фария", "Португалия", 405, 18, "right"),
-            (153, "Даниэль-Элаи Галан", "Колумбия", 405, 27, "right"),
-            (154, "Джулио Цеппьери", "Италия", 405, 22, "right"),
-            (155, "Пьер-Юг Эрбер", "Франция", 399, 32, "right"),
-            (156, "Кей Нисикори", "Япония", 397, 34, "right"),
-            (157, "Стэн Вавринка", "Швейцария", 397, 39, "right"),
-            (158, "Энрике Роша", "Португалия", 394, 25, "right"),
-            (159, "Йосуке Ватануки", "Япония", 380, 25, "right"),
-            (160, "Гуй Ден Оуден", "Нидерланды", 372, 26, "right"),
-            (161, "Хуан Пабло Фикович", "Аргентина", 369, 23, "right"),
-            (162, "Лука Микрут", "Хорватия", 367, 25, "right"),
-            (163, "Гарол Майо", "Франция", 361, 24, "right"),
-            (164, "Жомбор Пирош", "Венгрия", 353, 25, "right"),
-            (165, "Даниэль Мерида-Агилар", "Испания", 353, 21, "right"),
-            (166, "Люка Ван Аш", "Франция", 352, 25, "right"),
-            (167, "Нишеш Басаваредди", "США", 349, 23, "right"),
-            (168, "Рафаэль Ходар", "Испания", 349, 28, "right"),
-            (169, "Виталий Сачко", "Украина", 349, 27, "right"),
-            (170, "Николас Мехия", "Колумбия", 348, 24, "right"),
-            (171, "Алекс Болт", "Австралия", 339, 31, "right"),
-            (172, "Роман Сафиуллин", "Россия", 338, 26, "right"),
-            (173, "Элиас Имер", "Швеция", 337, 28, "right"),
-            (174, "Джей Кларк", "Великобритания", 336, 29, "right"),
-            (175, "Уго Гренье", "Франция", 334, 25, "right"),
-            (176, "Зденек Коларж", "Чехия", 331, 29, "right"),
-            (177, "Мартин Дамм-мл.", "США", 330, 20, "right"),
-            (178, "Юрий Родионов", "Австрия", 329, 24, "right"),
-            (179, "Алекс Баррена", "Аргентина", 327, 27, "right"),
-            (180, "Леандро Риди", "Швейцария", 326, 23, "right"),
-            (181, "Тристан Бойер", "США", 326, 22, "right"),
-            (182, "Дэйн Суини", "Австралия", 323, 31, "right"),
-            (183, "У Ибин", "Китай", 322, 24, "right"),
-            (184, "Джэйсон Каблер", "Австралия", 321, 31, "right"),
-            (185, "Федерико-Агустин Гомес", "Аргентина", 319, 26, "right"),
-            (186, "Бернард Томич", "Австралия", 319, 31, "right"),
-            (187, "Рэи Сакамото", "Япония", 318, 22, "right"),
-            (188, "Даниэль Эванс", "Великобритания", 317, 34, "right"),
-            (189, "Юстин Энгель", "Германия", 316, 25, "right"),
-            (190, "Жером Ким", "Швейцария", 315, 25, "right"),
-            (191, "Джеймс Маккейб", "Австралия", 315, 30, "right"),
-            (192, "Майкл Чжэн", "США", 315, 19, "right"),
-            (193, "Артур Фери", "Великобритания", 313, 29, "right"),
-            (194, "Аугуст Хольмгрен", "Дания", 312, 25, "right"),
-            (195, "Стефано Травалья", "Италия", 308, 28, "right"),
-            (196, "Альваро Гильен-Меса", "Эквадор", 308, 26, "right"),
-            (197, "Тьяго Монтейро", "Бразилия", 304, 29, "right"),
-            (198, "Даниил Глинка", "Эстония", 300, 25, "right"),
-            (199, "Оливер Кроуфорд", "США", 300, 25, "right"),
-            (200, "Саша Геймар-Вайенбург", "Франция", 297, 25, "right"),
-        ]
+        if bulk:
+            report = self.bulk_load_players(ATP_2025_PLAYERS)
+            print(f"✅ Всего загружено: {report['players']} игроков из 200 "
+                  f"({report['rows_per_sec']:.0f} строк/с)")
+            return report['players']
         
         added = 0
-        for player in all_players:
+        for player in ATP_2025_PLAYERS:
             if self.add_player_with_stats(*player):
                 added += 1
                 if added % 20 == 0:
@@ -334,84 +725,282 @@ class TennisDatabase:
         print(f"✅ Всего загружено: {added} игроков из 200")
         return added
     
+    @_writes
+    def bulk_load_players(self, players, batch_size=5000, journal_mode='WAL', synchronous='NORMAL', seed=None):
+        """Массовая загрузка игроков со статистикой одной транзакцией
+
+        players - итерируемый источник кортежей (ranking, name, country, points, age, hand)
+        или словарей с такими ключами. seed - зерно для статистики по покрытиям
+        и погоде (None - случайная). Возвращает отчёт BulkLoader.load().
+        """
+        from tennis_ingest import BulkLoader
+        loader = BulkLoader(self.conn, batch_size=batch_size,
+                            journal_mode=journal_mode, synchronous=synchronous, seed=seed)
+        report = loader.load(players)
+        self._name_resolver = None
+        self._notify_write(None)
+        return report
+    
+    @_writes
+    def bulk_load_blocks(self, blocks, progress=None, journal_mode='WAL', synchronous='NORMAL'):
+        """Массовая загрузка блоков от tennis_generator (статистика уже посчитана)"""
+        from tennis_ingest import BulkLoader
+        loader = BulkLoader(self.conn, journal_mode=journal_mode, synchronous=synchronous)
+        report = loader.load_blocks(blocks, progress)
+        self._name_resolver = None
+        self._notify_write(None)
+        return report
+    
+    @_reads
+    def get_name_resolver(self):
+        """Индекс имён игроков (строится при первом обращении)"""
+        if self._name_resolver is None:
+            from tennis_names import NameResolver
+            self._name_resolver = NameResolver(self.conn)
+        return self._name_resolver
+    
+    @_reads
+    def find_player_id(self, player_name):
+        """id игрока по имени (нечёткий поиск, кириллица/латиница) или None"""
+        return self.get_name_resolver().resolve(player_name)
+    
+    def _find_player(self, player_name, columns):
+        """Строка игрока с заданными колонками по имени или None"""
+        player_id = self.find_player_id(player_name)
+        if player_id is None:
+            return None
+        self.cursor.execute(f'SELECT {columns} FROM players WHERE id = ?', (player_id,))
+        return self.cursor.fetchone()
+    
+    @_writes
+    def add_player_alias(self, player_id, alias):
+        """Добавить псевдоним игрока для поиска (например, латинское написание)"""
+        self.cursor.execute('INSERT OR IGNORE INTO player_aliases (player_id, alias) VALUES (?, ?)',
+                            (player_id, alias))
+        self.conn.commit()
+        if self._name_resolver is not None:
+            self._name_resolver.add_alias(player_id, alias)
+    
+    @_reads
+    def query(self, sql, params=()):
+        """Выполнить читающий запрос и вернуть все строки"""
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    
+    def _iter_records(self, sql, params, record, chunk=1000):
+        """Потоково выдавать записи record по строкам запроса (fetchmany порциями)
+
+        Декоратор _reads здесь не подходит: тело генератора выполняется уже
+        после возврата из вызова, поэтому соединение из пула берётся на всё
+        время итерации.
+        """
+        if self._pool is None or getattr(self._local, 'conn', None) is not None:
+            yield from _fetch_records(self.conn.cursor(), sql, params, record, chunk)
+            return
+        with self._pool.reader() as conn:
+            if self._metrics is not None:
+                conn = self._metrics.wrap_connection(conn)
+            yield from _fetch_records(conn.cursor(), sql, params, record, chunk)
+    
+    def ranking(self, limit=None):
+        """Рейтинг: генератор RankingEntry (limit=None - все игроки)"""
+        return self._iter_records('SELECT id, ranking, name, country, points FROM players ORDER BY ranking LIMIT ?',
+                                  (-1 if limit is None else limit,), RankingEntry)
+    
     def show_ranking(self, limit=50):
         """Показать рейтинг"""
-        self.cursor.execute('SELECT ranking, name, country, points FROM players ORDER BY ranking LIMIT ?', (limit,))
-        players = self.cursor.fetchall()
-        
-        print(f"\n{'='*70}")
-        print(f"АТП РЕЙТИНГ 2025 - Топ-{limit}")
-        print(f"{'='*70}")
-        for player in players:
-            print(f"{player[0]:3d}. {player[1]:25} {player[2]:15} {player[3]:6d}")
+        entries = list(self.ranking(limit))
+        tennis_console.print_ranking(entries, limit)
+        return entries
+    
+    @_writes
+    def record_ranking_week(self, week=None, keyframe_interval=None):
+        """Записать текущий рейтинг как снимок недели (дельтой к прошлой)
+
+        week - любая дата недели (по умолчанию сегодня). Возвращает отчёт
+        tennis_history.RankingHistory.record().
+        """
+        from tennis_history import KEYFRAME_INTERVAL, RankingHistory
+        history = RankingHistory(self.conn, keyframe_interval or KEYFRAME_INTERVAL)
+        self.cursor.execute('SELECT id, ranking, points FROM players WHERE ranking IS NOT NULL')
+        try:
+            report = history.record(self.cursor.fetchall(), week)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return report
+    
+    @_reads
+    def ranking_as_of(self, day=None, limit=50):
+        """Рейтинг на дату: список RankingEntry по ranking_history"""
+        from tennis_history import RankingHistory
+        rows, _ = RankingHistory(self.conn).top_as_of(day, limit)
+        entries = []
+        for player_id, ranking, points in rows:
+            self.cursor.execute('SELECT name, country FROM players WHERE id = ?', (player_id,))
+            name, country = self.cursor.fetchone() or (None, None)
+            entries.append(RankingEntry(player_id, ranking, name, country, points))
+        return entries
     
+    @_reads
+    def player_ranking_as_of(self, player_name, day=None):
+        """Место и очки игрока на дату: HistoricalRanking или None"""
+        from tennis_history import RankingHistory
+        player = self._find_player(player_name, 'id, name, country')
+        if player is None:
+            return None
+        state = RankingHistory(self.conn).player_as_of(player[0], day)
+        return HistoricalRanking(*player, *state) if state else None
+    
+    @_reads
+    def ranking_history_stats(self):
+        """Размер истории рейтинга: недели, ключевые кадры, строки"""
+        from tennis_history import RankingHistory
+        return RankingHistory(self.conn).stats()
+    
+    @_cached()
+    @_reads
     def get_player_surface_stats(self, player_id):
         """Статистика по покрытиям"""
         self.cursor.execute('SELECT surface, win_rate, matches FROM surface_stats WHERE player_id = ? ORDER BY win_rate DESC', (player_id,))
-        return self.cursor.fetchall()
+        return [SurfaceStat._make(row) for row in self.cursor.fetchall()]
     
+    @_cached()
+    @_reads
     def get_player_weather_stats(self, player_id):
         """Статистика по погоде"""
         self.cursor.execute('SELECT weather, win_rate, matches FROM weather_stats WHERE player_id = ? ORDER BY win_rate DESC', (player_id,))
-        return self.cursor.fetchall()
+        return [WeatherStat._make(row) for row in self.cursor.fetchall()]
+    
+    @_reads
+    def player_info(self, player_name):
+        """PlayerInfo по имени (нечёткий поиск) или None"""
+        player_id = self.find_player_id(player_name)
+        return None if player_id is None else self.player_record(player_id)
+    
+    @_cached()
+    @_reads
+    def player_record(self, player_id):
+        """PlayerInfo по id или None"""
+        self.cursor.execute('SELECT id, name, country, ranking, points FROM players WHERE id = ?', (player_id,))
+        player = self.cursor.fetchone()
+        return PlayerInfo._make(player) if player else None
+    
+    @_reads
+    def player_analysis(self, player_name):
+        """Статистика игрока по покрытиям и погоде: PlayerAnalysis или None"""
+        player = self.player_info(player_name)
+        if player is None:
+            return None
+        return PlayerAnalysis(player, self.get_player_surface_stats(player.id),
+                              self.get_player_weather_stats(player.id))
     
     def analyze_player(self, player_name):
         """Анализ игрока"""
-        self.cursor.execute('SELECT id, name, country, ranking, points FROM players WHERE name LIKE ?', (f'%{player_name}%',))
-        player = self.cursor.fetchone()
-        
-        if not player:
-            print(f"Игрок '{player_name}' не найден")
-            return
-        
-        player_id, name, country, ranking, points = player
-        
-        print(f"\n{'='*60}")
-        print(f"АНАЛИЗ: {name}")
-        print(f"Рейтинг: {ranking} | Страна: {country} | Очки: {points}")
-        print(f"{'='*60}")
-        
-        # Покрытия
-        print("\n📊 ПОКРЫТИЯ:")
-        surfaces = self.get_player_surface_stats(player_id)
-        for surface, win_rate, matches in surfaces:
-            print(f"  {surface.upper():<6} | Побед: {win_rate:.1%} | Матчи: {matches}")
-        
-        # Погода
-        print("\n🌤️ ПОГОДА:")
-        weathers = self.get_player_weather_stats(player_id)
-        for weather, win_rate, matches in weathers:
-            print(f"  {weather.upper():<8} | Побед: {win_rate:.1%} | Матчи: {matches}")
-    
-    def predict_match(self, player1_name, player2_name, surface='hard', weather='sunny'):
-        """Прогноз матча"""
-        # Находим игроков
-        self.cursor.execute('SELECT id, name, points FROM players WHERE name LIKE ?', (f'%{player1_name}%',))
-        p1 = self.cursor.fetchone()
-        self.cursor.execute('SELECT id, name, points FROM players WHERE name LIKE ?', (f'%{player2_name}%',))
-        p2 = self.cursor.fetchone()
-        
-        if not p1 or not p2:
+        analysis = self.player_analysis(player_name)
+        if analysis is None:
+            tennis_console.print_not_found(player_name)
+            return None
+        tennis_console.print_analysis(analysis)
+        return analysis
+    
+    @_reads
+    def prediction(self, player1_name, player2_name, surface='hard', weather='sunny', model='formula'):
+        """Прогноз матча по именам: Prediction или None, если игрок не найден"""
+        p1 = self.player_info(player1_name)
+        p2 = self.player_info(player2_name)
+        if p1 is None or p2 is None:
+            return None
+        return self._prediction(p1, p2, surface, weather, model)
+    
+    def _prediction(self, p1, p2, surface, weather, model='formula'):
+        return Prediction(p1.id, p1.name, p2.id, p2.name, surface, weather,
+                          self.match_probability(p1.id, p2.id, surface, weather, model))
+    
+    def predict_match(self, player1_name, player2_name, surface='hard', weather='sunny', model='formula'):
+        """Прогноз матча (model='elo' - по рейтингам Эло из результатов матчей)"""
+        prediction = self.prediction(player1_name, player2_name, surface, weather, model)
+        if prediction is None:
             print("Игроки не найдены")
-            return
-        
-        p1_id, p1_name, p1_points = p1
-        p2_id, p2_name, p2_points = p2
+            return None
+        tennis_console.print_prediction(prediction)
+        return prediction
+    
+    def predict_many(self, pairs, surface='hard', weather='sunny', chunk=10000, model='formula'):
+        """Потоковый пакетный прогноз: генератор Prediction без вывода
+
+        pairs - итерируемое пар (игрок1, игрок2), где игрок - id или имя.
+        Пары обрабатываются порциями по chunk одним векторным вычислением;
+        неизвестный игрок - KeyError.
+        """
+        names = dict(self.query('SELECT id, name FROM players'))
+        resolved = {}
+
+        def player_id(player):
+            if isinstance(player, int):
+                return player
+            if player not in resolved:
+                resolved[player] = self.find_player_id(player)
+            if resolved[player] is None:
+                raise KeyError(player)
+            return resolved[player]
+
+        def predict(batch):
+            probs = self.predict_matches(batch, surface, weather, model)
+            for (id1, id2), prob in zip(batch, probs.tolist()):
+                yield Prediction(id1, names.get(id1), id2, names.get(id2), surface, weather, prob)
+
+        batch = []
+        for p1, p2 in pairs:
+            batch.append((player_id(p1), player_id(p2)))
+            if len(batch) >= chunk:
+                yield from predict(batch)
+                batch = []
+        if batch:
+            yield from predict(batch)
+    
+    @_cached(players=2)
+    @_reads
+    def match_probability(self, p1_id, p2_id, surface='hard', weather='sunny', model='formula'):
+        """Вероятность победы первого игрока
+
+        model='formula' - по очкам и статистике (из матрицы, если она
+        включена), model='elo' - по рейтингам Эло, model='markov' / 'markov5' -
+        точная марковская модель матча до 2 / 3 побед в сетах по points_won
+        на покрытии (в последних трёх погода не учитывается).
+        """
+        if model == 'elo':
+            return self.get_ratings().probability(p1_id, p2_id, surface)
+        if model in ('markov', 'markov5'):
+            from tennis_markov import MARKOV_MODELS, prematch_probability, serve_probabilities
+            points_won = []
+            for player_id in (p1_id, p2_id):
+                self.cursor.execute('SELECT points_won FROM surface_stats WHERE player_id = ? AND surface = ?',
+                                    (player_id, surface))
+                row = self.cursor.fetchone()
+                points_won.append(row[0] if row else None)
+            return prematch_probability(*serve_probabilities(*points_won), MARKOV_MODELS[model])
+        if model != 'formula':
+            raise ValueError(f"Неизвестная модель '{model}', доступны: {', '.join(PREDICTION_MODELS)}")
+        if self._prob_matrix is not None:
+            return self._prob_matrix.lookup(p1_id, p2_id, surface, weather)
         
-        print(f"\n🎾 ПРОГНОЗ: {p1_name} vs {p2_name}")
-        print(f"Условия: {surface.upper()} | {weather.upper()}")
+        self.cursor.execute('SELECT points FROM players WHERE id = ?', (p1_id,))
+        p1_points = self.cursor.fetchone()[0]
+        self.cursor.execute('SELECT points FROM players WHERE id = ?', (p2_id,))
+        p2_points = self.cursor.fetchone()[0]
         
         # Базовая вероятность
         base_prob = p1_points / (p1_points + p2_points)
         
         # Корректировка на покрытие
-        self.cursor.execute('SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (p1_id, surface))
-        p1_surface = self.cursor.fetchone()
-        self.cursor.execute('SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (p2_id, surface))
-        p2_surface = self.cursor.fetchone()
+        p1_surface = self._surface_win_rate(p1_id, surface)
+        p2_surface = self._surface_win_rate(p2_id, surface)
         
-        if p1_surface and p2_surface:
-            base_prob += (p1_surface[0] - p2_surface[0]) * 0.3
+        if p1_surface is not None and p2_surface is not None:
+            base_prob += (p1_surface - p2_surface) * self.formula.surface_weight
         
         # Корректировка на погоду
         self.cursor.execute('SELECT win_rate FROM weather_stats WHERE player_id = ? AND weather = ?', (p1_id, weather))
@@ -420,192 +1009,293 @@ class TennisDatabase:
         p2_weather = self.cursor.fetchone()
         
         if p1_weather and p2_weather:
-            base_prob += (p1_weather[0] - p2_weather[0]) * 0.2
+            base_prob += (p1_weather[0] - p2_weather[0]) * self.formula.weather_weight
         
         # Финальная вероятность
-        final_prob = max(0.1, min(0.9, base_prob))
-        
-        print(f"\n{p1_name}: {final_prob:.1%}")
-        print(f"{p2_name}: {1-final_prob:.1%}")
-        
-        if final_prob > 0.5:
-            print(f"\n🎯 Ожидаемый победитель: {p1_name}")
+        return max(self.formula.prob_min, min(self.formula.prob_max, base_prob))
+    
+    @_cached()
+    @_reads
+    def _surface_win_rate(self, player_id, surface):
+        """win_rate игрока на покрытии или None (из памяти, если матрица включена)"""
+        if self._prob_matrix is not None:
+            table = self.get_player_table()
+            value = table.surface_column(surface)[table.rows([player_id])[0]]
+            return None if value != value else float(value)
+        self.cursor.execute('SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (player_id, surface))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    @_reads
+    def get_player_table(self):
+        """Колоночная таблица игроков в памяти (загружается один раз)"""
+        if self._player_table is None:
+            from tennis_predict import PlayerTable
+            self._player_table = PlayerTable.from_connection(self.conn)
+        return self._player_table
+    
+    @_reads
+    def enable_probability_matrix(self, path=None):
+        """Включить предрасчитанную матрицу вероятностей для всех пар
+
+        path - необязательный файл .npz для хранения матрицы между запусками.
+        После включения predict_match и get_player_head_to_head читают
+        вероятность из матрицы вместо запросов к статистике.
+        """
+        from tennis_matrix import MatrixCache
+        if self._prob_matrix is None:
+            self._prob_matrix = MatrixCache(self, path)
+        return self._prob_matrix
+    
+    @_reads
+    def predict_matches(self, pairs, surface='hard', weather='sunny', model='formula'):
+        """Пакетный прогноз: вероятности победы первого игрока для пар (id1, id2)
+
+        Возвращает массив NumPy, ничего не печатает.
+        """
+        if model == 'elo':
+            return self.get_ratings().probability_many(pairs, surface)
+        if model in ('markov', 'markov5'):
+            from tennis_markov import MARKOV_MODELS
+            from tennis_predict import predict_markov
+            return predict_markov(self.get_player_table(), pairs, surface, MARKOV_MODELS[model])
+        if model != 'formula':
+            raise ValueError(f"Неизвестная модель '{model}', доступны: {', '.join(PREDICTION_MODELS)}")
+        from tennis_predict import predict_matches
+        return predict_matches(self.get_player_table(), pairs, surface, weather, self.formula)
+
+    @_reads
+    def export(self, source, path, fmt=None, columns=None, filters=(), chunk_size=10000,
+               top=200, surface='hard', weather='sunny', model='formula'):
+        """Потоковая выгрузка таблицы или прогнозов в CSV / JSON Lines / Parquet / Arrow
+
+        source - имя таблицы (tennis_export.EXPORT_TABLES) или 'predictions'
+        (все пары среди топ-top рейтинга). columns - проекция, filters -
+        список (колонка, оператор, значение). Память ограничена chunk_size
+        строками. Возвращает отчёт tennis_export.write_chunks().
+        """
+        import tennis_export
+        if source == 'predictions':
+            player_ids = [entry.id for entry in self.ranking(top)]
+            chunks = tennis_export.iter_prediction_chunks(self, player_ids, surface, weather, model,
+                                                          columns, filters, chunk_size)
         else:
-            print(f"\n🎯 Ожидаемый победитель: {p2_name}")
+            chunks = tennis_export.iter_table_chunks(self.conn, source, columns, filters, chunk_size)
+        return tennis_export.write_chunks(chunks, path, fmt)
 
-    def find_similar_players(self, player_name):
-        """Найти похожих игроков по стилю и статистике"""
-        self.cursor.execute('SELECT id, name, country, ranking, points FROM players WHERE name LIKE ?', (f'%{player_name}%',))
-        player = self.cursor.fetchone()
-        
-        if not player:
-            print(f"Игрок '{player_name}' не найден")
-            return
-        
-        player_id, name, country, ranking, points = player
-        
-        print(f"\n🔍 ПОХОЖИЕ ИГРОКИ НА {name}:")
-        print(f"{'='*60}")
-        
-        # Ищем игроков с похожей статистикой на грунте
-        self.cursor.execute('''
-            SELECT p.name, p.country, p.ranking, s.win_rate 
-            FROM players p
-            JOIN surface_stats s ON p.id = s.player_id
-            WHERE s.surface = 'clay' 
-            AND p.id != ? 
-            AND p.country = ?
-            ORDER BY ABS(s.win_rate - (SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = 'clay'))
-            LIMIT 5
-        ''', (player_id, country, player_id))
+    @_reads
+    def export_column_snapshot(self, path):
+        """Записать бинарный снимок игроков для рабочих процессов (tennis_colsnap)
+
+        Процессы открывают его ColumnSnapshot.open и считают прогнозы и
+        похожих игроков на общих отображённых в память массивах.
+        Возвращает число игроков.
+        """
+        from tennis_colsnap import write_snapshot
+        return write_snapshot(self.conn, path)
+
+    @_reads
+    def build_seeded_draw(self, size=128):
+        """Сетка из топ-size игроков рейтинга, посеянных по стандартной схеме"""
+        from tennis_simulator import seeded_order
+        self.cursor.execute('SELECT id FROM players ORDER BY ranking LIMIT ?', (size,))
+        seeds = [row[0] for row in self.cursor.fetchall()]
+        # Если игроков меньше, чем мест, старшие посеянные получают бай
+        return [seeds[s - 1] if s <= len(seeds) else None for s in seeded_order(size)]
+    
+    @_reads
+    def simulate_tournament(self, draw=None, size=128, surface=None, weather='sunny',
+                            tournament_id=None, n_sims=100000, workers=None, seed=None):
+        """Монте-Карло симуляция сетки: вероятности кругов и титула
+
+        draw - список id игроков (None - бай); по умолчанию посеянная сетка из
+        топ-size рейтинга. Покрытие берётся из турнира, если указан tournament_id.
+        """
+        from tennis_simulator import simulate_tournament
         
-        clay_similar = self.cursor.fetchall()
+        if tournament_id is not None:
+            self.cursor.execute('SELECT surface FROM tournaments WHERE id = ?', (tournament_id,))
+            tournament = self.cursor.fetchone()
+            if not tournament:
+                raise ValueError(f"Турнир {tournament_id} не найден")
+            surface = surface or tournament[0]
+        surface = surface or 'hard'
         
-        if clay_similar:
-            print("\n🎾 Похожие игроки на грунте:")
-            for sim_player in clay_similar:
-                print(f"  {sim_player[0]:20} {sim_player[1]:15} Рейтинг: {sim_player[2]} | Побед: {sim_player[3]:.1%}")
+        if draw is None:
+            draw = self.build_seeded_draw(size)
         
-        # Ищем игроков с похожим рейтингом
-        self.cursor.execute('''
-            SELECT name, country, ranking, points 
-            FROM players 
-            WHERE id != ? 
-            AND ranking BETWEEN ? AND ?
-            ORDER BY ABS(points - ?)
-            LIMIT 5
-        ''', (player_id, max(1, ranking-10), min(200, ranking+10), points))
+        player_ids = [pid for pid in draw if pid is not None]
+        self.cursor.execute(
+            f'SELECT id, name FROM players WHERE id IN ({",".join("?" * len(player_ids))})',
+            player_ids)
+        names_by_id = dict(self.cursor.fetchall())
+        names = [names_by_id.get(pid, str(pid)) for pid in player_ids]
         
-        ranking_similar = self.cursor.fetchall()
+        return simulate_tournament(self.get_player_table(), draw, surface, weather,
+                                   n_sims=n_sims, workers=workers, seed=seed, names=names,
+                                   params=self.formula)
+
+    @_reads
+    def get_similarity_index(self, weights=None):
+        """Индекс похожих игроков (перестраивается лениво после записей)
+
+        weights - веса групп признаков, см. tennis_similarity.DEFAULT_WEIGHTS.
+        """
+        from tennis_similarity import SimilarityCache
+        if self._similarity is None:
+            self._similarity = SimilarityCache(self, weights)
+        elif weights is not None:
+            self._similarity.set_weights(weights)
+        return self._similarity.get()
+    
+    @_reads
+    def similar_players(self, player_name, k=5):
+        """Ближайшие по стилю и статистике игроки: SimilarPlayers или None"""
+        player = self.player_info(player_name)
+        if player is None:
+            return None
         
-        if ranking_similar:
-            print("\n📊 Игроки с похожим рейтингом:")
-            for sim_player in ranking_similar:
-                print(f"  {sim_player[0]:20} {sim_player[1]:15} Рейтинг: {sim_player[2]} | Очки: {sim_player[3]}")
+        # Ближайшие по всей статистике: покрытия, погода, возраст, рука, очки
+        neighbours = []
+        for sim_id, distance in self.get_similarity_index().query(player.id, k):
+            self.cursor.execute('SELECT id, name, country, ranking, points FROM players WHERE id = ?', (sim_id,))
+            neighbours.append(SimilarPlayer(*self.cursor.fetchone(), distance))
+        return SimilarPlayers(player, neighbours)
+    
+    def find_similar_players(self, player_name, k=5):
+        """Найти похожих игроков по стилю и статистике"""
+        similar = self.similar_players(player_name, k)
+        if similar is None:
+            tennis_console.print_not_found(player_name)
+            return None
+        tennis_console.print_similar(similar)
+        return similar
 
+    @_reads
+    def top_by_surface(self, surface='hard', limit=10):
+        """Лучшие игроки на покрытии: список SurfaceLeader
+
+        Читается из surface_leaderboard (поддерживается триггерами), уже
+        упорядоченной по покрытию и win_rate: O(limit) без соединения и сортировки.
+        """
+        self.cursor.execute('''
+            SELECT player_id, name, country, ranking, win_rate, matches
+            FROM surface_leaderboard
+            WHERE surface = ?
+            ORDER BY win_rate DESC
+            LIMIT ?
+        ''', (surface, limit))
+        return [SurfaceLeader._make(row) for row in self.cursor.fetchall()]
+    
     def get_top_players_by_surface(self, surface='hard', limit=10):
         """Получить лучших игроков на определенном покрытии"""
-        print(f"\n🏆 ТОП-{limit} ИГРОКОВ НА {surface.upper()}:")
-        print(f"{'='*60}")
-        
+        leaders = self.top_by_surface(surface, limit)
+        tennis_console.print_top_surface(surface, limit, leaders)
+        return leaders
+    
+    @_reads
+    def country_stats(self, limit=15):
+        """Страны с двумя и более игроками по сумме очков: список CountryStat
+
+        Читается из сводки country_summary (поддерживается триггерами) по
+        индексу на сумме очков, без GROUP BY по всем игрокам.
+        """
         self.cursor.execute('''
-            SELECT p.name, p.country, p.ranking, s.win_rate, s.matches
-            FROM players p
-            JOIN surface_stats s ON p.id = s.player_id
-            WHERE s.surface = ?
-            ORDER BY s.win_rate DESC
+            SELECT country, players,
+                   CAST(ranking_sum AS REAL) / ranked as avg_ranking,
+                   points_sum as total_points
+            FROM country_summary
+            WHERE players >= 2
+            ORDER BY points_sum DESC
             LIMIT ?
-        ''', (surface, limit))
-        
-        top_players = self.cursor.fetchall()
-        
-        for i, player in enumerate(top_players, 1):
-            print(f"{i:2d}. {player[0]:20} {player[1]:15} Рейтинг: {player[2]:3d} | Побед: {player[3]:.1%} | Матчи: {player[4]}")
+        ''', (limit,))
+        return [CountryStat._make(row) for row in self.cursor.fetchall()]
     
     def get_country_stats(self):
         """Статистика по странам"""
-        print("\n🌍 СТАТИСТИКА ПО СТРАНАМ:")
-        print(f"{'='*60}")
-        
-        self.cursor.execute('''
-            SELECT country, COUNT(*) as players, 
-                   AVG(ranking) as avg_ranking,
-                   SUM(points) as total_points
-            FROM players
-            GROUP BY country
-            HAVING COUNT(*) >= 2
-            ORDER BY total_points DESC
-            LIMIT 15
-        ''')
-        
-        countries = self.cursor.fetchall()
-        
-        for country in countries:
-            print(f"{country[0]:20} Игроков: {country[1]:2d} | Средний рейтинг: {country[2]:5.1f} | Очки: {country[3]:6.0f}")
+        countries = self.country_stats()
+        tennis_console.print_country_stats(countries)
+        return countries
+    
+    @_reads
+    def search(self, search_term, limit=20):
+        """Поиск по имени или стране: список SearchResult по убыванию совпадения"""
+        results = []
+        for player_id, score in self.get_name_resolver().search(search_term, limit=limit, countries=True):
+            self.cursor.execute('SELECT id, ranking, name, country, points, age FROM players WHERE id = ?',
+                                (player_id,))
+            results.append(SearchResult(*self.cursor.fetchone(), score))
+        return results
     
     def search_players(self, search_term):
         """Поиск игроков по имени или стране"""
-        print(f"\n🔎 РЕЗУЛЬТАТЫ ПОИСКА: '{search_term}'")
-        print(f"{'='*60}")
-        
-        self.cursor.execute('''
-            SELECT ranking, name, country, points, age
-            FROM players 
-            WHERE name LIKE ? OR country LIKE ?
-            ORDER BY ranking
-            LIMIT 20
-        ''', (f'%{search_term}%', f'%{search_term}%'))
-        
-        results = self.cursor.fetchall()
+        results = self.search(search_term)
+        tennis_console.print_search(search_term, results)
+        return results
+    
+    @_reads
+    def head_to_head(self, player1_name, player2_name):
+        """Виртуальное противостояние: HeadToHead или None, если игрок не найден"""
+        p1 = self.player_info(player1_name)
+        p2 = self.player_info(player2_name)
+        if p1 is None or p2 is None:
+            return None
         
-        if not results:
-            print("Ничего не найдено")
-            return
+        # Сравнение на покрытиях, где есть статистика у обоих
+        surfaces = []
+        for surface in SURFACES:
+            p1_surface = self._surface_win_rate(p1.id, surface)
+            p2_surface = self._surface_win_rate(p2.id, surface)
+            if p1_surface is not None and p2_surface is not None:
+                surfaces.append(SurfaceComparison(surface, p1_surface, p2_surface))
         
-        for player in results:
-            print(f"{player[0]:3d}. {player[1]:25} {player[2]:15} Очки: {player[3]:6d} | Возраст: {player[4]}")
+        return HeadToHead(p1, p2, surfaces, self._prediction(p1, p2, 'hard', 'sunny'))
     
     def get_player_head_to_head(self, player1_name, player2_name):
         """Виртуальное противостояние игроков"""
-        self.cursor.execute('SELECT id, name, points FROM players WHERE name LIKE ?', (f'%{player1_name}%',))
-        p1 = self.cursor.fetchone()
-        self.cursor.execute('SELECT id, name, points FROM players WHERE name LIKE ?', (f'%{player2_name}%',))
-        p2 = self.cursor.fetchone()
-        
-        if not p1 or not p2:
+        h2h = self.head_to_head(player1_name, player2_name)
+        if h2h is None:
             print("Игроки не найдены")
-            return
-        
-        p1_id, p1_name, p1_points = p1
-        p2_id, p2_name, p2_points = p2
-        
-        print(f"\n⚔️  ПРОТИВОСТОЯНИЕ: {p1_name} vs {p2_name}")
-        print(f"{'='*60}")
-        
-        # Сравнение рейтинга
-        print(f"\n📊 РЕЙТИНГ:")
-        print(f"  {p1_name}: {p1_points} очков")
-        print(f"  {p2_name}: {p2_points} очков")
-        print(f"  Разница: {abs(p1_points - p2_points)} очков")
-        
-        # Сравнение на разных покрытиях
-        surfaces = ['hard', 'clay', 'grass']
-        for surface in surfaces:
-            self.cursor.execute('SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (p1_id, surface))
-            p1_surface = self.cursor.fetchone()
-            self.cursor.execute('SELECT win_rate FROM surface_stats WHERE player_id = ? AND surface = ?', (p2_id, surface))
-            p2_surface = self.cursor.fetchone()
-            
-            if p1_surface and p2_surface:
-                diff = p1_surface[0] - p2_surface[0]
-                print(f"\n🎾 {surface.upper()}:")
-                print(f"  {p1_name}: {p1_surface[0]:.1%}")
-                print(f"  {p2_name}: {p2_surface[0]:.1%}")
-                if diff > 0:
-                    print(f"  Преимущество: {p1_name} ({diff:+.1%})")
-                else:
-                    print(f"  Преимущество: {p2_name} ({-diff:+.1%})")
-        
-        # Общий прогноз
-        self.predict_match(player1_name, player2_name)
+            return None
+        tennis_console.print_head_to_head(h2h)
+        return h2h
 
 def main():
+    import argparse
+    import sys
+
+    from tennis_batch import add_batch_commands, run_command
+
+    parser = argparse.ArgumentParser(description='Теннисная система ATP 2025 (без команды - меню)')
+    parser.add_argument('--db', default='tennis_atp.db')
+    parser.add_argument('--snapshot', default=None, choices=('memory', 'mmap'),
+                        help='открыть базу снимком только для чтения (быстрый старт)')
+    add_batch_commands(parser)
+    args = parser.parse_args()
+    if args.command:
+        # Пакетный режим: запросы из файла или stdin, ответы JSON Lines
+        sys.exit(run_command(args))
+
     print("="*60)
     print("ТЕННИСНАЯ СИСТЕМА ATP 2025")
     print("200 игроков | Погода | Покрытия")
     print("="*60)
     
-    db = TennisDatabase()
+    db = TennisDatabase(args.db, snapshot=args.snapshot)
     
     # Проверяем базу
     db.cursor.execute('SELECT COUNT(*) FROM players')
     count = db.cursor.fetchone()[0]
     
+    if count == 0 and db.snapshot:
+        print("База пуста: сначала запустите без --snapshot, чтобы загрузить игроков")
+        return
     if count == 0:
         print("Загрузка 200 игроков...")
-        db.load_all_200_players()
+        db.load_all_200_players(bulk=True)
     else:
         print(f"В базе: {count} игроков")
+    print(f"Запуск: {db.startup_seconds * 1000:.1f} мс" + (f" (снимок {db.snapshot})" if db.snapshot else ""))
     
     # Меню
     while True:
@@ -636,7 +1326,8 @@ def main():
             player2 = input("Второй игрок: ")
             surface = input("Покрытие (hard/clay/grass) [hard]: ") or "hard"
             weather = input("Погода (sunny/rainy/windy/indoor) [sunny]: ") or "sunny"
-            db.predict_match(player1, player2, surface, weather)
+            model = input("Модель (formula/elo/markov/markov5) [formula]: ") or "formula"
+            db.predict_match(player1, player2, surface, weather, model)
         
         elif choice == '4':
             player = input("Введите имя игрока для поиска похожих: ")